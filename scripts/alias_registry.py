@@ -0,0 +1,253 @@
+"""
+Alias Registry Module
+
+跨运行持久化的实体别名注册表 (SQLite)：
+- 保存标准名、别名及标准名的分块键
+- 新实体先精确查别名表，未知实体先在本批内聚类，再按分块键索引查找已有标准名
+- 已有标准名保持不变，新标准名写回注册表
+- 单次处理代价与本批实体数成正比，而非历史总量
+"""
+
+import sqlite3
+
+from entity_index import PrefixBlockIndex
+from entity_resolver import EntityResolver
+
+
+# SQLite 单条语句参数上限以内的分批大小
+_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS canonicals (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT PRIMARY KEY,
+    canonical_id INTEGER NOT NULL REFERENCES canonicals(id)
+);
+CREATE TABLE IF NOT EXISTS block_keys (
+    key TEXT NOT NULL,
+    canonical_id INTEGER NOT NULL REFERENCES canonicals(id)
+);
+CREATE INDEX IF NOT EXISTS idx_block_keys_key ON block_keys(key);
+"""
+
+
+class AliasRegistry:
+    """持久化别名注册表"""
+
+    def __init__(self, path: str, threshold: float = 0.7, blocking: str = "prefix",
+                 clustering: str = "greedy", similarity: str = "sequence", top_k: int = 10):
+        """
+        Args:
+            path: SQLite 数据库路径 (":memory:" 为内存库)
+            threshold: 相似度阈值 (与 EntityResolver 一致)
+            blocking: 本批聚类的候选生成策略 (同 EntityResolver)
+            clustering: 本批聚类语义 (同 EntityResolver)
+            similarity: 相似度后端 (同 EntityResolver，也用于匹配已有标准名)
+            top_k: tfidf 后端每个实体保留的近邻数
+        """
+        self.path = str(path)
+        self.threshold = threshold
+
+        # 本批聚类与相似度验证复用 EntityResolver 的实现 (与管道配置一致)
+        self.resolver = EntityResolver(
+            threshold=threshold,
+            blocking=blocking,
+            clustering=clustering,
+            similarity=similarity,
+            top_k=top_k,
+        )
+
+        # 静态 token 顺序: 分块键跨运行稳定 (已有标准名始终按前缀分块键查找，与 blocking 无关)
+        self.index = PrefixBlockIndex(threshold) if threshold > 0 else None
+
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(_SCHEMA)
+        self._check_threshold()
+        self.stats = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM canonicals").fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def _check_threshold(self):
+        """阈值变化时分块键失效，按当前阈值重建"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'threshold'").fetchone()
+        if row is not None and float(row[0]) == self.threshold:
+            return
+
+        with self.conn:
+            self.conn.execute("DELETE FROM block_keys")
+            rows = self.conn.execute("SELECT id, name FROM canonicals").fetchall()
+            self.conn.executemany(
+                "INSERT INTO block_keys (key, canonical_id) VALUES (?, ?)",
+                [(key, cid) for cid, name in rows for key in self._block_keys(name)],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('threshold', ?)",
+                (repr(self.threshold),),
+            )
+
+    def _block_keys(self, name: str) -> list[str]:
+        """序列化分块键 (写入时)"""
+        if self.index is None:
+            return []
+        return [f"{band}:{k}:{ch}" for (ch, k), band in self.index.block_keys(name)]
+
+    def _probe_keys(self, name: str) -> list[str]:
+        """序列化探查键 (查询时，含相邻长度带)"""
+        if self.index is None:
+            return []
+        return [f"{band}:{k}:{ch}" for (ch, k), band in self.index.probe_keys(name)]
+
+    def lookup(self, name: str):
+        """
+        查询已知名称的标准名
+
+        Args:
+            name: 实体名
+
+        Returns:
+            标准名；未知名称返回 None
+        """
+        row = self.conn.execute(
+            "SELECT c.name FROM aliases a JOIN canonicals c ON c.id = a.canonical_id "
+            "WHERE a.alias = ?",
+            (name,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _lookup_many(self, names: list[str]) -> dict:
+        """批量查询已知名称 -> 标准名"""
+        known = {}
+        for start in range(0, len(names), _BATCH_SIZE):
+            batch = names[start:start + _BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                "SELECT a.alias, c.name FROM aliases a JOIN canonicals c ON c.id = a.canonical_id "
+                f"WHERE a.alias IN ({placeholders})",
+                batch,
+            )
+            known.update(rows)
+        return known
+
+    def _find_canonical(self, name: str):
+        """
+        按分块键查找与 name 相似的已有标准名
+
+        Args:
+            name: 实体名
+
+        Returns:
+            (canonical_id, 标准名)；无匹配返回 None
+        """
+        keys = self._probe_keys(name)
+        if keys:
+            placeholders = ",".join("?" * len(keys))
+            rows = self.conn.execute(
+                "SELECT DISTINCT c.id, c.name FROM block_keys b JOIN canonicals c ON c.id = b.canonical_id "
+                f"WHERE b.key IN ({placeholders})",
+                keys,
+            ).fetchall()
+        elif self.threshold <= 0:
+            rows = self.conn.execute("SELECT id, name FROM canonicals").fetchall()
+        else:
+            rows = []
+
+        best = None
+        best_score = None
+        for cid, canonical in rows:
+            sim = self.resolver.score(canonical, name)
+            if sim < self.threshold:
+                continue
+            score = (sim, self.resolver._canonical_score(canonical))
+            if best_score is None or score > best_score:
+                best, best_score = (cid, canonical), score
+
+        return best
+
+    def _add_canonical(self, name: str) -> int:
+        """写入新标准名及其分块键"""
+        cid = self.conn.execute("INSERT INTO canonicals (name) VALUES (?)", (name,)).lastrowid
+        self.conn.executemany(
+            "INSERT INTO block_keys (key, canonical_id) VALUES (?, ?)",
+            [(key, cid) for key in self._block_keys(name)],
+        )
+        return cid
+
+    def resolve(self, names: list[str]) -> dict:
+        """
+        增量解析一批实体名
+
+        1. 已知名称 (别名或标准名) 直接查表
+        2. 未知名称在本批内聚类 (与 EntityResolver 相同语义)
+        3. 每个新簇的代表按分块键匹配已有标准名；匹配则整簇并入，
+           否则代表成为新标准名。结果写回注册表。
+
+        self.stats 记录本批的已知名称数、并入已有标准名的簇数与新增标准名数
+        (由解析过程累计，不做整表计数)。
+
+        Args:
+            names: 实体名列表 (可重复)
+
+        Returns:
+            {名称: 标准名}，覆盖所有非空输入名称
+        """
+        distinct = list(dict.fromkeys(name for name in names if name))
+        mapping = self._lookup_many(distinct)
+
+        unknown = [name for name in distinct if name not in mapping]
+        stats = self.stats = {"known": len(mapping), "matched_canonicals": 0, "new_canonicals": 0}
+        if not unknown:
+            return mapping
+
+        clusters = self.resolver.cluster(unknown)
+
+        with self.conn:
+            for cluster in clusters:
+                rep = max(cluster, key=lambda idx: self.resolver._canonical_score(unknown[idx]))
+                rep_name = unknown[rep]
+
+                match = self._find_canonical(rep_name)
+                if match is not None:
+                    cid, canonical = match
+                    stats["matched_canonicals"] += 1
+                else:
+                    cid, canonical = self._add_canonical(rep_name), rep_name
+                    stats["new_canonicals"] += 1
+
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO aliases (alias, canonical_id) VALUES (?, ?)",
+                    [(unknown[idx], cid) for idx in cluster],
+                )
+                for idx in cluster:
+                    mapping[unknown[idx]] = canonical
+
+        return mapping
+
+
+if __name__ == "__main__":
+    # 测试示例: 两次运行，第二次的新实体并入已有标准名
+    registry = AliasRegistry(":memory:", threshold=0.7)
+
+    first = registry.resolve(["MGMultiGateSolver", "MGMultiGateSolvr", "Actor"])
+    second = registry.resolve(["MGMultiGateSolver2", "Actor", "CreateActorCommand"])
+
+    print("第一次:", first)
+    print("第二次:", second, registry.stats)
+    print("标准名数:", len(registry))
@@ -0,0 +1,718 @@
+"""
+Entity Candidate Index Module
+
+实体消歧的候选对生成，避免 O(n²) 全量相似度比较：
+- PrefixBlockIndex: 字符前缀过滤分块 + 长度带 (无损，与全量比较结果一致)
+- MinHashLSHIndex: 字符 shingle 的 MinHash + LSH 分带 (近似，适合超大规模)
+- AhoCorasick: 多模式匹配自动机，一遍扫描找出所有子串包含对
+- TfidfIndex: 词元 (CamelCase/snake_case) + 字符 n-gram 的 TF-IDF 余弦近邻
+
+候选对只是"可能相似"的实体对，最终仍由 EntityResolver._similarity 验证。
+"""
+
+import heapq
+import math
+import random
+import re
+import zlib
+from collections import Counter, deque
+
+
+# 浮点比较容差
+_EPS = 1e-9
+
+# 静态字符顺序 (越靠后越常见)，用于无法预先统计全局频率的增量场景
+_COMMON_CHARS = "zqjxkvbpygfwmucdlhrsnioate _"
+
+
+def min_length_ratio(threshold: float) -> float:
+    """
+    相似度达到 threshold 时 len(短名)/len(长名) 的下界
+
+    SequenceMatcher.ratio = 2M/(la+lb) <= 2*短/(短+长)，
+    包含关系 0.9*短/长 的约束更严，故 短/长 >= t/(2-t)。
+
+    Args:
+        threshold: 相似度阈值
+
+    Returns:
+        长度比下界 [0, 1]
+    """
+    if threshold >= 1.0:
+        return 1.0
+    if threshold <= 0.0:
+        return 0.0
+    return threshold / (2.0 - threshold)
+
+
+def char_tokens(name: str) -> list[tuple]:
+    """
+    将名称拆为字符多重集 token: (字符, 第k次出现)
+
+    Args:
+        name: 实体名
+
+    Returns:
+        token 列表
+    """
+    seen = Counter()
+    tokens = []
+    for ch in name:
+        tokens.append((ch, seen[ch]))
+        seen[ch] += 1
+    return tokens
+
+
+def static_token_order(token: tuple) -> tuple:
+    """
+    静态 token 排序键: 稀有字符 (大写/数字/符号/CJK) 优先
+
+    Args:
+        token: (字符, 出现序号)
+
+    Returns:
+        排序键
+    """
+    ch, k = token
+    return (_COMMON_CHARS.find(ch), ch.islower(), ch, k)
+
+
+class PrefixBlockIndex:
+    """
+    前缀过滤分块索引 (无损)
+
+    两个名称相似度 >= threshold 时，其字符多重集交集 >= ceil(r * len)，
+    r = min_length_ratio(threshold)。按全局 token 顺序排序后，只需比较
+    前 len - ceil(r*len) + 1 个 token 即可保证不漏掉任何相似对。
+    分块键为 (token, 长度带)，长度带宽度为 log(1/r)，只需探查相邻带。
+    """
+
+    def __init__(self, threshold: float, order=None):
+        """
+        Args:
+            threshold: 相似度阈值 (必须 > 0)
+            order: token 排序键函数 (默认静态顺序)
+        """
+        if threshold <= 0:
+            raise ValueError("PrefixBlockIndex requires threshold > 0")
+
+        self.threshold = threshold
+        self.ratio = min_length_ratio(threshold)
+        self.order = order or static_token_order
+
+        # 长度带宽度 (略放大，防止浮点误差跨越两个带)
+        if self.ratio < 1.0:
+            self._band_width = math.log(1.0 / self.ratio) * (1 + _EPS)
+        else:
+            self._band_width = None
+
+        self._blocks = {}    # (token, band) -> [item_id]
+        self._lengths = {}   # item_id -> len(name)
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def _band(self, length: int) -> int:
+        """计算长度带编号"""
+        if self._band_width is None:
+            return length
+        return int(math.log(length) / self._band_width)
+
+    def prefix(self, name: str) -> list[tuple]:
+        """
+        计算名称的前缀 token (分块键)
+
+        Args:
+            name: 实体名
+
+        Returns:
+            前缀 token 列表
+        """
+        length = len(name)
+        min_overlap = max(1, math.ceil(self.ratio * length - _EPS))
+        tokens = sorted(char_tokens(name), key=self.order)
+        return tokens[:length - min_overlap + 1]
+
+    def block_keys(self, name: str) -> list[tuple]:
+        """
+        计算名称的分块键 (token, 长度带)
+
+        Args:
+            name: 实体名
+
+        Returns:
+            分块键列表
+        """
+        if not name:
+            return []
+        band = self._band(len(name))
+        return [(token, band) for token in self.prefix(name)]
+
+    def probe_keys(self, name: str) -> list[tuple]:
+        """
+        查询时需探查的分块键 (前缀 token × 相邻长度带)
+
+        Args:
+            name: 实体名
+
+        Returns:
+            分块键列表
+        """
+        if not name:
+            return []
+        band = self._band(len(name))
+        return [
+            (token, probe)
+            for token in self.prefix(name)
+            for probe in (band - 1, band, band + 1)
+        ]
+
+    def add(self, item_id, name: str):
+        """
+        加入索引
+
+        Args:
+            item_id: 条目标识
+            name: 实体名 (空名不入索引)
+        """
+        if not name:
+            return
+        self._lengths[item_id] = len(name)
+        for key in self.block_keys(name):
+            self._blocks.setdefault(key, []).append(item_id)
+
+    def query(self, name: str) -> set:
+        """
+        查询与 name 共享分块且满足长度带约束的条目
+
+        Args:
+            name: 实体名
+
+        Returns:
+            候选条目标识集合
+        """
+        if not name:
+            return set()
+
+        length = len(name)
+        candidates = set()
+
+        for key in self.probe_keys(name):
+            for item_id in self._blocks.get(key, ()):
+                other = self._lengths[item_id]
+                if min(length, other) >= self.ratio * max(length, other) - _EPS:
+                    candidates.add(item_id)
+
+        return candidates
+
+    @classmethod
+    def candidate_pairs(cls, names: list[str], threshold: float) -> set[tuple[int, int]]:
+        """
+        批量自连接: 生成所有候选对 (i, j), i < j
+
+        批量模式下按全局频率排序 token (稀有优先)，前缀更有区分度。
+
+        Args:
+            names: 实体名列表
+            threshold: 相似度阈值
+
+        Returns:
+            候选对集合
+        """
+        freq = Counter()
+        for name in names:
+            freq.update(char_tokens(name))
+
+        index = cls(threshold, order=lambda token: (freq[token], token))
+        pairs = set()
+
+        for j, name in enumerate(names):
+            for i in index.query(name):
+                pairs.add((i, j))
+            index.add(j, name)
+
+        return pairs
+
+
+# MinHash 置换使用的梅森素数 (2^61 - 1)
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _band_probability_integral(lo: float, hi: float, bands: int, rows: int, miss: bool) -> float:
+    """
+    数值积分 LSH 命中概率曲线 1-(1-s^r)^b (miss=True 时积分其补)
+
+    Args:
+        lo, hi: 积分区间
+        bands, rows: 分带数与每带行数
+        miss: 是否积分漏检概率
+
+    Returns:
+        积分值
+    """
+    steps = 100
+    width = (hi - lo) / steps
+    total = 0.0
+    for k in range(steps):
+        s = lo + (k + 0.5) * width
+        hit = 1.0 - (1.0 - s ** rows) ** bands
+        total += (1.0 - hit) if miss else hit
+    return total * width
+
+
+def optimal_bands(jaccard: float, num_perm: int,
+                  fp_weight: float = 0.3, fn_weight: float = 0.7) -> tuple[int, int]:
+    """
+    为目标 Jaccard 阈值选择 (bands, rows)，最小化加权误检 + 漏检面积
+
+    漏检权重更高: 候选对还会经过 _similarity 精确验证，误检只多花一次比较。
+
+    Args:
+        jaccard: 目标 Jaccard 阈值
+        num_perm: MinHash 置换数 (bands * rows <= num_perm)
+        fp_weight: 误检权重
+        fn_weight: 漏检权重
+
+    Returns:
+        (bands, rows)
+    """
+    best = None
+    best_error = float('inf')
+
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            fp = _band_probability_integral(0.0, jaccard, bands, rows, miss=False)
+            fn = _band_probability_integral(jaccard, 1.0, bands, rows, miss=True)
+            error = fp_weight * fp + fn_weight * fn
+            if error < best_error:
+                best_error = error
+                best = (bands, rows)
+
+    return best
+
+
+class MinHashLSHIndex:
+    """
+    MinHash + LSH 分带索引 (近似)
+
+    对名称的字符 shingle 计算 MinHash 签名，按带哈希入桶；
+    共享任一桶的条目为候选对。分带参数由相似度阈值推导
+    (SequenceMatcher.ratio 近似 Dice 系数，对应 Jaccard = t/(2-t))。
+
+    索引可增量构建，只保存桶而不保存签名；
+    单桶条目数超过 max_bucket_size 后不再追加，内存有界。
+    """
+
+    def __init__(self, threshold: float, num_perm: int = 64, shingle_size: int = 3,
+                 max_bucket_size: int = 256, seed: int = 1):
+        """
+        Args:
+            threshold: 相似度阈值
+            num_perm: MinHash 置换数
+            shingle_size: 字符 shingle 长度
+            max_bucket_size: 单桶最大条目数
+            seed: 置换随机种子 (固定种子保证跨进程签名一致)
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.max_bucket_size = max_bucket_size
+
+        # Dice -> Jaccard 换算与长度比下界同为 t/(2-t)
+        jaccard = min_length_ratio(threshold)
+        self.bands, self.rows = optimal_bands(jaccard, num_perm)
+
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(self.bands * self.rows)
+        ]
+
+        self._buckets = [{} for _ in range(self.bands)]  # band -> {band_key: [item_id]}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def shingles(self, name: str) -> set[str]:
+        """
+        计算字符 shingle (短于 shingle_size 的名称整体作为一个 shingle)
+
+        Args:
+            name: 实体名
+
+        Returns:
+            shingle 集合
+        """
+        k = self.shingle_size
+        if len(name) <= k:
+            return {name}
+        return {name[i:i + k] for i in range(len(name) - k + 1)}
+
+    def signature(self, name: str) -> list[int]:
+        """
+        计算 MinHash 签名
+
+        Args:
+            name: 实体名
+
+        Returns:
+            签名 (长度 bands * rows)
+        """
+        hashes = [zlib.crc32(sh.encode('utf-8')) for sh in self.shingles(name)]
+        return [
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self._perms
+        ]
+
+    def band_keys(self, name: str) -> list[int]:
+        """
+        计算每个带的桶键
+
+        Args:
+            name: 实体名
+
+        Returns:
+            桶键列表 (长度 bands)
+        """
+        sig = self.signature(name)
+        rows = self.rows
+        return [hash(tuple(sig[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def add(self, item_id, name: str):
+        """
+        加入索引
+
+        Args:
+            item_id: 条目标识
+            name: 实体名 (空名不入索引)
+        """
+        if not name:
+            return
+        self._add_keys(item_id, self.band_keys(name))
+
+    def _add_keys(self, item_id, keys: list[int]):
+        """按预先计算的桶键入桶"""
+        self._count += 1
+        for bucket, key in zip(self._buckets, keys):
+            items = bucket.setdefault(key, [])
+            if len(items) < self.max_bucket_size:
+                items.append(item_id)
+
+    def query(self, name: str) -> set:
+        """
+        查询与 name 共享任一桶的条目
+
+        Args:
+            name: 实体名
+
+        Returns:
+            候选条目标识集合
+        """
+        if not name:
+            return set()
+        return self._query_keys(self.band_keys(name))
+
+    def _query_keys(self, keys: list[int]) -> set:
+        """按预先计算的桶键查询"""
+        candidates = set()
+        for bucket, key in zip(self._buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        return candidates
+
+    @classmethod
+    def candidate_pairs(cls, names: list[str], threshold: float, **kwargs) -> set[tuple[int, int]]:
+        """
+        批量自连接: 生成所有候选对 (i, j), i < j
+
+        Args:
+            names: 实体名列表
+            threshold: 相似度阈值
+            **kwargs: 传给构造函数的索引参数
+
+        Returns:
+            候选对集合
+        """
+        index = cls(threshold, **kwargs)
+        pairs = set()
+
+        for j, name in enumerate(names):
+            if not name:
+                continue
+            keys = index.band_keys(name)
+            for i in index._query_keys(keys):
+                pairs.add((i, j))
+            index._add_keys(j, keys)
+
+        return pairs
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多模式匹配自动机
+
+    构建: O(模式总长)；扫描: O(文本长度 + 命中数)。
+    """
+
+    def __init__(self, patterns: list[str]):
+        """
+        Args:
+            patterns: 模式串列表 (空串忽略)；模式编号即列表下标
+        """
+        self.lengths = [len(p) for p in patterns]
+
+        self._goto = [{}]       # 状态 -> {字符: 状态}
+        self._fail = [0]        # 失配链接
+        self._output = [[]]     # 状态 -> 以此状态结尾的模式编号
+        self._dict_link = [-1]  # 沿失配链最近的有输出状态
+
+        for pid, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._dict_link.append(-1)
+                state = nxt
+            self._output[state].append(pid)
+
+        self._build_links()
+
+    def _build_links(self):
+        """BFS 构建失配链接与输出链接"""
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = fail
+
+                self._dict_link[nxt] = fail if self._output[fail] else self._dict_link[fail]
+
+    def _states(self, text: str):
+        """逐字符推进自动机，产出 (位置, 状态)"""
+        goto, fail = self._goto, self._fail
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            yield pos, state
+
+    def iter_matches(self, text: str):
+        """
+        产出文本中所有模式出现
+
+        Args:
+            text: 待扫描文本
+
+        Yields:
+            (start, end, pattern_id)，end 不含
+        """
+        for pos, state in self._states(text):
+            node = state if self._output[state] else self._dict_link[state]
+            while node != -1:
+                for pid in self._output[node]:
+                    yield pos + 1 - self.lengths[pid], pos + 1, pid
+                node = self._dict_link[node]
+
+    def matched_patterns(self, text: str) -> set[int]:
+        """
+        文本中出现过的模式编号 (去重)
+
+        同一输出状态只沿链接展开一次，代价与不同命中数成正比。
+
+        Args:
+            text: 待扫描文本
+
+        Returns:
+            模式编号集合
+        """
+        seen = set()
+        matched = set()
+
+        for _, state in self._states(text):
+            node = state if self._output[state] else self._dict_link[state]
+            while node != -1 and node not in seen:
+                seen.add(node)
+                matched.update(self._output[node])
+                node = self._dict_link[node]
+
+        return matched
+
+
+def containment_pairs(names: list[str]) -> set[tuple[int, int]]:
+    """
+    找出所有子串包含对 (names[i] in names[j] 或反之)，i < j
+
+    对全部名称建一个 Aho-Corasick 自动机，每个名称扫描一遍，
+    代价与名称总长 + 包含对数成正比，不做两两子串检查。
+
+    Args:
+        names: 实体名列表
+
+    Returns:
+        包含对集合 (相同名称也算互相包含)
+    """
+    automaton = AhoCorasick(names)
+    pairs = set()
+
+    for j, name in enumerate(names):
+        for i in automaton.matched_patterns(name):
+            if i != j:
+                pairs.add((i, j) if i < j else (j, i))
+
+    return pairs
+
+
+# 词元切分: 大写缩写 / 首字母大写单词 / 小写单词 / 数字 (下划线、空格等作为分隔)
+_WORD_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+|[^\W\d_]+")
+
+
+def name_words(name: str) -> list[str]:
+    """
+    按 CamelCase / snake_case / 空格切分名称为小写词元
+
+    "MGMultiGateSolver" -> ["mg", "multi", "gate", "solver"]
+    "multi gate solver" -> ["multi", "gate", "solver"]
+
+    Args:
+        name: 实体名
+
+    Returns:
+        词元列表
+    """
+    return [word.lower() for word in _WORD_PATTERN.findall(name)]
+
+
+class TfidfIndex:
+    """
+    TF-IDF 余弦近邻索引
+
+    特征 = 词元 + 去分隔符小写串的字符 n-gram，按 IDF 加权后 L2 归一化。
+    近邻查询走倒排表做稀疏向量点积，只触及共享特征的条目。
+    """
+
+    def __init__(self, ngram: int = 3):
+        """
+        Args:
+            ngram: 字符 n-gram 长度
+        """
+        self.ngram = ngram
+
+    def features(self, name: str) -> Counter:
+        """
+        名称的特征计数
+
+        Args:
+            name: 实体名
+
+        Returns:
+            {特征: 次数}
+        """
+        words = name_words(name)
+        feats = Counter(f"w:{word}" for word in words)
+
+        joined = "".join(words)
+        k = self.ngram
+        if len(joined) <= k:
+            if joined:
+                feats[f"c:{joined}"] += 1
+        else:
+            feats.update(f"c:{joined[i:i + k]}" for i in range(len(joined) - k + 1))
+
+        return feats
+
+    def vectors(self, names: list[str]) -> list[dict]:
+        """
+        计算所有名称的归一化 TF-IDF 向量
+
+        Args:
+            names: 实体名列表
+
+        Returns:
+            [{特征: 权重}, ...]
+        """
+        counts = [self.features(name) for name in names]
+
+        df = Counter()
+        for feats in counts:
+            df.update(feats.keys())
+
+        n = len(names)
+        idf = {feat: math.log((1 + n) / (1 + freq)) + 1.0 for feat, freq in df.items()}
+
+        vectors = []
+        for feats in counts:
+            vec = {feat: tf * idf[feat] for feat, tf in feats.items()}
+            norm = math.sqrt(sum(w * w for w in vec.values()))
+            vectors.append({feat: w / norm for feat, w in vec.items()} if norm else {})
+
+        return vectors
+
+    def neighbors(self, names: list[str], threshold: float, top_k: int = 10) -> dict:
+        """
+        每个名称余弦相似度 >= threshold 的 top-k 近邻
+
+        Args:
+            names: 实体名列表
+            threshold: 余弦阈值
+            top_k: 每个名称最多保留的近邻数
+
+        Returns:
+            {(i, j): 余弦}，i < j (两端任一方的 top-k 均保留)
+        """
+        vectors = self.vectors(names)
+
+        # 倒排表: 特征 -> [(条目, 权重)]
+        postings = {}
+        for idx, vec in enumerate(vectors):
+            for feat, weight in vec.items():
+                postings.setdefault(feat, []).append((idx, weight))
+
+        pairs = {}
+        for i, vec in enumerate(vectors):
+            scores = {}
+            for feat, weight in vec.items():
+                for j, other in postings[feat]:
+                    if j != i:
+                        scores[j] = scores.get(j, 0.0) + weight * other
+
+            hits = [(score, j) for j, score in scores.items() if score >= threshold - _EPS]
+            for score, j in heapq.nlargest(top_k, hits):
+                pairs[(i, j) if i < j else (j, i)] = min(1.0, score)
+
+        return pairs
+
+
+if __name__ == "__main__":
+    # 测试示例
+    names = ["MLevel", "MMultiGateLevel", "MGLevel", "Actor", "ActorData", "Solver"]
+
+    total = len(names) * (len(names) - 1) // 2
+
+    for index_cls in (PrefixBlockIndex, MinHashLSHIndex):
+        pairs = index_cls.candidate_pairs(names, threshold=0.7)
+        print(f"{index_cls.__name__} 候选对: {len(pairs)}/{total}")
+        for i, j in sorted(pairs):
+            print(f"  {names[i]} <-> {names[j]}")
+
+    print("TF-IDF 近邻:")
+    for (i, j), score in sorted(TfidfIndex().neighbors(names, 0.3).items()):
+        print(f"  {names[i]} <-> {names[j]}: {score:.3f}")
+
+    print("包含对:")
+    for i, j in sorted(containment_pairs(names)):
+        print(f"  {names[i]} <-> {names[j]}")
@@ -3,22 +3,208 @@ Entity Resolution Module
 
 实体消歧和合并：
 - 检测相似实体名称（包含关系 + 编辑距离）
-- 贪心聚类，选择最长名称为标准名
-- 更新所有引用（relation 中的 from/to）
+- 分块生成候选对，避免 O(n²) 全量比较 (见 entity_index.py)
+- 分级上界预过滤 (长度比 → 字符多重集)，不可能达标的对跳过完整 ratio
+- 贪心聚类 (顺序相关) 或并查集传递聚类，选择最长名称为标准名
+- 可选 TF-IDF 余弦相似度后端 (词元 + 字符 n-gram，倒排表求 top-k 近邻)
+- 可选持久化别名注册表，跨运行保持标准名稳定 (见 alias_registry.py)
+- 在线模式: add() 增量消歧，订阅者接收别名映射增量
+- 单遍更新所有引用字段 (from/to、from_entity/to_entity、related_entities)，写时复制
 """
 
 import difflib
+from collections import Counter
+from functools import lru_cache
+
+from entity_index import MinHashLSHIndex, PrefixBlockIndex, TfidfIndex, containment_pairs
+
+
+# 候选生成策略: 名称 -> 索引类
+BLOCKING_INDEXES = {
+    "prefix": PrefixBlockIndex,     # 无损
+    "minhash": MinHashLSHIndex,     # 近似，适合超大规模
+}
+
+# 无损策略: 候选对已覆盖所有相似对 (含包含关系)
+LOSSLESS_BLOCKING = {"prefix"}
+
+# 快速精确 ratio 的长度上限 (len(b) >= 200 时 SequenceMatcher 启用 autojunk)
+_FAST_RATIO_MAX_LEN = 200
+
+
+@lru_cache(maxsize=8192)
+def _char_counts(name: str) -> Counter:
+    """名称的字符多重集 (缓存，同一名称会与大量候选比较)"""
+    return Counter(name)
+
+
+@lru_cache(maxsize=8192)
+def _char_positions(name: str) -> dict:
+    """名称中每个字符的出现位置 (等价于 SequenceMatcher.b2j，无 junk)"""
+    positions = {}
+    for j, ch in enumerate(name):
+        positions.setdefault(ch, []).append(j)
+    return positions
+
+
+def _matching_chars(a: str, b: str) -> int:
+    """
+    计算 SequenceMatcher(None, a, b) 的匹配字符总数
+
+    与 difflib 的 Ratcliff-Obershelp 算法逐步一致 (同样的最长匹配块
+    选取与并列规则)，但缓存 b 的位置表并省去 Match 对象开销。
+    仅适用于 len(b) < 200 (不触发 autojunk)。
+
+    Args:
+        a, b: 实体名
+
+    Returns:
+        匹配字符数
+    """
+    b2j = _char_positions(b)
+    total = 0
+    stack = [(0, len(a), 0, len(b))]
+
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        # find_longest_match: 最长块，并列时取 a 中最靠前、再取 b 中最靠前
+        besti, bestj, bestk = alo, blo, 0
+        j2len = {}
+        for i in range(alo, ahi):
+            new_j2len = {}
+            for j in b2j.get(a[i], ()):
+                if j < blo:
+                    continue
+                if j >= bhi:
+                    break
+                k = new_j2len[j] = j2len.get(j - 1, 0) + 1
+                if k > bestk:
+                    besti, bestj, bestk = i - k + 1, j - k + 1, k
+            j2len = new_j2len
+
+        if bestk:
+            total += bestk
+            if alo < besti and blo < bestj:
+                stack.append((alo, besti, blo, bestj))
+            if besti + bestk < ahi and bestj + bestk < bhi:
+                stack.append((besti + bestk, ahi, bestj + bestk, bhi))
+
+    return total
+
+
+class UnionFind:
+    """并查集 (路径减半 + 按大小合并)"""
+
+    def __init__(self, size: int = 0):
+        """
+        Args:
+            size: 初始元素个数 (元素为 0..size-1)
+        """
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def add(self) -> int:
+        """新增一个元素，返回其编号"""
+        self.parent.append(len(self.parent))
+        self.size.append(1)
+        return len(self.parent) - 1
+
+    def find(self, x: int) -> int:
+        """查找根节点 (路径减半)"""
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> bool:
+        """
+        合并两个集合
+
+        Returns:
+            True 如果原本不在同一集合
+        """
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return True
+
+    def groups(self) -> list[list[int]]:
+        """
+        按最小成员编号排序的所有集合 (成员升序)
+
+        Returns:
+            [[member, ...], ...]
+        """
+        groups = {}
+        for x in range(len(self.parent)):
+            groups.setdefault(self.find(x), []).append(x)
+        return list(groups.values())
+
+
+# 聚类语义
+CLUSTERING_MODES = ("greedy", "transitive")
+
+# 相似度后端
+# sequence: 包含关系 + SequenceMatcher (字符级)
+# tfidf: 词元 + 字符 n-gram 的 TF-IDF 余弦 (MGMultiGateSolver ~ multi gate solver)
+SIMILARITY_BACKENDS = ("sequence", "tfidf")
+
+# 引用实体名的字段 (relation 的 from/to 与 schema 中的 from_entity/to_entity)
+REFERENCE_FIELDS = ("from", "to", "from_entity", "to_entity")
+
+# 引用实体名列表的字段
+REFERENCE_LIST_FIELDS = ("related_entities",)
 
 
 class EntityResolver:
     """实体消歧合并器"""
 
-    def __init__(self, threshold: float = 0.7):
+    def __init__(self, threshold: float = 0.7, blocking: str = "prefix",
+                 clustering: str = "greedy", registry=None,
+                 similarity: str = "sequence", top_k: int = 10):
         """
         Args:
             threshold: 相似度阈值 (默认0.7)
+            blocking: 候选生成策略 (默认"prefix")。
+                      "prefix": 前缀分块，无损，合并结果与全量比较一致；
+                      "minhash": MinHash LSH，近似，适合数十万实体；
+                      None: 全量两两比较。
+            clustering: 聚类语义 (默认"greedy")。
+                        "greedy": 以种子为中心，只收与种子相似的实体 (顺序相关)；
+                        "transitive": 并查集，相似关系传递闭包 (顺序无关)。
+            registry: 持久化别名注册表 (AliasRegistry，可选)。
+                      提供时按注册表增量解析，已有标准名保持不变。
+            similarity: 聚类使用的相似度后端 (默认"sequence")。
+                        "tfidf": 余弦相似度，候选为每个实体的 top-k 近邻，
+                        此时 blocking 不生效。
+            top_k: tfidf 后端每个实体保留的近邻数
         """
+        if blocking is not None and blocking not in BLOCKING_INDEXES:
+            raise ValueError(f"Unknown blocking strategy: {blocking}")
+        if clustering not in CLUSTERING_MODES:
+            raise ValueError(f"Unknown clustering mode: {clustering}")
+        if similarity not in SIMILARITY_BACKENDS:
+            raise ValueError(f"Unknown similarity backend: {similarity}")
+
         self.threshold = threshold
+        self.blocking = blocking
+        self.clustering = clustering
+        self.registry = registry
+        self.similarity = similarity
+        self.top_k = top_k
+        self.stats = {}
+
+        # 在线 (流式) 消歧状态，见 add()
+        self._online_index = None
+        self._canonical_of = {}   # 名称 -> 当前标准名
+        self._members = {}        # 标准名 -> [成员名]
+        self._subscribers = []
 
     def process(self, extractions: list[dict]) -> list[dict]:
         """
@@ -34,41 +220,197 @@ class EntityResolver:
         entities = [e for e in extractions if e.get('type') == 'entity']
         non_entities = [e for e in extractions if e.get('type') != 'entity']
 
-        if len(entities) <= 1:
+        # 注册表模式下单个实体也可能是已知别名
+        min_entities = 1 if self.registry is not None else 2
+        if len(entities) < min_entities:
+            self.stats = {}
             return extractions  # 没有足够的实体需要去重
 
-        # 聚类相似实体
-        clusters = self._cluster(entities)
+        names = [e.get('text', '') for e in entities]
 
-        # 构建别名映射表 (旧名 -> 标准名)
-        alias_map = self._build_alias_map(clusters)
-
-        # 合并实体：找出每个簇应保留的实体在原始列表中的索引
-        representative_indices = set()
-        for cluster in clusters:
-            representative = max(cluster, key=lambda e: self._canonical_score(e.get('text', '')))
-            # 找到代表在原始 entities 列表中的索引
-            for idx, entity in enumerate(entities):
-                if entity is representative:
-                    representative_indices.add(idx)
-                    break
+        # 聚类相似实体 (簇为 entities 下标列表)
+        if self.registry is not None:
+            clusters, canonical_names = self._cluster_with_registry(names)
+        else:
+            clusters = self._cluster(names)
+            canonical_names = None
 
-        # 构建完整的保留索引集 (基于在 extractions 中的位置)
-        keep_entity_indices = set()
-        entity_idx = 0
-        for i, ext in enumerate(extractions):
-            if ext.get('type') == 'entity':
-                if entity_idx in representative_indices:
-                    keep_entity_indices.add(i)
-                entity_idx += 1
+        return self._merge(extractions, names, clusters, canonical_names)
+
+    def add(self, entities: list[dict]) -> dict:
+        """
+        在线消歧: 增量加入一批实体，返回别名映射增量
+
+        每个新名称只与相似度索引中的候选标准名比较，单批延迟不随
+        已有实体数增长。新名称的 canonical_score 更高时成为簇的新标准名，
+        旧标准名及其别名一并重指向 (增量中包含这些重指向)。
+
+        Args:
+            entities: 提取项列表 (非实体项忽略)
 
-        # 重写所有引用（relation 的 from/to）
+        Returns:
+            {名称: 标准名} 增量；同时推送给所有订阅者
+        """
+        if self._online_index is None:
+            self._online_index = self._make_online_index()
+
+        delta = {}
+
+        for ext in entities:
+            if ext.get('type') != 'entity':
+                continue
+            name = ext.get('text', '')
+            if not name or name in self._canonical_of:
+                continue
+
+            canonical = self._online_match(name)
+
+            if canonical is None:
+                # 新簇
+                self._canonical_of[name] = name
+                self._members[name] = [name]
+            elif self._canonical_score(name) > self._canonical_score(canonical):
+                # 新名称更适合作标准名: 整簇重指向
+                members = self._members.pop(canonical)
+                members.append(name)
+                self._members[name] = members
+                for member in members:
+                    self._canonical_of[member] = name
+                    if member != name:
+                        delta[member] = name
+            else:
+                self._canonical_of[name] = canonical
+                self._members[canonical].append(name)
+                delta[name] = canonical
+
+            self._online_index_add(name)
+
+        if delta:
+            for callback in self._subscribers:
+                callback(dict(delta))
+
+        return delta
+
+    def subscribe(self, callback):
+        """
+        订阅在线消歧的别名映射增量
+
+        Args:
+            callback: 回调函数，参数为 {名称: 标准名} 增量
+        """
+        self._subscribers.append(callback)
+
+    @property
+    def alias_map(self) -> dict:
+        """在线消歧当前的完整别名映射 {旧名: 标准名}"""
+        return {name: canonical for name, canonical in self._canonical_of.items() if name != canonical}
+
+    def _make_online_index(self):
+        """在线消歧使用的增量索引 (静态 token 顺序，可持续追加)"""
+        if self.threshold <= 0:
+            return None
+        if self.blocking == "minhash":
+            return MinHashLSHIndex(self.threshold)
+        return PrefixBlockIndex(self.threshold)
+
+    def _online_index_add(self, name: str):
+        """名称入索引"""
+        if self._online_index is not None:
+            self._online_index.add(name, name)
+
+    def _online_match(self, name: str):
+        """
+        查找与 name 相似的已有簇 (按配置的相似度后端打分，见 score)
+
+        Args:
+            name: 新实体名
+
+        Returns:
+            最佳匹配簇的当前标准名；无匹配返回 None
+        """
+        if self._online_index is not None:
+            candidates = self._online_index.query(name)
+        else:
+            candidates = self._canonical_of.keys()
+
+        best = None
+        best_score = None
+        for other in candidates:
+            sim = self.score(other, name)
+            if sim < self.threshold:
+                continue
+            canonical = self._canonical_of[other]
+            score = (sim, self._canonical_score(canonical))
+            if best_score is None or score > best_score:
+                best, best_score = canonical, score
+
+        return best
+
+    def apply_alias_map(self, extractions: list[dict], alias_map: dict) -> list[dict]:
+        """
+        应用外部给定的别名映射 (如分片归约得到的全局映射)
+
+        同一标准名的实体只保留一个代表，并重写所有引用。
+
+        Args:
+            extractions: 提取项列表
+            alias_map: {旧名: 标准名}
+
+        Returns:
+            实体合并后的提取列表
+        """
+        names = [e.get('text', '') for e in extractions if e.get('type') == 'entity']
+        mapping = {name: alias_map.get(name, name) for name in names if name}
+        clusters, canonical_names = self._clusters_from_mapping(names, mapping)
+        self.stats = {"entities": len(names), "clusters": len(clusters)}
+        return self._merge(extractions, names, clusters, canonical_names, alias_map)
+
+    def _merge(self, extractions: list[dict], names: list[str], clusters: list[list[int]],
+               canonical_names: list[str] = None, extra_aliases: dict = None) -> list[dict]:
+        """
+        按簇合并实体: 每簇保留一个代表，重写引用
+
+        Args:
+            extractions: 提取项列表
+            names: 实体名列表 (与 extractions 中实体顺序一致)
+            clusters: 实体簇 (names 下标列表)
+            canonical_names: 每簇标准名 (可选，默认取代表名称)
+            extra_aliases: 额外别名 (可选，引用了本列表之外实体的别名也会重写)
+
+        Returns:
+            实体合并后的提取列表
+        """
+        # 每个簇的代表 (下标)
+        representatives = [
+            max(cluster, key=lambda idx: self._canonical_score(names[idx]))
+            for cluster in clusters
+        ]
+
+        # 构建别名映射表 (旧名 -> 标准名)
+        alias_map = self._build_alias_map(clusters, representatives, names, canonical_names)
+        if extra_aliases:
+            alias_map = {**extra_aliases, **alias_map}
+
+        # 实体下标 -> 在 extractions 中的位置
+        entity_positions = [i for i, ext in enumerate(extractions) if ext.get('type') == 'entity']
+        keep_entity_indices = {entity_positions[idx] for idx in representatives}
+
+        # 标准名与代表文本不同时，在代表上标注 canonical_name
+        renamed = {}
+        if canonical_names is not None:
+            for rep, canonical in zip(representatives, canonical_names):
+                if names[rep] and names[rep] != canonical:
+                    renamed[entity_positions[rep]] = canonical
+
+        # 重写所有引用字段
         updated_extractions = self._rewrite_references(extractions, alias_map)
 
         # 过滤掉被合并的实体 (只保留每个簇的代表)
         result = []
         for i, ext in enumerate(updated_extractions):
             if ext.get('type') == 'entity':
+                if i in renamed:
+                    ext = {**ext, 'canonical_name': renamed[i]}
                 if i in keep_entity_indices:
                     result.append(ext)
             else:
@@ -76,45 +418,271 @@ class EntityResolver:
 
         return result
 
-    def _cluster(self, entities: list[dict]) -> list[list[dict]]:
+    def cluster(self, names: list[str]) -> list[list[int]]:
         """
-        贪心聚类相似实体
+        按当前配置 (blocking / clustering / similarity) 聚类一批名称
 
         Args:
-            entities: 实体列表
+            names: 实体名列表
 
         Returns:
-            实体簇列表
+            实体簇列表 (每簇为升序下标列表)
+        """
+        return self._cluster(names)
+
+    def score(self, a: str, b: str) -> float:
+        """
+        按当前相似度后端计算两个名称的相似度
+
+        sequence 后端低于 threshold 时可能只返回上界；
+        tfidf 后端为两者 TF-IDF 向量的余弦。
+
+        Args:
+            a, b: 实体名
+
+        Returns:
+            相似度 [0, 1]
+        """
+        if self.similarity == "tfidf":
+            if not a or not b:
+                return 0.0
+            if a == b:
+                return 1.0
+            vec_a, vec_b = TfidfIndex().vectors([a, b])
+            return min(1.0, sum(w * vec_b.get(feat, 0.0) for feat, w in vec_a.items()))
+        return self._similarity(a, b, self.threshold)
+
+    def _cluster(self, names: list[str]) -> list[list[int]]:
+        """
+        聚类相似实体
+
+        只比较候选对 (分块生成或 TF-IDF 近邻)。greedy 模式按原始顺序
+        贪心分配，结果与全量两两比较一致；transitive 模式用并查集合并
+        所有相似对，已连通的对不再比较。
+
+        Args:
+            names: 实体名列表
+
+        Returns:
+            实体簇列表 (每簇为升序下标列表，簇按首个下标排序)
+        """
+        n = len(names)
+
+        if self.similarity == "tfidf":
+            scores = TfidfIndex().neighbors(names, self.threshold, self.top_k)
+            neighbors = [[] for _ in names]
+            for i, j in scores:
+                neighbors[i].append(j)
+            for others in neighbors:
+                others.sort()
+
+            # 近邻已按余弦阈值过滤
+            def is_similar(i, j):
+                return (i, j) in scores
+        else:
+            neighbors = self._candidate_neighbors(names)
+
+            def is_similar(i, j):
+                return self._similarity(names[i], names[j], self.threshold) >= self.threshold
+
+        if self.clustering == "transitive":
+            clusters, comparisons = self._cluster_transitive(n, neighbors, is_similar)
+        else:
+            clusters, comparisons = self._cluster_greedy(n, neighbors, is_similar)
+
+        total_pairs = n * (n - 1) // 2
+        if neighbors is not None:
+            candidate_pairs = sum(len(others) for others in neighbors)
+        else:
+            candidate_pairs = total_pairs
+
+        self.stats = {
+            "entities": n,
+            "total_pairs": total_pairs,
+            "candidate_pairs": candidate_pairs,
+            "comparisons": comparisons,
+            "clusters": len(clusters),
+        }
+
+        return clusters
+
+    def _cluster_with_registry(self, names: list[str]) -> tuple[list[list[int]], list[str]]:
+        """
+        按持久化注册表解析: 同一标准名的实体为一簇
+
+        Args:
+            names: 实体名列表
+
+        Returns:
+            (簇列表, 每簇标准名)
+        """
+        mapping = self.registry.resolve(names)
+        clusters, canonical_names = self._clusters_from_mapping(names, mapping)
+
+        self.stats = {
+            "entities": len(names),
+            "clusters": len(clusters),
+            "registry_known": self.registry.stats["known"],
+            "registry_matched": self.registry.stats["matched_canonicals"],
+            "registry_new": self.registry.stats["new_canonicals"],
+        }
+
+        return clusters, canonical_names
+
+    @staticmethod
+    def _clusters_from_mapping(names: list[str], mapping: dict) -> tuple[list[list[int]], list[str]]:
+        """
+        按 {名称: 标准名} 映射分簇
+
+        Args:
+            names: 实体名列表
+            mapping: {名称: 标准名}
+
+        Returns:
+            (簇列表, 每簇标准名)
+        """
+        clusters = []
+        canonical_names = []
+        cluster_of = {}  # 标准名 -> 簇编号
+
+        for idx, name in enumerate(names):
+            canonical = mapping.get(name) if name else None
+
+            # 空名不参与合并
+            if canonical is None:
+                clusters.append([idx])
+                canonical_names.append(name)
+                continue
+
+            k = cluster_of.get(canonical)
+            if k is None:
+                cluster_of[canonical] = len(clusters)
+                clusters.append([idx])
+                canonical_names.append(canonical)
+            else:
+                clusters[k].append(idx)
+
+        return clusters, canonical_names
+
+    @staticmethod
+    def _cluster_greedy(n: int, neighbors, is_similar) -> tuple[list[list[int]], int]:
+        """
+        贪心聚类: 每个未分配实体作为种子，收集与种子相似的后续实体
+
+        Args:
+            n: 实体数
+            neighbors: 候选邻居 (None 表示全量)
+            is_similar: (i, j) -> 是否相似
+
+        Returns:
+            (簇列表, 比较次数)
         """
         clusters = []
-        assigned = set()
+        assigned = [False] * n
+        comparisons = 0
 
-        for i, entity in enumerate(entities):
-            if i in assigned:
+        for i in range(n):
+            if assigned[i]:
                 continue
 
             # 创建新簇
-            cluster = [entity]
-            assigned.add(i)
+            cluster = [i]
+            assigned[i] = True
+
+            # 查找相似实体 (只看 j > i 的候选)
+            others = neighbors[i] if neighbors is not None else range(i + 1, n)
+            for j in others:
+                if assigned[j]:
+                    continue
+
+                comparisons += 1
+                if is_similar(i, j):
+                    cluster.append(j)
+                    assigned[j] = True
+
+            clusters.append(cluster)
+
+        return clusters, comparisons
+
+    @staticmethod
+    def _cluster_transitive(n: int, neighbors, is_similar) -> tuple[list[list[int]], int]:
+        """
+        传递聚类: 并查集合并所有相似候选对
 
-            name_i = entity.get('text', '')
+        Args:
+            n: 实体数
+            neighbors: 候选邻居 (None 表示全量)
+            is_similar: (i, j) -> 是否相似
 
-            # 查找相似实体
-            for j, other in enumerate(entities):
-                if j in assigned or j <= i:
+        Returns:
+            (簇列表, 比较次数)
+        """
+        uf = UnionFind(n)
+        comparisons = 0
+
+        for i in range(n):
+            others = neighbors[i] if neighbors is not None else range(i + 1, n)
+            for j in others:
+                # 已连通的对无需比较
+                if uf.find(i) == uf.find(j):
                     continue
 
-                name_j = other.get('text', '')
+                comparisons += 1
+                if is_similar(i, j):
+                    uf.union(i, j)
 
-                if self._similarity(name_i, name_j) >= self.threshold:
-                    cluster.append(other)
-                    assigned.add(j)
+        return uf.groups(), comparisons
 
-            clusters.append(cluster)
+    def _candidate_neighbors(self, names: list[str]):
+        """
+        生成每个实体的候选邻居 (只含 j > i，升序)
 
-        return clusters
+        Args:
+            names: 实体名列表
 
-    def _similarity(self, a: str, b: str) -> float:
+        Returns:
+            [[j, ...], ...]；未启用分块时返回 None (全量比较)
+        """
+        # threshold <= 0 时任意两项都"相似"，分块不再成立
+        if not self.blocking or self.threshold <= 0:
+            return None
+
+        index_cls = BLOCKING_INDEXES[self.blocking]
+        pairs = index_cls.candidate_pairs(names, self.threshold)
+
+        # 近似索引会漏掉长度差大的包含关系 (如 Solver ⊂ MGMultiGateSolver)，用自动机补齐
+        if self.blocking not in LOSSLESS_BLOCKING:
+            pairs |= self._containment_candidates(names)
+
+        neighbors = [[] for _ in names]
+        for i, j in pairs:
+            neighbors[i].append(j)
+
+        for others in neighbors:
+            others.sort()
+
+        return neighbors
+
+    def _containment_candidates(self, names: list[str]) -> set[tuple[int, int]]:
+        """
+        包含关系候选对: Aho-Corasick 一遍找出所有包含对，
+        只保留包含相似度 0.9 * (短/长) 能达到阈值的对
+
+        Args:
+            names: 实体名列表
+
+        Returns:
+            候选对集合 (i < j)
+        """
+        pairs = set()
+        for i, j in containment_pairs(names):
+            shorter = min(len(names[i]), len(names[j]))
+            longer = max(len(names[i]), len(names[j]))
+            if 0.9 * (shorter / longer) >= self.threshold:
+                pairs.add((i, j))
+        return pairs
+
+    def _similarity(self, a: str, b: str, cutoff: float = 0.0) -> float:
         """
         计算两个实体名的相似度
 
@@ -122,11 +690,15 @@ class EntityResolver:
         1. 包含关系 (子串)
         2. 编辑距离 (SequenceMatcher)
 
+        编辑距离前先做分级上界检查 (长度比 → 字符多重集)，
+        上界低于 cutoff 时直接返回该上界，跳过完整 ratio。
+
         Args:
             a, b: 实体名
+            cutoff: 提前返回阈值 (默认0，总是计算精确值)
 
         Returns:
-            相似度 [0, 1]
+            相似度 [0, 1]；低于 cutoff 时可能只是上界
         """
         if not a or not b:
             return 0.0
@@ -135,36 +707,53 @@ class EntityResolver:
         if a == b:
             return 1.0
 
+        len_a, len_b = len(a), len(b)
+        shorter = min(len_a, len_b)
+        longer = max(len_a, len_b)
+
         # 包含关系
         if a in b or b in a:
             # 长度越接近，相似度越高
-            shorter = min(len(a), len(b))
-            longer = max(len(a), len(b))
             return 0.9 * (shorter / longer)
 
+        # 上界1: 长度比 (匹配字符数 <= 短名长度)
+        bound = 2.0 * shorter / (len_a + len_b)
+        if bound < cutoff:
+            return bound
+
+        # 上界2: 字符多重集交集 (等价于 quick_ratio)
+        common = sum((_char_counts(a) & _char_counts(b)).values())
+        bound = 2.0 * common / (len_a + len_b)
+        if bound < cutoff:
+            return bound
+
         # 编辑距离
-        ratio = difflib.SequenceMatcher(None, a, b).ratio()
-        return ratio
+        if len_b < _FAST_RATIO_MAX_LEN:
+            return 2.0 * _matching_chars(a, b) / (len_a + len_b)
+
+        return difflib.SequenceMatcher(None, a, b).ratio()
 
-    def _build_alias_map(self, clusters: list[list[dict]]) -> dict:
+    def _build_alias_map(self, clusters: list[list[int]], representatives: list[int],
+                         names: list[str], canonical_names: list[str] = None) -> dict:
         """
         构建别名映射表
 
         Args:
-            clusters: 实体簇
+            clusters: 实体簇 (下标列表)
+            representatives: 每簇代表的下标 (CamelCase 优先)
+            names: 实体名列表
+            canonical_names: 每簇标准名 (可选，默认取代表名称)
 
         Returns:
             {旧名: 标准名}
         """
         alias_map = {}
 
-        for cluster in clusters:
-            # 选择最佳名称为标准名 (CamelCase 优先)
-            canonical = max(cluster, key=lambda e: self._canonical_score(e.get('text', '')))
-            canonical_name = canonical.get('text', '')
+        for k, (cluster, rep) in enumerate(zip(clusters, representatives)):
+            canonical_name = canonical_names[k] if canonical_names is not None else names[rep]
 
-            for entity in cluster:
-                name = entity.get('text', '')
+            for idx in cluster:
+                name = names[idx]
                 if name != canonical_name:
                     alias_map[name] = canonical_name
 
@@ -190,7 +779,12 @@ class EntityResolver:
 
     def _rewrite_references(self, extractions: list[dict], alias_map: dict) -> list[dict]:
         """
-        重写 relation 中的实体引用
+        重写所有引用字段中的实体别名 (单遍，写时复制)
+
+        覆盖 REFERENCE_FIELDS (from/to/from_entity/to_entity) 与
+        REFERENCE_LIST_FIELDS (related_entities)。只复制确实含别名的项，
+        其余项原样返回 (不复制)。每个字段的重写次数记入
+        stats["references_rewritten"]。
 
         Args:
             extractions: 提取列表
@@ -199,23 +793,45 @@ class EntityResolver:
         Returns:
             引用更新后的提取列表
         """
-        result = []
+        counts = {field: 0 for field in REFERENCE_FIELDS + REFERENCE_LIST_FIELDS}
+        self.stats["references_rewritten"] = counts
 
-        for ext in extractions:
-            ext_copy = ext.copy()
+        # 编译别名表: 去掉恒等映射，之后只做 O(1) 查找
+        aliases = {old: new for old, new in alias_map.items() if old != new}
+        if not aliases:
+            return list(extractions)
 
-            # 重写 relation 类型的 from/to
-            if ext.get('type') == 'relation':
-                from_entity = ext.get('from')
-                to_entity = ext.get('to')
+        lookup = aliases.get
+        result = []
 
-                if from_entity in alias_map:
-                    ext_copy['from'] = alias_map[from_entity]
+        for ext in extractions:
+            updated = None
 
-                if to_entity in alias_map:
-                    ext_copy['to'] = alias_map[to_entity]
+            for field in REFERENCE_FIELDS:
+                value = ext.get(field)
+                if not isinstance(value, str):
+                    continue
+                canonical = lookup(value)
+                if canonical is None:
+                    continue
+                if updated is None:
+                    updated = ext.copy()
+                updated[field] = canonical
+                counts[field] += 1
+
+            for field in REFERENCE_LIST_FIELDS:
+                values = ext.get(field)
+                if not isinstance(values, list):
+                    continue
+                hits = sum(1 for v in values if isinstance(v, str) and v in aliases)
+                if not hits:
+                    continue
+                if updated is None:
+                    updated = ext.copy()
+                updated[field] = [lookup(v, v) if isinstance(v, str) else v for v in values]
+                counts[field] += hits
 
-            result.append(ext_copy)
+            result.append(updated if updated is not None else ext)
 
         return result
 
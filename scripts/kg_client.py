@@ -0,0 +1,386 @@
+"""
+Knowledge Graph Client Module
+
+MCP memory server 的批量注入客户端 (stdio JSON-RPC)：
+- 一个子进程、一条持久连接，完成 initialize 握手后复用
+- create_entities / add_observations / create_relations 按 batch_size 分批
+- 请求流水线发送，最多 max_in_flight 个未完成请求 (背压: 达到上限时阻塞)
+- 失败 (JSON-RPC error / isError / 超时) 按指数退避重试
+"""
+
+import json
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+PROTOCOL_VERSION = "2024-11-05"
+CLIENT_INFO = {"name": "structured-extractor", "version": "1.0"}
+
+
+class MCPError(Exception):
+    """MCP 调用失败 (重试耗尽)"""
+
+
+class MCPMemoryClient:
+    """MCP memory server 批量客户端"""
+
+    def __init__(self, command: list[str], batch_size: int = 100, max_in_flight: int = 4,
+                 retries: int = 3, timeout: float = 30.0, backoff: float = 0.1):
+        """
+        Args:
+            command: 启动 memory server 的命令 (如 ["npx", "-y", "@modelcontextprotocol/server-memory"])
+            batch_size: 每次工具调用携带的条目数
+            max_in_flight: 最多同时未完成的请求数
+            retries: 单个请求失败后的重试次数
+            timeout: 单个请求的超时秒数
+            backoff: 首次重试前的等待秒数 (之后每次翻倍)
+        """
+        self.batch_size = batch_size
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+
+        self._pending = {}             # 请求 id -> Future
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._next_id = 0
+        self._in_flight = 0
+
+        self.stats = {"requests": 0, "batches": 0, "retries": 0, "max_in_flight": 0}
+
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+        # 握手失败时回收子进程与读线程
+        try:
+            self.server_info = self._request("initialize", {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": CLIENT_INFO,
+            })
+            self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """关闭连接并等待子进程退出"""
+        if self.process.stdin and not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+        try:
+            self.process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._reader.join(timeout=1)
+
+    # ---- 传输层 ----
+
+    def _send(self, message: dict):
+        """写入一行 JSON-RPC 消息"""
+        with self._write_lock:
+            self.process.stdin.write(json.dumps(message, ensure_ascii=False) + "\n")
+            self.process.stdin.flush()
+
+    def _read_loop(self):
+        """读取响应并交给对应的 Future；连接断开时使所有未完成请求失败"""
+        for line in self.process.stdout:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            with self._lock:
+                future = self._pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("MCP server 连接已断开"))
+
+    def _submit(self, method: str, params: dict) -> Future:
+        """
+        发送请求 (不等待响应)
+
+        未完成请求数达到 max_in_flight 时阻塞，直到有响应返回；
+        超过 timeout 秒仍无空闲槽位 (服务端不再响应) 时失败。
+
+        Returns:
+            响应消息的 Future
+
+        Raises:
+            MCPError: 等待并发槽位超时
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise MCPError(f"{method} 失败: 等待空闲请求槽位超时 ({self.timeout}s)")
+        future = Future()
+
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending[request_id] = future
+            self._in_flight += 1
+            self.stats["requests"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+
+        future.request_id = request_id
+        future.add_done_callback(self._release)
+
+        try:
+            self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        except OSError as exc:
+            self._fail(future, exc)
+        return future
+
+    def _release(self, future: Future):
+        """请求完成: 归还并发槽位"""
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _fail(self, future: Future, exc: Exception):
+        """放弃一个未完成请求 (迟到的响应将被忽略)"""
+        with self._lock:
+            self._pending.pop(future.request_id, None)
+        if not future.done():
+            future.set_exception(exc)
+
+    def _wait(self, future: Future) -> dict:
+        """
+        等待响应并检查错误
+
+        Returns:
+            result 字段
+
+        Raises:
+            MCPError: JSON-RPC error 或工具返回 isError
+        """
+        try:
+            message = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._fail(future, TimeoutError("MCP 请求超时"))
+            raise
+        if "error" in message:
+            raise MCPError(message["error"].get("message", str(message["error"])))
+        result = message.get("result", {})
+        if isinstance(result, dict) and result.get("isError"):
+            raise MCPError(_result_text(result) or "工具调用失败")
+        return result
+
+    def _request(self, method: str, params: dict, future: Future = None) -> dict:
+        """
+        发送请求并等待结果，失败时重试
+
+        Args:
+            method: JSON-RPC 方法
+            params: 参数
+            future: 已发送请求的 Future (可选，流水线发送后再等待)
+
+        Returns:
+            result 字段
+        """
+        attempt = 0
+        while True:
+            if future is None:
+                future = self._submit(method, params)
+            try:
+                return self._wait(future)
+            except (MCPError, TimeoutError, FutureTimeoutError) as exc:
+                if attempt >= self.retries:
+                    raise MCPError(f"{method} 失败 (已重试 {attempt} 次): {exc}") from exc
+            except ConnectionError as exc:
+                raise MCPError(f"{method} 失败: {exc}") from exc
+
+            attempt += 1
+            self.stats["retries"] += 1
+            time.sleep(self.backoff * (2 ** (attempt - 1)))
+            future = None
+
+    # ---- 工具调用 ----
+
+    def call_tool(self, name: str, arguments: dict) -> dict:
+        """
+        调用一个 MCP 工具
+
+        Args:
+            name: 工具名
+            arguments: 工具参数
+
+        Returns:
+            工具结果 ({content: [...], ...})
+        """
+        return self._request("tools/call", {"name": name, "arguments": arguments})
+
+    def _call_batched(self, tool: str, key: str, items: list) -> int:
+        """
+        分批流水线调用工具
+
+        所有批次先发送 (受 max_in_flight 背压)，再逐个等待；失败的批次单独重试。
+
+        Returns:
+            发送的条目数
+        """
+        sent = []
+        for start in range(0, len(items), self.batch_size):
+            params = {"name": tool, "arguments": {key: items[start:start + self.batch_size]}}
+            sent.append((params, self._submit("tools/call", params)))
+            self.stats["batches"] += 1
+
+        for params, future in sent:
+            self._request("tools/call", params, future)
+
+        return len(items)
+
+    def create_entities(self, entities: list[dict]) -> int:
+        """
+        批量创建实体
+
+        Args:
+            entities: [{name, entityType, observations}]
+
+        Returns:
+            发送的实体数
+        """
+        return self._call_batched("create_entities", "entities", entities)
+
+    def add_observations(self, observations: list[dict]) -> int:
+        """
+        批量追加观察
+
+        Args:
+            observations: [{entityName, contents: [...]}]
+
+        Returns:
+            发送的条目数
+        """
+        return self._call_batched("add_observations", "observations", observations)
+
+    def create_relations(self, relations: list[dict]) -> int:
+        """
+        批量创建关系
+
+        Args:
+            relations: [{from, to, relationType}]
+
+        Returns:
+            发送的关系数
+        """
+        return self._call_batched("create_relations", "relations", relations)
+
+    def inject(self, records, append_observations: bool = False) -> dict:
+        """
+        注入 MCP memory 格式记录流 (KGInjector.iter_records)
+
+        实体按批流水线发送；遇到第一条关系时等待全部实体完成，
+        保证关系的端点已存在，之后关系按批发送。
+
+        Args:
+            records: 可迭代的实体/关系记录
+            append_observations: 同时发送 add_observations
+                                 (memory server 对已存在的实体会忽略 create_entities 中的 observations)
+
+        Returns:
+            {entities, relations} 发送条数
+        """
+        counts = {"entities": 0, "relations": 0}
+        entities = []
+        relations = []
+        pending = []          # 已发送未确认的 (params, Future)
+        entities_done = False
+
+        def submit(tool: str, key: str, items: list):
+            params = {"name": tool, "arguments": {key: items}}
+            pending.append((params, self._submit("tools/call", params)))
+            self.stats["batches"] += 1
+
+        def flush_entities():
+            if not entities:
+                return
+            submit("create_entities", "entities", list(entities))
+            if append_observations:
+                submit("add_observations", "observations", [
+                    {"entityName": e["name"], "contents": e.get("observations", [])} for e in entities
+                ])
+            counts["entities"] += len(entities)
+            entities.clear()
+
+        def drain():
+            for params, future in pending:
+                self._request("tools/call", params, future)
+            pending.clear()
+
+        for record in records:
+            if record.get("type") == "relation":
+                if not entities_done:
+                    flush_entities()
+                    drain()
+                    entities_done = True
+                relations.append({k: record[k] for k in ("from", "to", "relationType")})
+                if len(relations) >= self.batch_size:
+                    submit("create_relations", "relations", list(relations))
+                    counts["relations"] += len(relations)
+                    relations.clear()
+            else:
+                entities.append({k: v for k, v in record.items() if k != "type"})
+                if len(entities) >= self.batch_size:
+                    flush_entities()
+
+        flush_entities()
+        if relations:
+            submit("create_relations", "relations", list(relations))
+            counts["relations"] += len(relations)
+        drain()
+
+        return counts
+
+
+def _result_text(result: dict) -> str:
+    """拼接工具结果中的文本内容"""
+    return "".join(
+        part.get("text", "") for part in result.get("content", ())
+        if isinstance(part, dict)
+    )
+
+
+if __name__ == "__main__":
+    # 测试示例: 启动 memory server 并注入一个小图 (需要 npx)
+    import sys
+
+    command = sys.argv[1:] or ["npx", "-y", "@modelcontextprotocol/server-memory"]
+    records = [
+        {"type": "entity", "name": "entity:倍增门解算器", "entityType": "entity",
+         "observations": ["倍增门解算器核心类"]},
+        {"type": "entity", "name": "rule:只读保护", "entityType": "rule",
+         "observations": ["禁止直接修改 NativeArray"]},
+        {"type": "relation", "from": "rule:只读保护", "to": "entity:倍增门解算器",
+         "relationType": "governs"},
+    ]
+
+    with MCPMemoryClient(command, batch_size=100) as client:
+        print("注入:", client.inject(records))
+        print("统计:", client.stats)
@@ -5,18 +5,64 @@ Knowledge Graph Injection Module
 - entity → {name, entityType, observations}
 - relation → {from, to, relationType}
 - 只转换 confidence >= threshold 的项
+- 同名实体合并 (字典索引)，observations 保序去重，可限制每个实体的 observations 数
+- 关系端点解析: text / summary_cn / aliases / entity_name 索引到 KG 实体名，悬空关系计数或丢弃
+- 实体名确定性: 名称只取决于提取项本身；无文本时用内容哈希命名，超长显示名截断并追加完整显示名的短哈希
+- 流式输出: iter_records 逐条生成 MCP memory 格式记录，KGJsonlWriter 写入 JSON Lines (.gz 自动压缩)；
+  同名合并需要看到全部实体，实体先整体缓存 (与去重后的实体数成正比)，关系仍逐条流式
 """
 
+import gzip
+import hashlib
+import json
+
+
+# KG 输出中作为节点的提取类型
+ENTITY_TYPES = ('entity', 'rule', 'constraint', 'event', 'state')
+
+# 关系端点可能引用的提取项字段 (aliases 为列表)
+ENDPOINT_FIELDS = ('text', 'summary_cn', 'entity_name', 'canonical_name')
+
+
+# 实体名中显示名的最大长度
+NAME_DISPLAY_LENGTH = 40
+
+
+def _content_hash(*parts, length: int = 12) -> str:
+    """
+    稳定的内容哈希 (blake2b)，跨运行、跨进程一致
+
+    Args:
+        parts: 参与哈希的字段 (转为字符串后以分隔符拼接)
+        length: 返回的十六进制位数
+
+    Returns:
+        十六进制哈希前缀
+    """
+    data = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()[:length]
+
+
+def _normalize_endpoint(text: str) -> str:
+    """端点文本规范化: 折叠空白"""
+    return ' '.join(text.split())
+
 
 class KGInjector:
     """知识图谱注入格式转换器"""
 
-    def __init__(self, confidence_threshold: float = 0.3):
+    def __init__(self, confidence_threshold: float = 0.3, max_observations: int = None,
+                 drop_dangling: bool = False):
         """
         Args:
             confidence_threshold: 最低置信度阈值
+            max_observations: 每个实体最多保留的 observations 数 (合并后按出现顺序截断，None 不限)
+            drop_dangling: 丢弃端点无法解析到 KG 实体的关系 (默认保留原始端点文本，只计数)
         """
         self.confidence_threshold = confidence_threshold
+        self.max_observations = max_observations
+        self.drop_dangling = drop_dangling
+        self.stats = {}
 
     def convert(self, extractions: list[dict], relations: list[dict] = None) -> dict:
         """
@@ -29,52 +75,208 @@ class KGInjector:
         Returns:
             {entities: [...], relations: [...]}
         """
-        # 过滤低置信度项
-        high_conf_extractions = [
-            e for e in extractions
-            if e.get('confidence', 0) >= self.confidence_threshold
-        ]
-
-        # 转换实体
         entities = []
-        for ext in high_conf_extractions:
-            if ext.get('type') in ['entity', 'rule', 'constraint', 'event', 'state']:
-                entity = self._convert_entity(ext)
-                entities.append(entity)
-
-        # 转换关系
         kg_relations = []
 
+        self._reset_stats()
+        for kind, converted in self._iter_converted(extractions, relations):
+            if kind == "entity":
+                entities.append(converted)
+            else:
+                kg_relations.append(converted)
+
+        return {
+            "entities": entities,
+            "relations": kg_relations,
+        }
+
+    def iter_records(self, extractions: list[dict], relations=None):
+        """
+        流式转换为 MCP memory 格式记录 (与 convert 内容和顺序一致)
+
+        先输出全部实体 (同名合并后)，再输出显式关系与推断关系；relations 可以是生成器
+        (如 RelationInferrer.iter_relations)，只遍历一次。
+
+        注意: 同名实体可能出现在输入末尾，且关系端点解析需要完整的实体索引，
+        因此第一条记录产生前会转换并缓存全部实体 (内存与合并后的实体数成正比)；
+        只有关系是逐条流式的。self.stats 在调用时即重置，迭代过程中逐步更新。
+
+        Args:
+            extractions: 提取项列表
+            relations: 关系列表或可迭代对象（可选）
+
+        Returns:
+            记录生成器: {"type": "entity", name, entityType, observations} 或
+            {"type": "relation", from, to, relationType}
+        """
+        self._reset_stats()
+        return ({"type": kind, **converted} for kind, converted in self._iter_converted(extractions, relations))
+
+    def _reset_stats(self):
+        """重置转换统计"""
+        self.stats = {
+            "merged_entities": 0,
+            "duplicate_observations": 0,
+            "truncated_observations": 0,
+            "resolved_endpoints": 0,
+            "dangling_relations": 0,
+            "duplicate_relations": 0,
+        }
+
+    def _iter_converted(self, extractions: list[dict], relations=None):
+        """
+        逐项转换 (调用方先 _reset_stats)
+
+        Yields:
+            ("entity" | "relation", 转换结果)
+        """
+        threshold = self.confidence_threshold
+
+        # 端点索引: 提取项的各种称呼 -> KG 实体名
+        endpoints = {}
+        # 撞名检查: 截断后的实体名 -> 完整显示名
+        names = {}
+
+        def converted():
+            for ext in extractions:
+                if ext.get('confidence', 0) >= threshold and ext.get('type') in ENTITY_TYPES:
+                    entity = self._convert_entity(ext, names)
+                    self._index_endpoints(endpoints, ext, entity["name"])
+                    yield entity
+
+        # 转换实体 (过滤低置信度项)，同名实体合并
+        entities = self._merge_entities(converted())
+        for entity in entities.values():
+            yield "entity", {**entity, "observations": list(entity["observations"])}
+
+        seen = set()  # 端点改写后的去重: (from, to, relationType)
+
         # 从 extractions 中提取显式关系
-        for ext in high_conf_extractions:
-            if ext.get('type') == 'relation':
-                relation = self._convert_relation(ext)
-                kg_relations.append(relation)
+        for ext in extractions:
+            if ext.get('confidence', 0) >= threshold and ext.get('type') == 'relation':
+                relation = self._resolve_relation(self._convert_relation(ext), endpoints, seen)
+                if relation is not None:
+                    yield "relation", relation
 
         # 添加推断关系
         if relations:
             for rel in relations:
-                if rel.get('confidence', 0) >= self.confidence_threshold:
-                    relation = self._convert_relation(rel)
-                    kg_relations.append(relation)
+                if rel.get('confidence', 0) >= threshold:
+                    relation = self._resolve_relation(self._convert_relation(rel), endpoints, seen)
+                    if relation is not None:
+                        yield "relation", relation
 
-        return {
-            "entities": entities,
-            "relations": kg_relations,
+    @staticmethod
+    def _index_endpoints(endpoints: dict, ext: dict, name: str):
+        """
+        登记提取项的各种称呼 (先登记者优先)
+
+        Args:
+            endpoints: 端点索引 {称呼: KG 实体名}
+            ext: 提取项
+            name: 其 KG 实体名
+        """
+        endpoints[name] = name
+        keys = [ext.get(field) for field in ENDPOINT_FIELDS] + list(ext.get('aliases') or ())
+        for key in keys:
+            if key and isinstance(key, str):
+                endpoints.setdefault(key, name)
+                endpoints.setdefault(_normalize_endpoint(key), name)
+
+    def _resolve_relation(self, relation: dict, endpoints: dict, seen: set):
+        """
+        将关系端点改写为 KG 实体名
+
+        Args:
+            relation: {from, to, relationType}
+            endpoints: 端点索引
+            seen: 已输出的关系三元组
+
+        Returns:
+            改写后的关系；重复或 (drop_dangling 时) 悬空返回 None
+        """
+        stats = self.stats
+        resolved = {}
+        for key in ("from", "to"):
+            text = relation[key]
+            name = endpoints.get(text)
+            if name is None:
+                name = endpoints.get(_normalize_endpoint(text))
+            if name is not None:
+                stats["resolved_endpoints"] += 1
+            resolved[key] = name
+
+        if resolved["from"] is None or resolved["to"] is None:
+            stats["dangling_relations"] += 1
+            if self.drop_dangling:
+                return None
+
+        relation = {
+            "from": resolved["from"] or relation["from"],
+            "to": resolved["to"] or relation["to"],
+            "relationType": relation["relationType"],
         }
 
-    def _convert_entity(self, ext: dict) -> dict:
+        triple = (relation["from"], relation["to"], relation["relationType"])
+        if triple in seen:
+            stats["duplicate_relations"] += 1
+            return None
+        seen.add(triple)
+
+        return relation
+
+    def _merge_entities(self, converted) -> dict:
+        """
+        按名称合并实体
+
+        observations 用 dict 作为有序集合去重 (保留首次出现顺序)，
+        达到 max_observations 后不再追加。
+
+        Args:
+            converted: 转换后的实体序列
+
+        Returns:
+            {name: {name, entityType, observations: {observation: None}}}
+        """
+        limit = self.max_observations
+        merged = {}
+        stats = self.stats
+
+        for entity in converted:
+            target = merged.get(entity["name"])
+            if target is None:
+                target = merged[entity["name"]] = {
+                    "name": entity["name"],
+                    "entityType": entity["entityType"],
+                    "observations": {},
+                }
+            else:
+                stats["merged_entities"] += 1
+
+            observations = target["observations"]
+            for observation in entity["observations"]:
+                if observation in observations:
+                    stats["duplicate_observations"] += 1
+                elif limit is not None and len(observations) >= limit:
+                    stats["truncated_observations"] += 1
+                else:
+                    observations[observation] = None
+
+        return merged
+
+    def _convert_entity(self, ext: dict, names: dict = None) -> dict:
         """
         转换单个实体
 
         Args:
             ext: 提取项
+            names: 撞名检查表 (可选，见 _make_name)
 
         Returns:
             {name, entityType, observations}
         """
         # 生成实体名称
-        name = self._make_name(ext)
+        name = self._make_name(ext, names)
 
         # 实体类型
         entity_type = ext.get('type', 'entity')
@@ -133,35 +335,134 @@ class KGInjector:
             "relationType": rel.get('relation_type', 'relates_to'),
         }
 
-    def _make_name(self, ext: dict) -> str:
+    def _make_name(self, ext: dict, names: dict = None) -> str:
         """
-        生成唯一实体名称
+        生成唯一实体名称 (只取决于提取项本身，与输入顺序和同批其他项无关)
 
         格式: "{type}:{display_name}" 确保不同类型的同名实体不冲突
 
         优先级:
-        1. summary_cn 前40字符
-        2. text 前40字符
+        1. summary_cn
+        2. text
+        3. 内容哈希 unnamed_{hash} (type + source_file + char_interval / char_start-char_end + line)，跨运行稳定；
+           这些字段都缺失的无文本项无法区分，会合并为同一个实体
+
+        显示名超过 40 字符时截断，并追加完整显示名的短哈希 "#{hash8}"，
+        使截断后相同的不同显示名得到不同名称；完整显示名相同则同名 (合并)。
 
         Args:
             ext: 提取项
+            names: 撞名检查表 {实体名: 完整显示名} (可选，会被更新)
 
         Returns:
             实体名称
+
+        Raises:
+            ValueError: 不同显示名得到同一名称 (哈希碰撞)
         """
         ext_type = ext.get('type', 'entity')
+        display = self._display(ext)
+        if len(display) > NAME_DISPLAY_LENGTH:
+            name = f"{ext_type}:{display[:NAME_DISPLAY_LENGTH]}#{_content_hash(display, length=8)}"
+        else:
+            name = f"{ext_type}:{display}"
+
+        if names is not None and names.setdefault(name, display) != display:
+            raise ValueError(f"Entity name collision: {name!r} for {names[name]!r} and {display!r}")
+
+        return name
 
+    @staticmethod
+    def _display(ext: dict) -> str:
+        """完整显示名 (截断前)"""
         summary_cn = ext.get('summary_cn', '')
         if summary_cn:
-            display = summary_cn[:40]
+            return summary_cn
+
+        text = ext.get('text', '')
+        if text:
+            return ' '.join(text.split())
+
+        loc = ext.get('source_location', {})
+        interval = loc.get('char_interval') or (loc.get('char_start'), loc.get('char_end'))
+        digest = _content_hash(
+            ext.get('type', 'entity'), ext.get('source_file'), tuple(interval), loc.get('line'), text,
+        )
+        return f"unnamed_{digest}"
+
+
+class KGJsonlWriter:
+    """
+    KG 记录的 JSON Lines 写入器
+
+    每行一条 MCP memory 格式记录 ({"type": "entity", ...} / {"type": "relation", ...})，
+    与 memory server 的存储文件格式一致；路径以 .gz 结尾时用 gzip 压缩。
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 输出文件路径
+        """
+        self.path = str(path)
+        if self.path.endswith(".gz"):
+            self._file = gzip.open(self.path, "wt", encoding="utf-8")
         else:
-            text = ext.get('text', '')
-            if text:
-                display = ' '.join(text.split())[:40]
-            else:
-                display = f"unnamed_{id(ext)}"
+            self._file = open(self.path, "w", encoding="utf-8")
+        self.stats = {"entities": 0, "relations": 0}
+
+    def __enter__(self):
+        return self
 
-        return f"{ext_type}:{display}"
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record: dict):
+        """写入一条记录"""
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write("\n")
+        if record.get("type") == "relation":
+            self.stats["relations"] += 1
+        else:
+            self.stats["entities"] += 1
+
+    def write_all(self, records) -> int:
+        """
+        写入全部记录
+
+        Args:
+            records: 记录可迭代对象 (如 KGInjector.iter_records)
+
+        Returns:
+            写入条数
+        """
+        count = 0
+        for record in records:
+            self.write(record)
+            count += 1
+        return count
+
+    def close(self):
+        """关闭文件"""
+        self._file.close()
+
+
+def read_kg_jsonl(path: str):
+    """
+    逐行读取 KG JSON Lines 文件 (.gz 自动解压)
+
+    Args:
+        path: 文件路径
+
+    Yields:
+        记录字典
+    """
+    path = str(path)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
 
 
 if __name__ == "__main__":
@@ -204,6 +505,13 @@ if __name__ == "__main__":
     injector = KGInjector(confidence_threshold=0.3)
     result = injector.convert(extractions, relations)
 
-    import json
     print(f"转换了 {len(result['entities'])} 个实体, {len(result['relations'])} 条关系")
     print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    # 流式写入 JSON Lines
+    import os
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "kg.jsonl.gz")
+    with KGJsonlWriter(path) as writer:
+        writer.write_all(injector.iter_records(extractions, relations))
+    print("JSONL 写入:", writer.stats, "读回", sum(1 for _ in read_kg_jsonl(path)), "条")
@@ -0,0 +1,213 @@
+"""
+Knowledge Graph Store Module
+
+本地 SQLite 图存储 (KG 输出的持久化后端)：
+- entities / observations / relations 三张表，实体名与关系三元组唯一索引
+- 写入 MCP memory 格式记录 (KGInjector.iter_records)，分批 executemany，
+  整次写入在一个事务内完成
+- 幂等: 重复写入相同记录不产生新行
+- 写入统计取自每批 executemany 的 rowcount，不扫描整表
+- WAL 模式，读写互不阻塞
+"""
+
+import sqlite3
+
+
+# 单批 executemany 的记录数
+DEFAULT_BATCH_SIZE = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    entity_type TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_entities_name ON entities(name);
+CREATE TABLE IF NOT EXISTS observations (
+    entity_id INTEGER NOT NULL REFERENCES entities(id),
+    content TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_observations_entity_content ON observations(entity_id, content);
+CREATE TABLE IF NOT EXISTS relations (
+    from_name TEXT NOT NULL,
+    to_name TEXT NOT NULL,
+    relation_type TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_relations_triple ON relations(from_name, to_name, relation_type);
+CREATE INDEX IF NOT EXISTS idx_relations_to ON relations(to_name);
+"""
+
+_INSERT_ENTITY = "INSERT OR IGNORE INTO entities (name, entity_type) VALUES (?, ?)"
+_UPDATE_ENTITY_TYPE = "UPDATE entities SET entity_type = ? WHERE name = ? AND entity_type != ?"
+_INSERT_OBSERVATION = (
+    "INSERT OR IGNORE INTO observations (entity_id, content) "
+    "SELECT id, ? FROM entities WHERE name = ?"
+)
+_INSERT_RELATION = (
+    "INSERT OR IGNORE INTO relations (from_name, to_name, relation_type) VALUES (?, ?, ?)"
+)
+
+# 支持的存储文件扩展名 (管道按扩展名选择输出后端)
+STORE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+class SQLiteGraphStore:
+    """SQLite 知识图谱存储"""
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            path: SQLite 数据库路径 (":memory:" 为内存库)
+            batch_size: 单批 executemany 的记录数
+        """
+        self.path = str(path)
+        self.batch_size = batch_size
+
+        self.conn = sqlite3.connect(self.path)
+        if self.path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.stats = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def counts(self) -> dict:
+        """各表行数"""
+        return {
+            table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("entities", "observations", "relations")
+        }
+
+    def write(self, records) -> dict:
+        """
+        批量写入 MCP memory 格式记录 (单个事务)
+
+        Args:
+            records: 可迭代的 {"type": "entity", name, entityType, observations} /
+                     {"type": "relation", from, to, relationType}
+
+        Returns:
+            本次新增行数 {entities, observations, relations} 与类型被更新的实体数 updated_entities
+        """
+        self.stats = {"entities": 0, "observations": 0, "relations": 0, "updated_entities": 0}
+
+        entities = []
+        observations = []
+        relations = []
+
+        with self.conn:
+            for record in records:
+                if record.get("type") == "relation":
+                    relations.append((record["from"], record["to"], record["relationType"]))
+                else:
+                    name = record["name"]
+                    entities.append((name, record.get("entityType", "entity")))
+                    observations.extend((content, name) for content in record.get("observations", ()))
+
+                if len(entities) + len(observations) + len(relations) >= self.batch_size:
+                    self._flush(entities, observations, relations)
+                    entities, observations, relations = [], [], []
+
+            self._flush(entities, observations, relations)
+
+        return self.stats
+
+    def write_graph(self, kg_format: dict) -> dict:
+        """
+        写入 KGInjector.convert 的输出
+
+        Args:
+            kg_format: {entities: [...], relations: [...]}
+
+        Returns:
+            写入统计 (同 write)
+        """
+        records = [{"type": "entity", **e} for e in kg_format.get("entities", ())]
+        records += [{"type": "relation", **r} for r in kg_format.get("relations", ())]
+        return self.write(records)
+
+    def _flush(self, entities: list, observations: list, relations: list):
+        """一批 executemany (实体先于其 observations 写入)，按 rowcount 累计写入统计"""
+        stats = self.stats
+        if entities:
+            stats["entities"] += self.conn.executemany(_INSERT_ENTITY, entities).rowcount
+            stats["updated_entities"] += self.conn.executemany(
+                _UPDATE_ENTITY_TYPE, [(entity_type, name, entity_type) for name, entity_type in entities]
+            ).rowcount
+        if observations:
+            stats["observations"] += self.conn.executemany(_INSERT_OBSERVATION, observations).rowcount
+        if relations:
+            stats["relations"] += self.conn.executemany(_INSERT_RELATION, relations).rowcount
+
+    def entity(self, name: str):
+        """
+        查询实体
+
+        Args:
+            name: 实体名
+
+        Returns:
+            {name, entityType, observations}；不存在返回 None
+        """
+        row = self.conn.execute(
+            "SELECT id, entity_type FROM entities WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        entity_id, entity_type = row
+        observations = [
+            content for (content,) in self.conn.execute(
+                "SELECT content FROM observations WHERE entity_id = ? ORDER BY rowid", (entity_id,)
+            )
+        ]
+        return {"name": name, "entityType": entity_type, "observations": observations}
+
+    def relations(self, name: str = None) -> list[dict]:
+        """
+        查询关系
+
+        Args:
+            name: 实体名 (可选，只返回以其为起点或终点的关系)
+
+        Returns:
+            [{from, to, relationType}]
+        """
+        if name is None:
+            rows = self.conn.execute(
+                "SELECT from_name, to_name, relation_type FROM relations ORDER BY rowid"
+            )
+        else:
+            rows = self.conn.execute(
+                "SELECT from_name, to_name, relation_type FROM relations "
+                "WHERE from_name = ? OR to_name = ? ORDER BY rowid",
+                (name, name),
+            )
+        return [{"from": f, "to": t, "relationType": r} for f, t, r in rows]
+
+
+if __name__ == "__main__":
+    # 测试示例: 同一批记录写两次，第二次无新增
+    records = [
+        {"type": "entity", "name": "entity:倍增门解算器", "entityType": "entity",
+         "observations": ["倍增门解算器核心类", "Source: MGMultiGate.cs:42"]},
+        {"type": "entity", "name": "rule:只读保护", "entityType": "rule",
+         "observations": ["禁止直接修改 NativeArray"]},
+        {"type": "relation", "from": "rule:只读保护", "to": "entity:倍增门解算器",
+         "relationType": "governs"},
+    ]
+
+    with SQLiteGraphStore(":memory:") as store:
+        print("第一次写入:", store.write(records))
+        print("第二次写入:", store.write(records))
+        print("行数:", store.counts())
+        print(store.entity("entity:倍增门解算器"))
@@ -23,8 +23,11 @@ from source_grounding import SourceGrounder
 from overlap_dedup import OverlapDeduplicator
 from confidence_scorer import ConfidenceScorer
 from entity_resolver import EntityResolver
+from alias_registry import AliasRegistry
 from relation_inferrer import RelationInferrer
-from kg_injector import KGInjector
+from scope_index import CodeScopeIndex, DocScopeIndex
+from kg_injector import KGInjector, KGJsonlWriter
+from kg_store import STORE_SUFFIXES, SQLiteGraphStore
 
 
 class ExtractionPipeline:
@@ -41,7 +44,21 @@ class ExtractionPipeline:
         "confidence_threshold": 0.3,
         "overlap_threshold": 0.5,
         "entity_similarity_threshold": 0.7,
+        "entity_blocking": "prefix",  # 候选生成: prefix (无损) / minhash (近似) / None (全量)
+        "entity_clustering": "greedy",  # 聚类语义: greedy (种子中心) / transitive (并查集传递)
+        "entity_similarity": "sequence",  # 相似度后端: sequence (字符编辑距离) / tfidf (词元余弦)
+        "entity_top_k": 10,           # tfidf 后端每个实体保留的近邻数
+        "alias_registry": None,       # 持久化别名注册表 SQLite 路径 (可选，跨运行稳定标准名)
         "scope_window": 50,
+        "scope_mode": "bucket",       # scope 划分: bucket (固定行号分组) / window (滑动窗口) / mention (显式提及)
+        "scope_distance_decay": False,  # window 模式下置信度随行距衰减
+        "scope_index": None,          # 结构化 scope: None (按行号分组) / code (代码块) / doc (文档章节)
+        "inference_rules": None,      # 自定义推断规则 (可选，覆盖或扩展默认规则表)
+        "max_relations_per_item": None,   # 每个起点项最多推断的关系数 (可选)
+        "max_relations_per_scope": None,  # 每个 scope 最多推断的关系数 (可选)
+        "max_inferred_relations": None,   # 推断关系全局硬上限 (可选)
+        "kg_max_observations": None,  # 每个 KG 实体最多保留的 observations 数 (可选)
+        "kg_drop_dangling": False,    # 丢弃端点无法解析到 KG 实体的关系
         "type_aware_dedup": False,
         "confidence_weights": None,  # 自定义置信度权重 (可选)
     }
@@ -66,22 +83,73 @@ class ExtractionPipeline:
         self.scorer = ConfidenceScorer(
             weights=self.config.get("confidence_weights")
         )
-        self.resolver = EntityResolver(
-            threshold=self.config["entity_similarity_threshold"]
-        )
+        resolver_options = {
+            "threshold": self.config["entity_similarity_threshold"],
+            "blocking": self.config["entity_blocking"],
+            "clustering": self.config["entity_clustering"],
+            "similarity": self.config["entity_similarity"],
+            "top_k": self.config["entity_top_k"],
+        }
+        self.registry = None
+        if self.config["entity_resolution"] and self.config["alias_registry"]:
+            self.registry = AliasRegistry(self.config["alias_registry"], **resolver_options)
+        self.resolver = EntityResolver(registry=self.registry, **resolver_options)
+        scope_index = None
+        if self.config["relation_inference"] and self.config["scope_index"]:
+            scope_index = self._build_scope_index(self.config["scope_index"])
         self.inferrer = RelationInferrer(
-            scope_window=self.config["scope_window"]
+            scope_window=self.config["scope_window"],
+            scope_mode=self.config["scope_mode"],
+            distance_decay=self.config["scope_distance_decay"],
+            max_per_item=self.config["max_relations_per_item"],
+            max_per_scope=self.config["max_relations_per_scope"],
+            max_relations=self.config["max_inferred_relations"],
+            scope_index=scope_index,
+            rules=self.config["inference_rules"],
         )
         self.injector = KGInjector(
-            confidence_threshold=self.config["confidence_threshold"]
+            confidence_threshold=self.config["confidence_threshold"],
+            max_observations=self.config["kg_max_observations"],
+            drop_dangling=self.config["kg_drop_dangling"],
         )
 
-    def process(self, raw_extractions: list[dict]) -> dict:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """释放持有的资源 (别名注册表的数据库连接)"""
+        if self.registry is not None:
+            self.registry.close()
+            self.registry = None
+
+    def _build_scope_index(self, kind: str):
+        """
+        按配置构建结构化 scope 索引
+
+        Args:
+            kind: "code" 或 "doc"
+
+        Returns:
+            scope 索引
+        """
+        if kind == "code":
+            return CodeScopeIndex(self.source_text, source_file=self.source_file)
+        if kind == "doc":
+            return DocScopeIndex(self.source_text)
+        raise ValueError(f"Unknown scope index: {kind} (expected one of code, doc)")
+
+    def process(self, raw_extractions: list[dict], stream_relations: bool = False) -> dict:
         """
         执行完整的后处理管道
 
         Args:
             raw_extractions: LLM 提取的原始列表
+            stream_relations: 不物化推断关系与 kg_format，由调用方之后用
+                              self.inferrer.iter_relations 流式消费 (如 export_kg)；
+                              此时返回的 inferred_relations 为空列表、kg_format 为 None
 
         Returns:
             {
@@ -134,29 +202,49 @@ class ExtractionPipeline:
             extractions = self.resolver.process(extractions)
             after_entities = sum(1 for e in extractions if e.get('type') == 'entity')
             merged = before_entities - after_entities
+            resolver_stats = self.resolver.stats
+            if "comparisons" in resolver_stats:
+                print(f"  compared {resolver_stats['comparisons']} pairs "
+                      f"(candidates {resolver_stats['candidate_pairs']}/{resolver_stats['total_pairs']})")
             print(f"  [OK] merged {merged} similar entities\n")
         else:
             print("[4/6] Entity Resolution (skipped)\n")
 
         # 5. Relation Inference
-        if self.config["relation_inference"]:
+        if self.config["relation_inference"] and stream_relations:
+            print("[5/6] Relation Inference (streamed to KG output)\n")
+        elif self.config["relation_inference"]:
             print("[5/6] Relation Inference...")
             extractions, inferred_relations = self.inferrer.process(extractions)
+            inferrer_stats = self.inferrer.stats
+            if inferrer_stats["truncated"]:
+                print(f"  truncated {inferrer_stats['truncated']} of {inferrer_stats['candidates']} candidates")
+            if inferrer_stats["capped"]:
+                print(f"  stopped at max_relations={self.inferrer.max_relations}; remaining candidates not scanned")
             print(f"  [OK] inferred {len(inferred_relations)} relations\n")
         else:
             print("[5/6] Relation Inference (skipped)\n")
 
         # 6. KG Injection
         kg_format = None
-        if self.config["kg_injection"]:
+        if self.config["kg_injection"] and stream_relations:
+            print("[6/6] Knowledge Graph Injection (streamed to KG output)\n")
+        elif self.config["kg_injection"]:
             print("[6/6] Knowledge Graph Injection...")
             kg_format = self.injector.convert(extractions, inferred_relations)
+            if self.injector.stats["dangling_relations"]:
+                action = "dropped" if self.config["kg_drop_dangling"] else "kept"
+                print(f"  {action} {self.injector.stats['dangling_relations']} dangling relations")
             print(f"  [OK] converted to KG format: {len(kg_format['entities'])} entities, {len(kg_format['relations'])} relations\n")
         else:
             print("[6/6] Knowledge Graph Injection (跳过)\n")
 
         # 统计
         stats = self._compute_stats(extractions, inferred_relations, dedup_removed)
+        if self.config["entity_resolution"]:
+            stats["entity_resolution"] = self.resolver.stats
+        if self.config["relation_inference"] and not stream_relations:
+            stats["relation_inference"] = self.inferrer.stats
 
         print("=== Pipeline 完成 ===\n")
 
@@ -167,6 +255,30 @@ class ExtractionPipeline:
             "stats": stats,
         }
 
+    def export_kg(self, path: str, extractions: list[dict], relations=None) -> dict:
+        """
+        流式写出 KG 记录
+
+        .db / .sqlite / .sqlite3 写入 SQLite 图存储 (幂等追加)，
+        其他路径写 JSON Lines (.gz 结尾时压缩)。
+
+        Args:
+            path: 输出文件路径
+            extractions: 处理后的提取项
+            relations: 推断关系 (列表或生成器，可选)
+
+        Returns:
+            写入统计 (JSON Lines: {entities, relations}；SQLite: 各表新增行数)
+        """
+        records = self.injector.iter_records(extractions, relations)
+        if str(path).endswith(STORE_SUFFIXES):
+            with SQLiteGraphStore(path) as store:
+                return store.write(records)
+
+        with KGJsonlWriter(path) as writer:
+            writer.write_all(records)
+        return writer.stats
+
     def _compute_stats(self, extractions: list[dict], relations: list[dict], dedup_removed: int = 0) -> dict:
         """
         计算统计信息
@@ -256,6 +368,16 @@ def main():
         action="store_true",
         help="启用 KG 格式转换"
     )
+    parser.add_argument(
+        "--kg-output",
+        help="KG 记录流式输出路径 (JSON Lines，MCP memory 格式；.gz 结尾时压缩；"
+             ".db/.sqlite 写入 SQLite 图存储)；推断关系直接流式写入，不再写入结果文件"
+    )
+    parser.add_argument(
+        "--include-inferred",
+        action="store_true",
+        help="配合 --kg-output: 仍在结果文件中写出 inferred_relations 与 kg_format (需物化全部关系)"
+    )
 
     args = parser.parse_args()
 
@@ -306,16 +428,30 @@ def main():
     if args.enable_kg_injection:
         config["kg_injection"] = True
 
-    # 执行管道
-    pipeline = ExtractionPipeline(source_text, config, source_file=source_path.name)
-    result = pipeline.process(raw_extractions)
+    # 指定 --kg-output 时推断关系直接流式写入 KG，不物化、不写入缩进的结果文件
+    stream = bool(args.kg_output) and not args.include_inferred
+
+    # 执行管道 (结束后关闭别名注册表；export_kg 与推断器不依赖注册表)
+    with ExtractionPipeline(source_text, config, source_file=source_path.name) as pipeline:
+        result = pipeline.process(raw_extractions, stream_relations=stream)
+
+    if args.kg_output:
+        if stream and pipeline.config["relation_inference"]:
+            relations = pipeline.inferrer.iter_relations(result["extractions"])
+        else:
+            relations = result["inferred_relations"]
+        kg_stats = pipeline.export_kg(args.kg_output, result["extractions"], relations)
+        print(f"[OK] KG records saved to: {args.kg_output} "
+              f"({', '.join(f'{count} {table}' for table, count in kg_stats.items())})")
+        if stream and pipeline.config["relation_inference"]:
+            result["stats"]["inferred_relations"] = pipeline.inferrer.stats["emitted"]
+            result["stats"]["relation_inference"] = pipeline.inferrer.stats
 
     # 输出结果
-    output_data = {
-        "extractions": result["extractions"],
-        "inferred_relations": result["inferred_relations"],
-        "stats": result["stats"],
-    }
+    output_data = {"extractions": result["extractions"]}
+    if not stream:
+        output_data["inferred_relations"] = result["inferred_relations"]
+    output_data["stats"] = result["stats"]
 
     if result["kg_format"]:
         output_data["kg_format"] = result["kg_format"]
@@ -3,14 +3,26 @@ Relation Inference Module
 
 基于规则表推断实体间关系：
 - 按 source_file + 行号范围 分 scope (50行一组)
-- 同 scope 内按类型对匹配推断关系
+- 同 scope 内按类型分桶，只枚举规则表中的类型对
 - 规则表驱动，支持自定义扩展
 - 有向推断：rule/constraint/event/state → entity 单向，entity ↔ entity 双向
+- 可选结构化 scope: 按 scope_index 解析出的真实代码块分组
+- 可选滑动窗口模式: 同文件内行距 < scope_window 的项两两推断，置信度可随行距衰减
+- 提及模式: 实体名/别名构建 Aho-Corasick 自动机，只对文本中显式提及的实体推断
+- 输出有界: 每项 / 每 scope top-k (按置信度与行距排序，边枚举边入堆) 与全局硬上限 (达到即停止扫描)
+- 流式输出: iter_relations 逐 scope 生成，峰值内存以单个 scope 为界
+- 紧凑边表: infer_edges 返回整数 id + array 列的 RelationEdges，附 CSR 邻接视图
 """
 
+import heapq
+from array import array
 
-# 推断规则表: (type_a, type_b) -> (relation_type, bidirectional)
-# bidirectional=True: 同时生成 A→B 和 B→A
+from entity_index import AhoCorasick
+
+
+# 默认推断规则表: (type_a, type_b) -> (relation_type, bidirectional)
+# 可通过 RelationInferrer(rules=[...]) / 管道配置 inference_rules 覆盖或扩展
+# bidirectional=True: 同时生成 A→B 和 B→A (同类型 A↔A 每对只生成一条)
 # bidirectional=False: 只生成 A→B（有向）
 INFERENCE_RULES = {
     ("rule", "entity"): ("governs", False),
@@ -20,16 +32,362 @@ INFERENCE_RULES = {
     ("entity", "entity"): ("relates_to", True),
 }
 
+# 关系类型编码 (RelationEdges 的类型列)
+RELATION_TYPES = tuple(dict.fromkeys(relation_type for relation_type, _ in INFERENCE_RULES.values()))
+
+# scope 划分方式: bucket=固定行号分组，window=按行距滑动窗口，
+# mention=按文本中显式提及的实体名推断 (不依赖行距)
+SCOPE_MODES = ("bucket", "window", "mention")
+
+# 推断关系的基础置信度
+BASE_CONFIDENCE = 0.6
+
+# 显式提及: 证据强于同 scope 共现，在规则置信度上加成
+MENTION_BONUS = 0.2
+
+# 提及匹配的实体名字段与最短名称长度 (过短的名称误匹配过多)
+MENTION_NAME_FIELDS = ("text", "entity_name", "canonical_name")
+MIN_MENTION_LENGTH = 2
+
+# 提及扫描的非实体项字段
+MENTION_TEXT_FIELDS = ("text", "summary_cn")
+
+# 无法计算行距时的排序距离 (排在最后)
+UNKNOWN_DISTANCE = float("inf")
+
+
+def _is_identifier_char(ch: str) -> bool:
+    """ASCII 标识符字符 (中文等非 ASCII 字符不视为标识符的一部分)"""
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+def _at_identifier_boundary(text: str, start: int, end: int) -> bool:
+    """命中 text[start:end] 两端不与相邻的标识符字符粘连"""
+    if start > 0 and _is_identifier_char(text[start - 1]) and _is_identifier_char(text[start]):
+        return False
+    if end < len(text) and _is_identifier_char(text[end]) and _is_identifier_char(text[end - 1]):
+        return False
+    return True
+
+
+# 规则定义的方向取值
+RULE_DIRECTIONS = ("forward", "both")
+
+
+def normalize_rule(rule: dict) -> tuple:
+    """
+    校验并规范化一条规则定义 (管道配置 / 预设 JSON 中的 inference_rules 项)
+
+    规则字段:
+        from_type, to_type: 类型对 (必填)
+        relation_type: 关系类型 (必填；为 None 时删除该类型对的默认规则)
+        direction: "forward" (A→B，默认) 或 "both" (双向)；也可用 bidirectional: true
+        confidence: 置信度 (默认 0.6)
+        max_distance: 最大行距 (默认不限)
+
+    Args:
+        rule: 规则字典
+
+    Returns:
+        ((from_type, to_type), 规范化规则字典或 None)
+    """
+    missing = [key for key in ("from_type", "to_type", "relation_type") if key not in rule]
+    if missing:
+        raise ValueError(f"Inference rule missing {', '.join(missing)}: {rule}")
+
+    pair = (rule["from_type"], rule["to_type"])
+    if rule["relation_type"] is None:
+        return pair, None
+
+    direction = rule.get("direction", "both" if rule.get("bidirectional") else "forward")
+    if direction not in RULE_DIRECTIONS:
+        raise ValueError(f"Unknown rule direction: {direction} (expected one of {', '.join(RULE_DIRECTIONS)})")
+
+    return pair, {
+        "relation_type": rule["relation_type"],
+        "bidirectional": direction == "both",
+        "confidence": float(rule.get("confidence", BASE_CONFIDENCE)),
+        "max_distance": rule.get("max_distance"),
+    }
+
+
+class RuleTable:
+    """
+    编译后的推断规则表
+
+    类型映射为整数编码，规则存放在 [from_code][to_code] 的稠密二维表中，
+    内层循环只做整数下标访问。自定义规则按类型对覆盖或扩展默认的 INFERENCE_RULES。
+
+    links[a][b] 列出能生成 a→b 边的规则 [(规则编号, 规则, once)]:
+    不同类型的双向规则同时登记在正反两个方向；同类型双向规则 once=True，每对只生成 i<j 一条。
+    """
+
+    def __init__(self, rules: list[dict] = None):
+        """
+        Args:
+            rules: 自定义规则列表 (见 normalize_rule)，None 时只用默认规则
+        """
+        merged = {
+            pair: {
+                "relation_type": relation_type,
+                "bidirectional": bidirectional,
+                "confidence": BASE_CONFIDENCE,
+                "max_distance": None,
+            }
+            for pair, (relation_type, bidirectional) in INFERENCE_RULES.items()
+        }
+        for rule in rules or ():
+            pair, compiled = normalize_rule(rule)
+            if compiled is None:
+                merged.pop(pair, None)
+            else:
+                merged[pair] = compiled
+
+        self.types = list(dict.fromkeys(t for pair in merged for t in pair))
+        self.codes = {t: code for code, t in enumerate(self.types)}
+
+        size = len(self.types)
+        self.table = [[None] * size for _ in range(size)]
+        self.rules = []   # [(from_code, to_code, rule)]，按定义顺序
+        for (type_a, type_b), rule in merged.items():
+            code_a, code_b = self.codes[type_a], self.codes[type_b]
+            self.table[code_a][code_b] = rule
+            self.rules.append((code_a, code_b, rule))
+
+        self.links = [[[] for _ in range(size)] for _ in range(size)]
+        for k, (code_a, code_b, rule) in enumerate(self.rules):
+            same_type = code_a == code_b
+            self.links[code_a][code_b].append((k, rule, rule["bidirectional"] and same_type))
+            if rule["bidirectional"] and not same_type:
+                self.links[code_b][code_a].append((k, rule, False))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def lookup(self, type_a: str, type_b: str):
+        """按类型名查规则 (不存在返回 None)"""
+        code_a = self.codes.get(type_a)
+        code_b = self.codes.get(type_b)
+        if code_a is None or code_b is None:
+            return None
+        return self.table[code_a][code_b]
+
+    def links_between(self, type_a: str, type_b: str) -> list[tuple]:
+        """按类型名查能生成 type_a→type_b 边的规则 (见 links)"""
+        code_a = self.codes.get(type_a)
+        code_b = self.codes.get(type_b)
+        if code_a is None or code_b is None:
+            return []
+        return self.links[code_a][code_b]
+
+
+class RelationEdges:
+    """
+    紧凑边表: 节点用整数 id，各列存放在 array 中
+
+    每条边只占 from/to/类型码/置信度 四个定长字段，
+    关系字典只在 to_dicts 输出时构造；csr 提供邻接视图供图分析直接使用。
+    仅通过 RelationInferrer.infer_edges 使用 (按需启用)；process / 管道仍输出关系字典。
+    """
+
+    def __init__(self):
+        self.nodes = []        # 节点 id -> 名称
+        self.node_ids = {}     # 名称 -> 节点 id
+        self.relation_types = list(RELATION_TYPES)
+        self._type_codes = {name: code for code, name in enumerate(self.relation_types)}
+
+        self.sources = array('l')
+        self.targets = array('l')
+        self.type_codes = array('I')
+        self.confidences = array('d')
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def node_id(self, name: str) -> int:
+        """名称 -> 节点 id (不存在则分配)"""
+        idx = self.node_ids.get(name)
+        if idx is None:
+            idx = self.node_ids[name] = len(self.nodes)
+            self.nodes.append(name)
+        return idx
+
+    def type_code(self, relation_type: str) -> int:
+        """关系类型 -> 类型码 (不存在则分配)"""
+        code = self._type_codes.get(relation_type)
+        if code is None:
+            code = self._type_codes[relation_type] = len(self.relation_types)
+            self.relation_types.append(relation_type)
+        return code
+
+    def append(self, from_text: str, to_text: str, relation_type: str, confidence: float):
+        """追加一条边"""
+        self.sources.append(self.node_id(from_text))
+        self.targets.append(self.node_id(to_text))
+        self.type_codes.append(self.type_code(relation_type))
+        self.confidences.append(confidence)
+
+    def to_dicts(self):
+        """
+        按追加顺序输出关系字典 (与 RelationInferrer.process 格式一致)
+
+        Yields:
+            关系字典
+        """
+        nodes = self.nodes
+        relation_types = self.relation_types
+        for source, target, code, confidence in zip(
+            self.sources, self.targets, self.type_codes, self.confidences
+        ):
+            yield {
+                "type": "relation",
+                "from": nodes[source],
+                "to": nodes[target],
+                "relation_type": relation_types[code],
+                "confidence": confidence,
+                "inferred": True,
+            }
+
+    def csr(self, reverse: bool = False) -> tuple:
+        """
+        压缩稀疏行 (CSR) 邻接视图 (计数排序，O(V + E))
+
+        节点 u 的邻居为 indices[indptr[u]:indptr[u + 1]]，
+        对应边号 edge_ids[...] 可回查类型码与置信度列。
+
+        Args:
+            reverse: True 时按入边组织 (邻居为起点)
+
+        Returns:
+            (indptr, indices, edge_ids)
+        """
+        rows, cols = (self.targets, self.sources) if reverse else (self.sources, self.targets)
+        num_nodes = len(self.nodes)
+
+        indptr = array('l', [0]) * (num_nodes + 1)
+        for row in rows:
+            indptr[row + 1] += 1
+        for node in range(num_nodes):
+            indptr[node + 1] += indptr[node]
+
+        cursor = array('l', indptr[:-1])
+        indices = array('l', [0]) * len(rows)
+        edge_ids = array('l', [0]) * len(rows)
+        for edge, (row, col) in enumerate(zip(rows, cols)):
+            pos = cursor[row]
+            indices[pos] = col
+            edge_ids[pos] = edge
+            cursor[row] = pos + 1
+
+        return indptr, indices, edge_ids
+
+
+class _TopK:
+    """
+    按键去重的有界 top-k 池 (最小堆，过期项惰性删除)
+
+    排序键为 (得分, -顺序号)，同键只保留得分最高的一条，顺序号沿用该键首次出现时的值；
+    k 为 None 时不限数量。池满后堆顶只增不减，被淘汰的键即使再次出现也不会优于当前成员，
+    所以无需记住已淘汰的键，内存以 k 为界。
+    """
+
+    def __init__(self, k: int = None):
+        self.k = k
+        self.best = {}   # 键 -> (排序键, 顺序号, 候选)
+        self.heap = []   # (排序键, 键)，可能含过期项
+
+    def __len__(self) -> int:
+        return len(self.best)
+
+    def push(self, key: tuple, score: tuple, order: int, candidate: tuple) -> bool:
+        """
+        加入一条候选
+
+        Args:
+            key: 去重键
+            score: 得分 (越大越优先)
+            order: 顺序号 (得分相同时小者优先)
+            candidate: 候选
+
+        Returns:
+            是否为池中尚不存在的键
+        """
+        current = self.best.get(key)
+        if current is not None:
+            order = current[1]
+            rank = (*score, -order)
+            if rank > current[0]:
+                self.best[key] = (rank, order, candidate)
+                if self.k is not None:
+                    heapq.heappush(self.heap, (rank, key))
+                    self._compact()
+            return False
+
+        rank = (*score, -order)
+        if self.k is not None:
+            if self.k <= 0:
+                return True
+            if len(self.best) >= self.k:
+                self._drop_stale()
+                if rank <= self.heap[0][0]:
+                    return True
+                _, worst = heapq.heappop(self.heap)
+                del self.best[worst]
+            heapq.heappush(self.heap, (rank, key))
+
+        self.best[key] = (rank, order, candidate)
+        return True
+
+    def entries(self):
+        """池中条目 (顺序号, 排序键, 候选)"""
+        return [(order, rank, candidate) for rank, order, candidate in self.best.values()]
+
+    def _drop_stale(self):
+        """弹出堆顶的过期项 (同键已被更优的候选替换)"""
+        heap = self.heap
+        while heap[0][0] != self.best[heap[0][1]][0]:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        """过期项过多时重建堆"""
+        if len(self.heap) > 2 * self.k + 16:
+            self.heap = [(rank, key) for key, (rank, _, _) in self.best.items()]
+            heapq.heapify(self.heap)
+
 
 class RelationInferrer:
     """关系推断器"""
 
-    def __init__(self, scope_window: int = 50):
+    def __init__(self, scope_window: int = 50, scope_mode: str = "bucket",
+                 distance_decay: bool = False, max_per_item: int = None,
+                 max_per_scope: int = None, max_relations: int = None,
+                 scope_index=None, rules: list[dict] = None):
         """
         Args:
             scope_window: scope 窗口大小 (行数)
+            scope_mode: "bucket" 固定分组 (0-49, 50-99, ...)；
+                        "window" 滑动窗口 (同文件行距 < scope_window 即推断)
+            distance_decay: 仅 window 模式，置信度随行距线性衰减
+                            0.6 * (1 - 0.5 * 行距 / scope_window)
+            max_per_item: 每个起点项最多保留的关系数 (按置信度、行距排序，None 不限)
+            max_per_scope: 每个 scope (window 模式为每个文件) 最多保留的关系数
+            max_relations: 全局硬上限，达到后不再输出
+            scope_index: 结构化 scope 索引 (可选，如 scope_index.CodeScopeIndex)，
+                         bucket 模式下按 scope_index.scope_of(item) 分组，替代固定行号分组
+            rules: 自定义推断规则 (可选，见 normalize_rule)，覆盖或扩展 INFERENCE_RULES
         """
+        if scope_mode not in SCOPE_MODES:
+            raise ValueError(f"Unknown scope mode: {scope_mode} (expected one of {', '.join(SCOPE_MODES)})")
+
         self.scope_window = scope_window
+        self.scope_mode = scope_mode
+        self.distance_decay = distance_decay
+        self.max_per_item = max_per_item
+        self.max_per_scope = max_per_scope
+        self.max_relations = max_relations
+        self.scope_index = scope_index
+        self.rules = RuleTable(rules)
+        self.stats = {}
 
     def process(self, extractions: list[dict]) -> tuple[list[dict], list[dict]]:
         """
@@ -41,21 +399,85 @@ class RelationInferrer:
         Returns:
             (原始extractions, 新推断的relations列表)
         """
-        # 按 scope 分组
-        scopes = self._group_by_scope(extractions)
+        return extractions, list(self.iter_relations(extractions))
+
+    def iter_relations(self, extractions: list[dict]):
+        """
+        流式推断: 逐 scope 生成关系
+
+        峰值内存只与单个 scope 的候选数相关，适合直接接入 KG 输出或文件写入。
+        self.stats 随迭代逐 scope 更新，迭代结束后与 process 一致。
+
+        Args:
+            extractions: 提取项列表
+
+        Yields:
+            推断的关系
+        """
+        for candidate in self._iter_candidates(extractions):
+            yield self._to_relation(candidate)
 
-        inferred_relations = []
+    def infer_edges(self, extractions: list[dict]) -> "RelationEdges":
+        """
+        推断关系并以紧凑边数组返回 (不构造关系字典)
 
-        # 在每个 scope 内推断
-        for scope_key, items in scopes.items():
-            relations = self._infer_in_scope(items)
-            inferred_relations.extend(relations)
+        Args:
+            extractions: 提取项列表
 
-        return extractions, inferred_relations
+        Returns:
+            RelationEdges
+        """
+        edges = RelationEdges()
+        for text_a, text_b, relation_type, confidence, _ in self._iter_candidates(extractions):
+            edges.append(text_a, text_b, relation_type, confidence)
+        return edges
+
+    def _iter_candidates(self, extractions: list[dict]):
+        """
+        逐 scope 生成截断后的候选元组，并更新 self.stats
+
+        Args:
+            extractions: 提取项列表
+
+        Yields:
+            (from_text, to_text, relation_type, confidence, 行距)
+        """
+        if self.scope_mode == "window":
+            groups = self._group_by_file(extractions).values()
+            infer = self._infer_in_window
+        elif self.scope_mode == "mention":
+            groups = self._group_mentions(extractions).values()
+            infer = self._mention_inferrer(extractions)
+        else:
+            groups = self._group_by_scope(extractions).values()
+            infer = self._infer_in_scope
+
+        stats = self.stats = {"candidates": 0, "emitted": 0, "truncated": 0, "capped": False}
+        cap = self.max_relations
+
+        # 在每个 scope 内边推断边入堆；达到全局上限后不再扫描后续 scope。
+        # 提前停止时未扫描的候选不计入 candidates/truncated，由 capped 标记
+        for items in groups:
+            if cap is not None and stats["emitted"] >= cap:
+                if next(iter(infer(items)), None) is None:
+                    continue
+                stats["capped"] = True
+                break
+
+            remaining = None if cap is None else cap - stats["emitted"]
+            for candidate in self._limit(infer(items), remaining):
+                if cap is not None and stats["emitted"] >= cap:
+                    stats["capped"] = True
+                    break
+                stats["emitted"] += 1
+                stats["truncated"] = stats["candidates"] - stats["emitted"]
+                yield candidate
+
+            stats["truncated"] = stats["candidates"] - stats["emitted"]
 
     def _group_by_scope(self, extractions: list[dict]) -> dict:
         """
-        按 (source_file, line_group) 分组
+        按 (source_file, line_group) 分组；设置了 scope_index 时按 (source_file, 所属块) 分组
 
         Args:
             extractions: 提取列表
@@ -66,18 +488,23 @@ class RelationInferrer:
         scopes = {}
 
         for ext in extractions:
-            loc = ext.get('source_location', {})
-            line = loc.get('line')
+            if self.scope_index is not None:
+                line_group = self.scope_index.scope_of(ext)
+                if line_group is None:
+                    continue
+            else:
+                loc = ext.get('source_location', {})
+                line = loc.get('line')
 
-            if line is None:
-                continue
+                if line is None:
+                    continue
+
+                # 计算行分组 (0-49 -> 0, 50-99 -> 50, ...)
+                line_group = (line // self.scope_window) * self.scope_window
 
             # 获取源文件（如果有）
             source_file = ext.get('source_file', 'unknown')
 
-            # 计算行分组 (0-49 -> 0, 50-99 -> 50, ...)
-            line_group = (line // self.scope_window) * self.scope_window
-
             scope_key = (source_file, line_group)
 
             if scope_key not in scopes:
@@ -87,65 +514,336 @@ class RelationInferrer:
 
         return scopes
 
-    def _infer_in_scope(self, items: list[dict]) -> list[dict]:
+    def _group_by_file(self, extractions: list[dict]) -> dict:
+        """
+        按 source_file 分组并按行号排序 (window 模式)
+
+        Args:
+            extractions: 提取列表
+
+        Returns:
+            {source_file: [(line, item)]}，组内按行号升序
+        """
+        files = {}
+        for ext in extractions:
+            line = ext.get('source_location', {}).get('line')
+            if line is None or not ext.get('type') or not ext.get('text', ''):
+                continue
+            files.setdefault(ext.get('source_file', 'unknown'), []).append((line, ext))
+
+        for entries in files.values():
+            entries.sort(key=lambda entry: entry[0])
+
+        return files
+
+    def _infer_in_scope(self, items: list[dict]):
         """
         在单个 scope 内推断关系（有向推断）
 
+        先按类型分桶，只遍历规则表中存在的类型对，代价与输出规模成正比:
         有向规则: rule/constraint/event/state → entity 只生成正向关系
-        双向规则: entity ↔ entity 生成双向关系（去重: 只生成 i<j 的对）
+        同类型双向规则: entity ↔ entity 每对只生成一条（去重: 只生成 i<j 的对）
+        不同类型的双向规则: A→B 与 B→A 都生成，与出现顺序无关
+
+        按 (i, j) 顺序逐对生成，不物化整个 scope 的候选列表。
 
         Args:
             items: 同 scope 的提取项
 
-        Returns:
-            推断的关系列表
+        Yields:
+            候选关系 (from_text, to_text, relation_type, confidence, 行距)
+        """
+        codes = self.rules.codes
+
+        # 按类型编码分桶 (保留原始下标)
+        buckets = {}
+        item_codes = []
+        for idx, item in enumerate(items):
+            code = codes.get(item.get('type'))
+            if code is not None and item.get('text', ''):
+                buckets.setdefault(code, []).append(idx)
+            else:
+                code = None
+            item_codes.append(code)
+
+        # 只保留两端桶都非空的规则，按起点类型索引
+        links = self.rules.links
+        outgoing = {}
+        for code_a in buckets:
+            for code_b, bucket_b in buckets.items():
+                for k, rule, once in links[code_a][code_b]:
+                    outgoing.setdefault(code_a, []).append((k, bucket_b, rule, once))
+
+        for i, code_a in enumerate(item_codes):
+            rules = outgoing.get(code_a)
+            if not rules:
+                continue
+
+            # 合并各规则的终点桶，恢复逐对扫描的 (j, relation_type, k) 顺序
+            streams = [self._scope_targets(i, k, bucket_b, rule, once) for k, bucket_b, rule, once in rules]
+            for j, relation_type, k in heapq.merge(*streams):
+                rule = self.rules.rules[k][2]
+                distance = self._line_distance(items[i], items[j])
+                if rule["max_distance"] is not None and distance > rule["max_distance"]:
+                    continue
+                yield (items[i]['text'], items[j]['text'], relation_type, rule["confidence"], distance)
+
+    @staticmethod
+    def _scope_targets(i: int, k: int, bucket_b: list[int], rule: dict, once: bool):
         """
-        relations = []
-        seen = set()  # 去重: (from_text, to_text, relation_type)
+        起点 i 在规则 k 下的终点 (按下标升序)
 
-        for i, item_a in enumerate(items):
-            type_a = item_a.get('type')
-            text_a = item_a.get('text', '')
+        同类型双向规则 (once) 去重: 只生成 i < j 的对；其余规则只跳过自身。
 
-            if not type_a or not text_a:
+        Yields:
+            (j, relation_type, k)
+        """
+        relation_type = rule["relation_type"]
+        for j in bucket_b:
+            if j == i or (once and j < i):
                 continue
+            yield j, relation_type, k
 
-            for j, item_b in enumerate(items):
-                if i == j:
-                    continue
+    def _infer_in_window(self, entries: list[tuple]):
+        """
+        单个文件内的滑动窗口推断 (双指针扫描)
 
-                type_b = item_b.get('type')
-                text_b = item_b.get('text', '')
+        行距 < scope_window 的项两两检查规则表，代价 O(n log n + 窗口内对数)。
+        方向语义与 bucket 模式一致: 有向规则按类型定方向，
+        同类型双向规则只生成 先出现 → 后出现 的一条，不同类型的双向规则两个方向都生成。
+        同键重复的候选由 _limit 去重 (保留置信度最高的一条)。
 
-                if not type_b or not text_b:
-                    continue
+        Args:
+            entries: 按行号排序的 [(line, item)]
 
-                # 只查正向规则 (type_a, type_b)
-                rule = INFERENCE_RULES.get((type_a, type_b))
-                if not rule:
-                    continue
+        Yields:
+            候选关系 (from_text, to_text, relation_type, confidence, 行距)
+        """
+        window = self.scope_window
+        links = self.rules.links
+        codes = [self.rules.codes.get(item['type']) for _, item in entries]
 
-                relation_type, bidirectional = rule
+        left = 0
+        for right, (line_b, item_b) in enumerate(entries):
+            while line_b - entries[left][0] >= window:
+                left += 1
 
-                # 双向关系去重: 只在 i < j 时生成
-                if bidirectional and i > j:
+            code_b = codes[right]
+            if code_b is None:
+                continue
+            for idx in range(left, right):
+                code_a = codes[idx]
+                if code_a is None:
                     continue
+                line_a, item_a = entries[idx]
+                distance = line_b - line_a
+
+                # 先出现 → 后出现
+                for _, rule, _ in links[code_a][code_b]:
+                    if self._within(rule, distance):
+                        yield (item_a['text'], item_b['text'], rule["relation_type"],
+                               self._confidence(distance, rule["confidence"]), distance)
+
+                # 后出现 → 先出现 (同类型双向规则已由上一方向覆盖)
+                for _, rule, once in links[code_b][code_a]:
+                    if not once and self._within(rule, distance):
+                        yield (item_b['text'], item_a['text'], rule["relation_type"],
+                               self._confidence(distance, rule["confidence"]), distance)
+
+    def _group_mentions(self, extractions: list[dict]) -> dict:
+        """
+        按 source_file 分组需要扫描提及的非实体项 (mention 模式)
+
+        Args:
+            extractions: 提取列表
+
+        Returns:
+            {source_file: [items]}
+        """
+        files = {}
+        for ext in extractions:
+            if ext.get('type') == 'entity' or not ext.get('text', ''):
+                continue
+            files.setdefault(ext.get('source_file', 'unknown'), []).append(ext)
+        return files
+
+    def _mention_inferrer(self, extractions: list[dict]):
+        """
+        构建实体名自动机，返回单个分组的提及推断函数
+
+        所有实体的 text / entity_name / canonical_name / aliases 构成一个
+        Aho-Corasick 自动机，每个非实体项的文本只扫描一次，代价与文本总长成正比。
+
+        Args:
+            extractions: 提取列表
 
-                dedup_key = (text_a, text_b, relation_type)
-                if dedup_key in seen:
+        Returns:
+            items -> 候选关系生成器
+        """
+        patterns = []
+        targets = []   # 模式编号 -> 实体
+        seen = set()
+        for ext in extractions:
+            if ext.get('type') != 'entity' or not ext.get('text'):
+                continue
+            names = [ext.get(field) for field in MENTION_NAME_FIELDS] + list(ext.get('aliases') or ())
+            for name in names:
+                if not name or len(name) < MIN_MENTION_LENGTH or (name, ext['text']) in seen:
+                    continue
+                seen.add((name, ext['text']))
+                patterns.append(name)
+                targets.append(ext)
+
+        automaton = AhoCorasick(patterns)
+
+        def infer(items: list[dict]):
+            for item in items:
+                item_type = item.get('type')
+                forward = self.rules.links_between(item_type, 'entity')
+                backward = self.rules.links_between('entity', item_type)
+                if not forward and not backward:
                     continue
-                seen.add(dedup_key)
 
-                relations.append({
-                    "type": "relation",
-                    "from": text_a,
-                    "to": text_b,
-                    "relation_type": relation_type,
-                    "confidence": 0.6,
-                    "inferred": True,
-                })
+                mentioned = {}
+                for field in MENTION_TEXT_FIELDS:
+                    content = item.get(field)
+                    if not content:
+                        continue
+                    for start, end, pid in automaton.iter_matches(content):
+                        if _at_identifier_boundary(content, start, end):
+                            mentioned.setdefault(targets[pid]['text'], targets[pid])
+
+                for entity_text, entity in mentioned.items():
+                    if entity_text == item['text']:
+                        continue
+                    distance = self._line_distance(item, entity)
+                    for _, rule, _ in forward:
+                        yield (item['text'], entity_text, rule["relation_type"],
+                               self._mention_confidence(rule), distance)
+                    for _, rule, _ in backward:
+                        yield (entity_text, item['text'], rule["relation_type"],
+                               self._mention_confidence(rule), distance)
+
+        return infer
+
+    @staticmethod
+    def _line_distance(item_a: dict, item_b: dict) -> float:
+        """同文件两项的行距；不同文件或缺行号时为 UNKNOWN_DISTANCE"""
+        line_a = item_a.get('source_location', {}).get('line')
+        line_b = item_b.get('source_location', {}).get('line')
+        if (line_a is None or line_b is None
+                or item_a.get('source_file', 'unknown') != item_b.get('source_file', 'unknown')):
+            return UNKNOWN_DISTANCE
+        return abs(line_a - line_b)
+
+    def _confidence(self, distance: int, base: float = BASE_CONFIDENCE) -> float:
+        """按行距计算置信度 (未开启衰减时为规则置信度)"""
+        if not self.distance_decay or self.scope_window <= 0:
+            return base
+        return round(base * (1 - 0.5 * distance / self.scope_window), 4)
+
+    @staticmethod
+    def _within(rule: dict, distance: int) -> bool:
+        """行距是否在规则的 max_distance 之内"""
+        return rule["max_distance"] is None or distance <= rule["max_distance"]
+
+    @staticmethod
+    def _mention_confidence(rule: dict) -> float:
+        """显式提及的置信度: 规则置信度 + MENTION_BONUS (不超过 1)"""
+        return round(min(rule["confidence"] + MENTION_BONUS, 1.0), 4)
+
+    def _limit(self, candidates, remaining: int = None) -> list[tuple]:
+        """
+        去重并按 max_per_item / max_per_scope 截断单个 scope 的候选 (边枚举边入堆)
+
+        排序键: 置信度高优先，其次行距近，再次出现顺序早；同键 (from, to, relation_type)
+        只保留排序键最大的一条。每个起点项与整个 scope 各维护一个大小为 k 的堆，
+        内存以 起点项数 × max_per_item (或 max_per_scope) 为界，不随候选对数增长。
+        未设置 top-k 时不经过堆，只按键去重；收集满 remaining 个不同的键即停止枚举，
+        此时若仍有未扫描的候选，置 stats["capped"]。
+
+        Args:
+            candidates: 候选关系的可迭代对象 (按枚举顺序)
+            remaining: 全局上限剩余额度 (None 不限)
+
+        Returns:
+            保留的候选 (按首次出现顺序)
+        """
+        per_item = self.max_per_item
+        per_scope = self.max_per_scope
+
+        if per_item is None and per_scope is None:
+            return self._dedupe(candidates, remaining)
+
+        pools = {}   # 起点项 -> _TopK (max_per_item)
+        pool = _TopK(per_scope if per_item is None else None)
+        scanned = 0
+
+        for seq, candidate in enumerate(candidates):
+            text_a, text_b, relation_type, confidence, distance = candidate
+            if per_item is not None:
+                target = pools.get(text_a)
+                if target is None:
+                    target = pools[text_a] = _TopK(per_item)
+            else:
+                target = pool
+            if target.push((text_a, text_b, relation_type), (confidence, -distance), seq, candidate):
+                scanned += 1
+
+        self.stats["candidates"] += scanned
+
+        if per_item is not None:
+            entries = sorted(entry for target in pools.values() for entry in target.entries())
+            if per_scope is not None:
+                pool = _TopK(per_scope)
+                for order, rank, candidate in entries:
+                    pool.push(candidate[:3], rank[:-1], order, candidate)
+                entries = sorted(pool.entries())
+        else:
+            entries = sorted(pool.entries())
+
+        return [candidate for _, _, candidate in entries]
+
+    def _dedupe(self, candidates, remaining: int = None) -> list[tuple]:
+        """
+        无 top-k 时的快速路径: 同键只保留 (置信度, -行距) 最大的一条，保持首次出现顺序
 
-        return relations
+        Args:
+            candidates: 候选关系的可迭代对象
+            remaining: 全局上限剩余额度 (None 不限)
+
+        Returns:
+            保留的候选
+        """
+        best = {}
+        candidates = iter(candidates)
+        for candidate in candidates:
+            key = candidate[:3]
+            current = best.get(key)
+            if current is None:
+                best[key] = candidate
+                if remaining is not None and len(best) >= remaining:
+                    if next(candidates, None) is not None:
+                        self.stats["capped"] = True
+                    break
+            elif (candidate[3], -candidate[4]) > (current[3], -current[4]):
+                best[key] = candidate
+
+        self.stats["candidates"] += len(best)
+        return list(best.values())
+
+    @staticmethod
+    def _to_relation(candidate: tuple) -> dict:
+        """候选元组 -> 关系字典"""
+        text_a, text_b, relation_type, confidence, _ = candidate
+        return {
+            "type": "relation",
+            "from": text_a,
+            "to": text_b,
+            "relation_type": relation_type,
+            "confidence": confidence,
+            "inferred": True,
+        }
 
 
 if __name__ == "__main__":
@@ -189,3 +887,26 @@ if __name__ == "__main__":
     import json
     print(f"推断出 {len(inferred)} 条关系:")
     print(json.dumps(inferred, indent=2, ensure_ascii=False))
+
+    # 滑动窗口: 第 100 行的实体与第 100-49 行以内的项也会关联
+    windowed = RelationInferrer(scope_window=80, scope_mode="window", distance_decay=True)
+    _, inferred = windowed.process(extractions)
+    print(f"滑动窗口推断出 {len(inferred)} 条关系")
+
+    # 有界输出: 每个起点项只保留最近的 1 条
+    bounded = RelationInferrer(scope_window=50, max_per_item=1)
+    _, inferred = bounded.process(extractions)
+    print(f"有界推断出 {len(inferred)} 条关系，统计: {bounded.stats}")
+
+    # 提及模式: 只关联文本中点名的实体，不受行距限制
+    mention = RelationInferrer(scope_mode="mention")
+    _, inferred = mention.process(extractions + [
+        {"type": "rule", "text": "OtherEntity 只能由 CreateActorCommand 创建", "source_file": "other.md"},
+    ])
+    print("提及推断:", [(r["from"], r["to"], r["relation_type"]) for r in inferred])
+
+    # 紧凑边表与 CSR 邻接
+    edges = inferrer.infer_edges(extractions)
+    indptr, indices, _ = edges.csr()
+    for node, name in enumerate(edges.nodes):
+        print(name, "->", [edges.nodes[col] for col in indices[indptr[node]:indptr[node + 1]]])
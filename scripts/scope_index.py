@@ -0,0 +1,522 @@
+"""
+Scope Index Module
+
+源文件结构化 scope 索引 (供 RelationInferrer 按真实代码块分组)：
+- 花括号语言 (C#/Java/JS/C 等): 按括号深度解析块，跳过字符串与注释，
+  if/for/while/try 等控制流块和对象初始化块不作为 scope
+- Python: 优先用 ast 取 class / def 的行范围，语法错误时退回缩进解析
+- 嵌套块展平为互不重叠的行段，按行号二分查找最内层块，单次 O(log n)
+- 文档 (Markdown/合同/规范): 按标题与编号条款构建章节树 (字符区间)，
+  按 char_start 二分查找最内层章节
+"""
+
+import ast
+import re
+from bisect import bisect_right
+
+
+# 不构成独立 scope 的控制流关键字 (块归属外层方法/类)
+CONTROL_KEYWORDS = frozenset({
+    "if", "else", "for", "foreach", "while", "do", "switch", "case", "default",
+    "try", "catch", "finally", "using", "lock", "fixed", "checked", "unchecked",
+    "unsafe", "get", "set", "init", "add", "remove", "with", "synchronized",
+})
+
+# 顶层 (不在任何块内) 的 scope 键
+TOP_LEVEL = -1
+
+_FIRST_WORD = re.compile(r"[A-Za-z_]\w*")
+_TYPE_DECLARATION = re.compile(r"\b(?:class|struct|interface|enum|namespace|record)\s+(\w+)")
+_CALLABLE_NAME = re.compile(r"(\w+)\s*(?:<[^()]*>)?\s*\(")
+
+
+def _strip_parens(text: str) -> str:
+    """去掉括号内的内容 (参数默认值中的 '=' 不影响判断)"""
+    depth = 0
+    kept = []
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            kept.append(ch)
+    return "".join(kept)
+
+
+def _block_name(header: str) -> str:
+    """从块头提取类型名或方法名 (取不到时返回压缩后的块头)"""
+    match = _TYPE_DECLARATION.search(header) or _CALLABLE_NAME.search(header)
+    if match:
+        return match.group(1)
+    return " ".join(header.split())[:40]
+
+
+def is_scope_header(header: str) -> bool:
+    """
+    判断花括号块头是否构成 scope (类型、命名空间、方法、函数)
+
+    Args:
+        header: '{' 之前到上一个 ';' / '{' / '}' 之间的文本
+
+    Returns:
+        控制流块、赋值/初始化块、lambda 与空块头返回 False
+    """
+    header = header.strip()
+    if not header:
+        return False
+
+    first = _FIRST_WORD.match(header)
+    if first and first.group(0) in CONTROL_KEYWORDS:
+        return False
+
+    outside = _strip_parens(header)
+    if "=" in outside or outside.rstrip().endswith(("=>", ",", "(")):
+        return False
+
+    return True
+
+
+def parse_brace_blocks(source_text: str) -> list[tuple]:
+    """
+    解析花括号语言的 scope 块
+
+    跳过 // 与 /* */ 注释、"..." / '...' / @"..." 字符串，
+    只记录 is_scope_header 为真的块。
+
+    Args:
+        source_text: 源码文本
+
+    Returns:
+        [(start_line, end_line, name)]，行号从 1 开始，首尾均含
+    """
+    blocks = []
+    stack = []            # [(start_line, name) 或 None (非 scope 块)]
+    header_chars = []
+    header_line = None    # 块头首个非空字符所在行
+
+    line = 1
+    pos = 0
+    length = len(source_text)
+
+    while pos < length:
+        ch = source_text[pos]
+        nxt = source_text[pos + 1] if pos + 1 < length else ""
+
+        if ch == "\n":
+            line += 1
+            header_chars.append(ch)
+            pos += 1
+            continue
+
+        # 注释
+        if ch == "/" and nxt == "/":
+            end = source_text.find("\n", pos)
+            pos = length if end == -1 else end
+            continue
+        if ch == "/" and nxt == "*":
+            end = source_text.find("*/", pos + 2)
+            end = length if end == -1 else end + 2
+            line += source_text.count("\n", pos, end)
+            pos = end
+            continue
+
+        # 字符串 (verbatim 字符串中 "" 为转义，其他字符串中 \ 为转义)
+        if ch in "\"'":
+            verbatim = ch == '"' and pos > 0 and source_text[pos - 1] == "@"
+            end = pos + 1
+            while end < length:
+                c = source_text[end]
+                if c == "\\" and not verbatim:
+                    end += 2
+                    continue
+                if c == ch:
+                    if verbatim and end + 1 < length and source_text[end + 1] == ch:
+                        end += 2
+                        continue
+                    break
+                if c == "\n" and not verbatim and ch == "'":
+                    break
+                end += 1
+            line += source_text.count("\n", pos, end)
+            header_chars.append(ch * 2)
+            if header_line is None:
+                header_line = line
+            pos = end + 1
+            continue
+
+        if ch == "{":
+            header = "".join(header_chars)
+            if is_scope_header(header):
+                stack.append((header_line or line, _block_name(header)))
+            else:
+                stack.append(None)
+            header_chars = []
+            header_line = None
+        elif ch == "}":
+            if stack:
+                opened = stack.pop()
+                if opened is not None:
+                    blocks.append((opened[0], line, opened[1]))
+            header_chars = []
+            header_line = None
+        elif ch == ";":
+            header_chars = []
+            header_line = None
+        else:
+            if header_line is None and not ch.isspace():
+                header_line = line
+            header_chars.append(ch)
+
+        pos += 1
+
+    blocks.sort(key=lambda block: (block[0], -block[1]))
+    return blocks
+
+
+def parse_python_blocks(source_text: str) -> list[tuple]:
+    """
+    解析 Python 的 class / def 块 (ast，失败时退回缩进解析)
+
+    Args:
+        source_text: 源码文本
+
+    Returns:
+        [(start_line, end_line, name)]
+    """
+    try:
+        tree = ast.parse(source_text)
+    except SyntaxError:
+        return parse_indent_blocks(source_text)
+
+    blocks = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            blocks.append((start, node.end_lineno, node.name))
+
+    blocks.sort(key=lambda block: (block[0], -block[1]))
+    return blocks
+
+
+_INDENT_HEADER = re.compile(r"^(\s*)(?:async\s+)?(?:def|class)\s+(\w+)")
+
+
+def parse_indent_blocks(source_text: str) -> list[tuple]:
+    """
+    按缩进解析 def / class 块 (无法解析语法时的退路)
+
+    块从头部行开始，延续到下一个缩进不大于头部的非空行之前。
+
+    Args:
+        source_text: 源码文本
+
+    Returns:
+        [(start_line, end_line, name)]
+    """
+    blocks = []
+    open_blocks = []      # [(indent, start_line, name)]
+    last_content = 0
+
+    for line_no, text in enumerate(source_text.splitlines(), 1):
+        if not text.strip() or text.lstrip().startswith("#"):
+            continue
+
+        indent = len(text) - len(text.lstrip())
+        while open_blocks and indent <= open_blocks[-1][0]:
+            _, start, name = open_blocks.pop()
+            blocks.append((start, last_content, name))
+
+        match = _INDENT_HEADER.match(text)
+        if match:
+            open_blocks.append((indent, line_no, match.group(2)))
+        last_content = line_no
+
+    for _, start, name in open_blocks:
+        blocks.append((start, last_content, name))
+
+    blocks.sort(key=lambda block: (block[0], -block[1]))
+    return blocks
+
+
+def flatten_intervals(intervals: list[tuple]) -> tuple[list, list]:
+    """
+    将嵌套区间展平为互不重叠的段，每段标注最内层区间编号
+
+    Args:
+        intervals: 按 (start, -end) 排序的 [(start, end, ...)]，首尾均含，互相嵌套或不相交；
+                   兄弟区间可共用一行 ("} void G() {")，该行归后开始的区间
+
+    Returns:
+        (段起点列表, 段所属区间编号列表)，不在任何区间内的段编号为 TOP_LEVEL
+    """
+    starts = []
+    owners = []
+
+    def emit(start, owner):
+        if starts and starts[-1] == start:
+            owners[-1] = owner
+        else:
+            starts.append(start)
+            owners.append(owner)
+        # 与前一段同属一个区间时合并
+        if len(owners) >= 2 and owners[-2] == owners[-1]:
+            starts.pop()
+            owners.pop()
+
+    stack = []
+    for idx, (start, end, *_) in enumerate(intervals):
+        # 栈顶不包含当前区间即已关闭 (含结束行与当前起始行相同的兄弟区间)
+        while stack and intervals[stack[-1]][1] < end:
+            closed = stack.pop()
+            emit(min(intervals[closed][1] + 1, start), stack[-1] if stack else TOP_LEVEL)
+        emit(start, idx)
+        stack.append(idx)
+
+    while stack:
+        closed = stack.pop()
+        emit(intervals[closed][1] + 1, stack[-1] if stack else TOP_LEVEL)
+
+    return starts, owners
+
+
+_MD_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_CN_CLAUSE = re.compile(r"^\s*第[一二三四五六七八九十百千零〇\d]+([章节条])\s*(.*?)\s*$")
+_NUMBERED_CLAUSE = re.compile(r"^\s*(\d{1,3}(?:\.\d{1,3})*)(?:[.、)）]\s*|\s+(?=\D))(\S.*?)\s*$")
+_MD_LIST_ITEM = re.compile(r"^\s*\d{1,9}\.\s")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+# 章节层级: Markdown 标题 1-6，中文章/节/条 7-9，数字编号条款 9 + 编号深度
+# 数字编号条款: 不以标点结尾，避免 "0.5 秒后重试。" 这类句子被拆成章节；单级编号还须为短行
+# 并带分隔符 ("1." / "1、" / "1)")，排除长列表项与 "3 个工作日" 这类计数开头的句子。
+# 出现过 Markdown 标题的文档中，"1. xxx" 为 Markdown 有序列表语法，不视为条款 (见 parse_sections)
+_CN_CLAUSE_LEVELS = {"章": 7, "节": 8, "条": 9}
+
+# 编号条款标题的最大长度 (单级编号) 与不允许的结尾标点
+MAX_CLAUSE_TITLE = 30
+_TERMINAL_PUNCTUATION = "。．.，,；;：:！!？?、"
+
+
+def heading_level(line: str):
+    """
+    识别章节标题行
+
+    Args:
+        line: 单行文本 (不含换行)
+
+    Returns:
+        (层级, 标题)；非标题行返回 None
+    """
+    match = _MD_HEADING.match(line)
+    if match:
+        return len(match.group(1)), match.group(2)
+
+    match = _CN_CLAUSE.match(line)
+    if match:
+        return _CN_CLAUSE_LEVELS[match.group(1)], line.strip()
+
+    match = _NUMBERED_CLAUSE.match(line)
+    if match and _is_clause_heading(match.group(1), line[match.end(1):], match.group(2)):
+        return 9 + match.group(1).count(".") + 1, line.strip()
+
+    return None
+
+
+def _is_clause_heading(number: str, rest: str, title: str) -> bool:
+    """数字编号行是否为条款标题 (见 _NUMBERED_CLAUSE 说明)"""
+    if title[-1] in _TERMINAL_PUNCTUATION:
+        return False
+    if "." in number:
+        return True
+    if not rest or rest[0].isspace():
+        return False
+    return len(title) <= MAX_CLAUSE_TITLE
+
+
+def parse_sections(source_text: str) -> list[tuple]:
+    """
+    扫描标题与编号条款，构建章节树
+
+    每个章节从标题行起，到下一个层级不深于它的标题之前结束；
+    代码围栏 (``` / ~~~) 内的行不视为标题；出现 Markdown 标题后，
+    "1. xxx" 形式的行按 Markdown 有序列表处理，留在所属章节内。
+
+    Args:
+        source_text: 文档文本
+
+    Returns:
+        [(char_start, char_end, level, title)]，char_end 不含，按 char_start 排序
+    """
+    sections = []
+    open_sections = []   # 章节编号栈
+    in_fence = False
+    markdown = False     # 是否已出现 Markdown 标题
+    offset = 0
+
+    for raw_line in source_text.splitlines(keepends=True):
+        line = raw_line.rstrip("\r\n")
+
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            heading = heading_level(line)
+            if heading is not None and markdown and heading[0] > 9 and _MD_LIST_ITEM.match(line):
+                heading = None
+            if heading is not None:
+                level, title = heading
+                markdown = markdown or _MD_HEADING.match(line) is not None
+                while open_sections and sections[open_sections[-1]][2] >= level:
+                    sections[open_sections.pop()][1] = offset
+                open_sections.append(len(sections))
+                sections.append([offset, None, level, title])
+
+        offset += len(raw_line)
+
+    for idx in open_sections:
+        sections[idx][1] = offset
+
+    return [tuple(section) for section in sections]
+
+
+class CodeScopeIndex:
+    """代码块 scope 索引"""
+
+    def __init__(self, source_text: str, language: str = None, source_file: str = None):
+        """
+        Args:
+            source_text: 源码文本
+            language: "python" 或 "brace" (默认按 source_file 扩展名判断，.py 为 python)
+            source_file: 源文件名 (可选)
+        """
+        if language is None:
+            language = "python" if (source_file or "").endswith((".py", ".pyw")) else "brace"
+        if language not in ("python", "brace"):
+            raise ValueError(f"Unknown language: {language} (expected one of python, brace)")
+
+        self.language = language
+        if language == "python":
+            self.blocks = parse_python_blocks(source_text)
+        else:
+            self.blocks = parse_brace_blocks(source_text)
+
+        self._starts, self._owners = flatten_intervals(self.blocks)
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def block_at(self, line: int) -> int:
+        """
+        行号所在的最内层块 (二分查找)
+
+        Args:
+            line: 行号 (从 1 开始)
+
+        Returns:
+            块编号 (self.blocks 下标)；不在任何块内返回 TOP_LEVEL
+        """
+        pos = bisect_right(self._starts, line) - 1
+        return self._owners[pos] if pos >= 0 else TOP_LEVEL
+
+    def scope_of(self, item: dict):
+        """
+        提取项所属 scope (RelationInferrer 的 scope_index 接口)
+
+        Args:
+            item: 已定位的提取项
+
+        Returns:
+            块编号；缺少行号时返回 None
+        """
+        line = item.get('source_location', {}).get('line')
+        if line is None:
+            return None
+        return self.block_at(line)
+
+
+class DocScopeIndex:
+    """文档章节 scope 索引"""
+
+    def __init__(self, source_text: str):
+        """
+        Args:
+            source_text: 文档文本 (Markdown / 合同 / 规范)
+        """
+        self.sections = parse_sections(source_text)
+        self._starts, self._owners = flatten_intervals(
+            [(start, end - 1) for start, end, _, _ in self.sections]
+        )
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def section_at(self, offset: int) -> int:
+        """
+        字符偏移所在的最内层章节 (二分查找)
+
+        Args:
+            offset: 字符偏移
+
+        Returns:
+            章节编号 (self.sections 下标)；首个标题之前返回 TOP_LEVEL
+        """
+        pos = bisect_right(self._starts, offset) - 1
+        return self._owners[pos] if pos >= 0 else TOP_LEVEL
+
+    def scope_of(self, item: dict):
+        """
+        提取项所属 scope (RelationInferrer 的 scope_index 接口)
+
+        Args:
+            item: 已定位的提取项
+
+        Returns:
+            章节编号；缺少 char_start 时返回 None
+        """
+        offset = item.get('source_location', {}).get('char_start')
+        if offset is None:
+            return None
+        return self.section_at(offset)
+
+
+if __name__ == "__main__":
+    # 测试示例
+    source = """namespace Game {
+    public class Level {
+        private int count = 0;
+
+        public void Update() {
+            if (count > 0) {
+                count--;
+            }
+        }
+
+        public void Reset() {
+            count = 0;
+        }
+    }
+}
+"""
+    index = CodeScopeIndex(source, source_file="Level.cs")
+    for start, end, name in index.blocks:
+        print(f"{name}: {start}-{end}")
+    for line in (3, 7, 12, 16):
+        block = index.block_at(line)
+        print(f"line {line} ->", index.blocks[block][2] if block != TOP_LEVEL else "top-level")
+
+    doc = """# 采购合同
+
+## 第一章 总则
+
+第一条 甲方负责审批。
+
+第二条 乙方负责交付。
+
+## 第二章 付款
+1、预付款不超过 30%
+1.1 须经财务审批
+"""
+    doc_index = DocScopeIndex(doc)
+    for start, end, level, title in doc_index.sections:
+        print(f"[{level}] {title}: {start}-{end}")
+    offset = doc.index("须经")
+    print("须经财务审批 ->", doc_index.sections[doc_index.section_at(offset)][3])
@@ -0,0 +1,202 @@
+"""
+Sharded Entity Resolution Module
+
+多文件分片的全局实体消歧 (map-reduce)：
+- map: 每个分片在 worker 进程内本地聚类，只输出紧凑签名
+  (本地簇的标准名、成员名、每个成员的分块键)
+- reduce: 并查集合并本地簇，再按分块键找出跨分片的名称候选对
+  (任一成员均可命中，不只标准名)，验证相似度后合并，得到一个全局别名映射
+- apply: 将全局别名映射应用回每个分片
+
+跨分片合并为传递语义 (并查集)，与 clustering="transitive" 一致。
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from entity_index import PrefixBlockIndex
+from entity_resolver import EntityResolver, UnionFind
+
+
+def _map_shard(task: tuple) -> list[tuple]:
+    """
+    map 阶段: 本地聚类并输出签名 (顶层函数，可被 worker 进程序列化)
+
+    Args:
+        task: (threshold, blocking, clustering, extractions)
+
+    Returns:
+        [(标准名, [成员名], [(成员写入键, 成员探查键)]), ...]
+    """
+    threshold, blocking, clustering, extractions = task
+
+    resolver = EntityResolver(threshold=threshold, blocking=blocking, clustering=clustering)
+    names = list(dict.fromkeys(
+        e.get('text', '') for e in extractions
+        if e.get('type') == 'entity' and e.get('text')
+    ))
+    if not names:
+        return []
+
+    # 静态 token 顺序: 不同分片的分块键可以直接比较
+    index = PrefixBlockIndex(threshold) if threshold > 0 else None
+
+    signatures = []
+    for cluster in resolver._cluster(names):
+        canonical = max((names[idx] for idx in cluster), key=resolver._canonical_score)
+        members = [names[idx] for idx in cluster]
+        # 每个成员都输出分块键: 跨分片相似可能经由非标准名成员传递
+        if index is not None:
+            keys = [(index.block_keys(member), index.probe_keys(member)) for member in members]
+        else:
+            keys = [([], []) for _ in members]
+        signatures.append((canonical, members, keys))
+
+    return signatures
+
+
+class ShardedEntityResolver:
+    """分片 map-reduce 实体消歧器"""
+
+    def __init__(self, threshold: float = 0.7, blocking: str = "prefix",
+                 clustering: str = "greedy", workers: int = None):
+        """
+        Args:
+            threshold: 相似度阈值
+            blocking: 分片内候选生成策略 (同 EntityResolver)
+            clustering: 分片内聚类语义 (同 EntityResolver)
+            workers: worker 进程数 (默认 CPU 核数；1 为进程内串行)
+        """
+        self.threshold = threshold
+        self.blocking = blocking
+        self.clustering = clustering
+        self.workers = workers
+
+        # 归约阶段的相似度验证与标准名选择
+        self.resolver = EntityResolver(threshold=threshold, blocking=blocking, clustering=clustering)
+        self.stats = {}
+
+    def resolve(self, shards: list[list[dict]]) -> dict:
+        """
+        计算全局别名映射
+
+        Args:
+            shards: 分片列表，每个分片是一个提取项列表
+
+        Returns:
+            {旧名: 标准名}
+        """
+        tasks = [(self.threshold, self.blocking, self.clustering, shard) for shard in shards]
+
+        if self.workers == 1 or len(shards) <= 1:
+            shard_signatures = [_map_shard(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                shard_signatures = list(pool.map(_map_shard, tasks))
+
+        return self._reduce(shard_signatures)
+
+    def _reduce(self, shard_signatures: list[list[tuple]]) -> dict:
+        """
+        reduce 阶段: 并查集合并本地簇与跨分片相似簇
+
+        Args:
+            shard_signatures: 每个分片的签名列表
+
+        Returns:
+            {旧名: 标准名}
+        """
+        uf = UnionFind()
+        node_of = {}       # 名称 -> 并查集节点
+        names = []         # 节点 -> 名称
+        blocks = {}        # 分块键 -> [名称节点]
+        probes = []        # (节点, 探查键)
+        indexed = set()    # 已入块的名称节点
+
+        def node(name: str) -> int:
+            idx = node_of.get(name)
+            if idx is None:
+                idx = node_of[name] = uf.add()
+                names.append(name)
+            return idx
+
+        local_clusters = 0
+        for signatures in shard_signatures:
+            for canonical, members, keys in signatures:
+                local_clusters += 1
+                root = node(canonical)
+                for member, (block_keys, probe_keys) in zip(members, keys):
+                    idx = node(member)
+                    uf.union(root, idx)
+
+                    # 相同名称已在别的分片出现过: 无需再入块
+                    if idx in indexed:
+                        continue
+                    indexed.add(idx)
+                    probes.append((idx, probe_keys))
+                    for key in block_keys:
+                        blocks.setdefault(key, []).append(idx)
+
+        # 跨分片候选对: 共享分块键的名称 (同一连通分量内的跳过)
+        comparisons = 0
+        seen = set()
+        for idx, probe_keys in probes:
+            for key in probe_keys:
+                for other in blocks.get(key, ()):
+                    if other >= idx or (other, idx) in seen:
+                        continue
+                    seen.add((other, idx))
+                    if uf.find(other) == uf.find(idx):
+                        continue
+                    comparisons += 1
+                    if self.resolver._similarity(names[other], names[idx], self.threshold) >= self.threshold:
+                        uf.union(other, idx)
+
+        # 全局标准名: 每个连通分量中 canonical_score 最高的名称
+        alias_map = {}
+        groups = uf.groups()
+        for group in groups:
+            canonical = max((names[idx] for idx in group), key=self.resolver._canonical_score)
+            for idx in group:
+                if names[idx] != canonical:
+                    alias_map[names[idx]] = canonical
+
+        self.stats = {
+            "shards": len(shard_signatures),
+            "local_clusters": local_clusters,
+            "names": len(names),
+            "cross_shard_comparisons": comparisons,
+            "global_clusters": len(groups),
+        }
+
+        return alias_map
+
+    def process(self, shards: list[list[dict]]) -> list[list[dict]]:
+        """
+        全局消歧并应用回每个分片
+
+        Args:
+            shards: 分片列表
+
+        Returns:
+            合并后的分片列表 (顺序不变)
+        """
+        alias_map = self.resolve(shards)
+        return [self.resolver.apply_alias_map(shard, alias_map) for shard in shards]
+
+
+if __name__ == "__main__":
+    # 测试示例: 两个文件各自提取，跨文件合并
+    shards = [
+        [
+            {"type": "entity", "text": "MGMultiGateSolver"},
+            {"type": "relation", "from": "MGMultiGateSolver", "to": "Actor"},
+        ],
+        [
+            {"type": "entity", "text": "MGMultiGateSolvr"},
+            {"type": "entity", "text": "Actor"},
+        ],
+    ]
+
+    sharded = ShardedEntityResolver(threshold=0.7, workers=1)
+    print("全局别名映射:", sharded.resolve(shards))
+    print("统计:", sharded.stats)
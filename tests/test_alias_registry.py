@@ -0,0 +1,88 @@
+"""Tests for alias_registry module."""
+
+import pytest
+from alias_registry import AliasRegistry
+from entity_resolver import EntityResolver
+
+
+class TestAliasRegistry:
+    """Tests for the AliasRegistry class."""
+
+    def test_new_names_become_canonicals(self, tmp_path):
+        with AliasRegistry(tmp_path / "aliases.db") as registry:
+            mapping = registry.resolve(["MGMultiGateSolver", "MGMultiGateSolvr", "Actor"])
+            assert mapping["MGMultiGateSolvr"] == "MGMultiGateSolver"
+            assert mapping["Actor"] == "Actor"
+            assert len(registry) == 2
+            assert registry.stats == {"known": 0, "matched_canonicals": 0, "new_canonicals": 2}
+
+            registry.resolve(["Actor", "MGMultiGateSolverX", "CreateActorCommand"])
+            assert registry.stats == {"known": 1, "matched_canonicals": 1, "new_canonicals": 1}
+
+    def test_canonical_stable_across_runs(self, tmp_path):
+        path = tmp_path / "aliases.db"
+        with AliasRegistry(path) as registry:
+            registry.resolve(["MGMultiGateSolver"])
+
+        # A longer name arrives later: yesterday's canonical is kept
+        with AliasRegistry(path) as registry:
+            mapping = registry.resolve(["MGMultiGateSolverX"])
+            assert mapping["MGMultiGateSolverX"] == "MGMultiGateSolver"
+            assert registry.lookup("MGMultiGateSolverX") == "MGMultiGateSolver"
+
+    def test_unknown_lookup(self, tmp_path):
+        with AliasRegistry(tmp_path / "aliases.db") as registry:
+            assert registry.lookup("Nothing") is None
+            assert registry.resolve([]) == {}
+
+    def test_threshold_change_rebuilds_keys(self, tmp_path):
+        path = tmp_path / "aliases.db"
+        with AliasRegistry(path, threshold=0.9) as registry:
+            registry.resolve(["GateLevelData"])
+
+        with AliasRegistry(path, threshold=0.6) as registry:
+            mapping = registry.resolve(["GateLevel"])
+            assert mapping["GateLevel"] == "GateLevelData"
+
+    def test_resolver_config_passed_through(self, tmp_path):
+        with AliasRegistry(tmp_path / "aliases.db", blocking=None, clustering="transitive",
+                           similarity="tfidf") as registry:
+            assert registry.resolver.blocking is None
+            assert registry.resolver.clustering == "transitive"
+            assert registry.resolver.similarity == "tfidf"
+
+            registry.resolve(["GateLevelData"])
+            mapping = registry.resolve(["gate_level_data"])
+            assert mapping["gate_level_data"] == "GateLevelData"
+
+
+class TestEntityResolverWithRegistry:
+    """EntityResolver backed by a persistent registry."""
+
+    def test_references_use_registry_canonical(self, tmp_path):
+        registry = AliasRegistry(tmp_path / "aliases.db")
+        registry.resolve(["MGMultiGateSolver"])
+
+        resolver = EntityResolver(registry=registry)
+        extractions = [
+            {"type": "entity", "text": "MGMultiGateSolvr"},
+            {"type": "relation", "from": "MGMultiGateSolvr", "to": "Actor"},
+        ]
+        result = resolver.process(extractions)
+        entity, relation = result
+        assert entity["text"] == "MGMultiGateSolvr"
+        assert entity["canonical_name"] == "MGMultiGateSolver"
+        assert relation["from"] == "MGMultiGateSolver"
+        registry_stats = {key: count for key, count in resolver.stats.items() if key.startswith("registry_")}
+        assert registry_stats == {"registry_known": 0, "registry_matched": 1, "registry_new": 0}
+        registry.close()
+
+    def test_batch_merge_matches_in_memory(self, tmp_path):
+        extractions = [
+            {"type": "entity", "text": "MGMultiGateSolver"},
+            {"type": "entity", "text": "MGMultiGateSolver"},
+            {"type": "entity", "text": "Actor"},
+        ]
+        with AliasRegistry(tmp_path / "aliases.db") as registry:
+            with_registry = EntityResolver(registry=registry).process(extractions)
+        assert with_registry == EntityResolver().process(extractions)
@@ -0,0 +1,161 @@
+"""Tests for entity_index module."""
+
+import random
+
+import pytest
+from entity_index import (
+    AhoCorasick, MinHashLSHIndex, PrefixBlockIndex, TfidfIndex, containment_pairs, min_length_ratio,
+    name_words, optimal_bands,
+)
+from entity_resolver import EntityResolver
+
+
+def _random_names(count, seed=0):
+    rng = random.Random(seed)
+    parts = ["M", "MG", "Multi", "Gate", "Level", "Actor", "Solver", "Data",
+             "Command", "Create", "Map", "Manager", "Native", "Array", "Queue"]
+    names = []
+    for _ in range(count):
+        name = "".join(rng.choice(parts) for _ in range(rng.randint(1, 3)))
+        if rng.random() < 0.2:
+            name = name.lower()
+        names.append(name)
+    return names
+
+
+class TestPrefixBlockIndex:
+    """Tests for the PrefixBlockIndex class."""
+
+    def test_min_length_ratio(self):
+        assert min_length_ratio(0.7) == pytest.approx(0.7 / 1.3)
+        assert min_length_ratio(1.0) == 1.0
+        assert min_length_ratio(0.0) == 0.0
+
+    def test_rejects_non_positive_threshold(self):
+        with pytest.raises(ValueError):
+            PrefixBlockIndex(0.0)
+
+    @pytest.mark.parametrize("threshold", [0.3, 0.5, 0.7, 0.9])
+    def test_no_similar_pair_missed(self, threshold):
+        names = _random_names(120, seed=int(threshold * 10))
+        resolver = EntityResolver(threshold=threshold)
+        pairs = PrefixBlockIndex.candidate_pairs(names, threshold)
+
+        for i in range(len(names)):
+            for j in range(i + 1, len(names)):
+                if resolver._similarity(names[i], names[j]) >= threshold:
+                    assert (i, j) in pairs, (names[i], names[j])
+
+    def test_dissimilar_names_pruned(self):
+        names = ["Alpha", "Bravo", "Charlie", "DeltaForce", "Echo", "Foxtrot"]
+        pairs = PrefixBlockIndex.candidate_pairs(names, 0.8)
+        assert len(pairs) < len(names) * (len(names) - 1) // 2
+
+    def test_length_band_filters(self):
+        index = PrefixBlockIndex(0.7)
+        index.add(0, "Map")
+        index.add(1, "MapManagerController")
+        assert 1 not in index.query("Maps")
+        assert 0 in index.query("Maps")
+
+    def test_incremental_query(self):
+        index = PrefixBlockIndex(0.7)
+        index.add("a", "MGMultiGateSolver")
+        assert "a" in index.query("MGMultiGateSolver")
+        assert index.query("") == set()
+        assert len(index) == 1
+
+
+class TestMinHashLSHIndex:
+    """Tests for the MinHashLSHIndex class."""
+
+    def test_bands_follow_threshold(self):
+        low = MinHashLSHIndex(0.3)
+        high = MinHashLSHIndex(0.9)
+        assert low.bands * low.rows <= 64
+        assert high.rows > low.rows
+
+    def test_optimal_bands_within_budget(self):
+        bands, rows = optimal_bands(0.5, 32)
+        assert bands * rows <= 32
+
+    def test_near_duplicates_found(self):
+        names = ["MGMultiGateSolver", "MGMultiGateSolvers", "Actor", "CreateActorCommand"]
+        pairs = MinHashLSHIndex.candidate_pairs(names, 0.7)
+        assert (0, 1) in pairs
+
+    def test_signature_deterministic(self):
+        a = MinHashLSHIndex(0.7).signature("MGMultiGateSolver")
+        b = MinHashLSHIndex(0.7).signature("MGMultiGateSolver")
+        assert a == b
+
+    def test_incremental_add_query(self):
+        index = MinHashLSHIndex(0.7)
+        index.add("x", "CreateActorCommand")
+        assert "x" in index.query("CreateActorCommand")
+        assert index.query("") == set()
+        assert len(index) == 1
+
+    def test_bucket_size_bounded(self):
+        index = MinHashLSHIndex(0.7, max_bucket_size=3)
+        for i in range(10):
+            index.add(i, "SameName")
+        assert len(index.query("SameName")) == 3
+
+
+class TestAhoCorasick:
+    """Tests for the AhoCorasick automaton and containment_pairs."""
+
+    def test_iter_matches_positions(self):
+        automaton = AhoCorasick(["he", "she", "hers", "his"])
+        matches = sorted(automaton.iter_matches("ushers"))
+        assert matches == [(1, 4, 1), (2, 4, 0), (2, 6, 2)]
+
+    def test_matched_patterns_dedup(self):
+        automaton = AhoCorasick(["ab", "b", ""])
+        assert automaton.matched_patterns("abab") == {0, 1}
+
+    def test_containment_pairs_match_pairwise(self):
+        names = _random_names(150, seed=5) + ["MLevel", "MMultiGateMLevel", "MLevel"]
+        expected = {
+            (i, j)
+            for i in range(len(names))
+            for j in range(i + 1, len(names))
+            if names[i] in names[j] or names[j] in names[i]
+        }
+        assert containment_pairs(names) == expected
+
+
+class TestTfidfIndex:
+    """Tests for TfidfIndex and name_words."""
+
+    def test_name_words_split(self):
+        assert name_words("MGMultiGateSolver") == ["mg", "multi", "gate", "solver"]
+        assert name_words("multi_gate solver") == ["multi", "gate", "solver"]
+        assert name_words("HTTPServer2") == ["http", "server", "2"]
+
+    def test_vectors_normalized(self):
+        vectors = TfidfIndex().vectors(["MultiGateSolver", "Actor", ""])
+        assert sum(w * w for w in vectors[0].values()) == pytest.approx(1.0)
+        assert vectors[2] == {}
+
+    def test_token_match_across_styles(self):
+        names = ["MGMultiGateSolver", "multi gate solver", "ActorData"]
+        pairs = TfidfIndex().neighbors(names, 0.5)
+        assert (0, 1) in pairs
+        assert (0, 2) not in pairs
+
+    def test_top_k_limits_neighbors(self):
+        names = ["GateSolver", "GateSolverCore", "GateSolverCoreData", "GateSolverCoreDataCache", "ActorData"]
+
+        # Each name keeps only its single most similar neighbour
+        pairs = TfidfIndex().neighbors(names, 0.1, top_k=1)
+        assert set(pairs) == {(0, 1), (1, 2), (2, 3), (2, 4)}
+
+        # top_k=2 adds each name's runner-up
+        pairs = TfidfIndex().neighbors(names, 0.1, top_k=2)
+        assert set(pairs) == {(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (2, 4), (3, 4)}
+
+        # Threshold still applies to the kept neighbours
+        pairs = TfidfIndex().neighbors(names, 0.5, top_k=1)
+        assert set(pairs) == {(0, 1), (1, 2), (2, 3)}
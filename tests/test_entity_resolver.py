@@ -106,3 +106,213 @@ class TestEntityResolver:
         ]
         result = resolver.process(extractions)
         assert len(result) == 2
+
+    def test_blocking_matches_exhaustive(self):
+        import random
+        rng = random.Random(7)
+        parts = ["M", "MG", "Multi", "Gate", "Level", "Actor", "Solver", "Map", "Data"]
+        extractions = [
+            {"type": "entity", "text": "".join(rng.choice(parts) for _ in range(rng.randint(1, 3)))}
+            for _ in range(80)
+        ]
+        extractions.append({"type": "relation", "from": extractions[0]["text"], "to": "X"})
+
+        for threshold in (0.3, 0.6, 0.8):
+            blocked = EntityResolver(threshold=threshold, blocking="prefix").process(extractions)
+            exhaustive = EntityResolver(threshold=threshold, blocking=None).process(extractions)
+            assert blocked == exhaustive
+
+    def test_stats_report_pairs(self):
+        resolver = EntityResolver(threshold=0.8)
+        extractions = [
+            {"type": "entity", "text": name}
+            for name in ["Alpha", "Bravo", "Charlie", "DeltaForce", "Echo", "Foxtrot"]
+        ]
+        resolver.process(extractions)
+        assert resolver.stats["entities"] == 6
+        assert resolver.stats["total_pairs"] == 15
+        assert resolver.stats["candidate_pairs"] < 15
+        assert resolver.stats["comparisons"] <= resolver.stats["candidate_pairs"]
+
+    def test_minhash_blocking_merges_duplicates(self):
+        resolver = EntityResolver(threshold=0.7, blocking="minhash")
+        extractions = [
+            {"type": "entity", "text": "MGMultiGateSolver"},
+            {"type": "entity", "text": "Actor"},
+            {"type": "entity", "text": "MGMultiGateSolver"},
+        ]
+        result = resolver.process(extractions)
+        assert [e["text"] for e in result] == ["MGMultiGateSolver", "Actor"]
+
+    def test_unknown_blocking_rejected(self):
+        with pytest.raises(ValueError):
+            EntityResolver(blocking="nope")
+
+    def test_similarity_matches_sequence_matcher(self):
+        import difflib
+        import random
+        rng = random.Random(3)
+        resolver = EntityResolver()
+        alphabet = "abAB_cM"
+        for _ in range(2000):
+            a = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 25)))
+            b = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 25)))
+            if a == b or a in b or b in a:
+                continue
+            assert resolver._similarity(a, b) == difflib.SequenceMatcher(None, a, b).ratio()
+
+    def test_similarity_long_names_fall_back(self):
+        import difflib
+        resolver = EntityResolver()
+        a = "ab" * 150
+        b = "ba" * 120 + "c"
+        assert resolver._similarity(a, b) == difflib.SequenceMatcher(None, a, b).ratio()
+
+    def test_similarity_cutoff_returns_bound(self):
+        resolver = EntityResolver()
+        # Length bound: 2 * 3 / (3 + 20) < 0.7
+        assert resolver._similarity("Abc", "XyzXyzXyzXyzXyzXyzXy", cutoff=0.7) < 0.7
+        # Character bound: no shared characters
+        assert resolver._similarity("abcd", "wxyz", cutoff=0.7) == 0.0
+        # Above cutoff: exact value
+        exact = resolver._similarity("MGLevel", "MLevels")
+        assert resolver._similarity("MGLevel", "MLevels", cutoff=0.5) == exact
+
+    def test_greedy_clustering_is_seed_centred(self):
+        """B joins A's cluster; C is similar to B but not to A, so it stays apart."""
+        resolver = EntityResolver(threshold=0.6, clustering="greedy")
+        extractions = [
+            {"type": "entity", "text": "GateLevel"},
+            {"type": "entity", "text": "GateLevelData"},
+            {"type": "entity", "text": "LevelData"},
+        ]
+        result = resolver.process(extractions)
+        assert [e["text"] for e in result] == ["GateLevelData", "LevelData"]
+
+    def test_transitive_clustering_merges_chain(self):
+        resolver = EntityResolver(threshold=0.6, clustering="transitive")
+        extractions = [
+            {"type": "entity", "text": "GateLevel"},
+            {"type": "entity", "text": "GateLevelData"},
+            {"type": "entity", "text": "LevelData"},
+            {"type": "relation", "from": "LevelData", "to": "GateLevel"},
+        ]
+        result = resolver.process(extractions)
+        entities = [e for e in result if e["type"] == "entity"]
+        relation = [e for e in result if e["type"] == "relation"][0]
+        assert [e["text"] for e in entities] == ["GateLevelData"]
+        assert relation["from"] == "GateLevelData"
+        assert relation["to"] == "GateLevelData"
+
+    def test_transitive_blocking_matches_exhaustive(self):
+        import random
+        rng = random.Random(11)
+        parts = ["M", "MG", "Multi", "Gate", "Level", "Actor", "Solver", "Map", "Data"]
+        extractions = [
+            {"type": "entity", "text": "".join(rng.choice(parts) for _ in range(rng.randint(1, 3)))}
+            for _ in range(80)
+        ]
+        blocked = EntityResolver(threshold=0.7, clustering="transitive").process(extractions)
+        exhaustive = EntityResolver(threshold=0.7, blocking=None, clustering="transitive").process(extractions)
+        assert blocked == exhaustive
+
+    def test_unknown_clustering_rejected(self):
+        with pytest.raises(ValueError):
+            EntityResolver(clustering="nope")
+
+    def test_minhash_blocking_adds_containment_candidates(self):
+        resolver = EntityResolver(threshold=0.25, blocking="minhash")
+        names = ["Solver", "MGMultiGateSolverQ", "Actor"]
+        neighbors = resolver._candidate_neighbors(names)
+        # 0.9 * (6 / 18) = 0.3 >= threshold
+        assert 1 in neighbors[0]
+
+    def test_rewrite_covers_all_reference_fields(self):
+        resolver = EntityResolver(threshold=0.7)
+        extractions = [
+            {"type": "entity", "text": "MGMultiGateSolver"},
+            {"type": "entity", "text": "MGMultiGateSolvr"},
+            {"type": "relation", "from_entity": "MGMultiGateSolvr", "to_entity": "Actor"},
+            {"type": "rule", "text": "r", "related_entities": ["MGMultiGateSolvr", "Actor"]},
+        ]
+        result = resolver.process(extractions)
+        assert result[1]["from_entity"] == "MGMultiGateSolver"
+        assert result[1]["to_entity"] == "Actor"
+        assert result[2]["related_entities"] == ["MGMultiGateSolver", "Actor"]
+        counts = resolver.stats["references_rewritten"]
+        assert counts["from_entity"] == 1
+        assert counts["related_entities"] == 1
+        assert counts["from"] == 0
+
+    def test_rewrite_copy_on_write(self):
+        resolver = EntityResolver(threshold=0.7)
+        untouched = {"type": "relation", "from": "Actor", "to": "Map"}
+        touched = {"type": "relation", "from": "MGMultiGateSolvr", "to": "Actor"}
+        extractions = [
+            {"type": "entity", "text": "MGMultiGateSolver"},
+            {"type": "entity", "text": "MGMultiGateSolvr"},
+            untouched,
+            touched,
+        ]
+        result = resolver.process(extractions)
+        assert result[1] is untouched
+        assert result[2] is not touched
+        assert touched["from"] == "MGMultiGateSolvr"
+
+    def test_tfidf_backend_matches_token_styles(self):
+        extractions = [
+            {"type": "entity", "text": "MGMultiGateSolver"},
+            {"type": "entity", "text": "multi gate solver"},
+            {"type": "entity", "text": "Actor"},
+        ]
+        # SequenceMatcher ratio is ~0.71, TF-IDF cosine ~0.87
+        sequence = EntityResolver(threshold=0.8).process(extractions)
+        tfidf = EntityResolver(threshold=0.8, similarity="tfidf").process(extractions)
+        assert len(sequence) == 3
+        assert [e["text"] for e in tfidf] == ["MGMultiGateSolver", "Actor"]
+
+    def test_unknown_similarity_rejected(self):
+        with pytest.raises(ValueError):
+            EntityResolver(similarity="nope")
+
+
+class TestOnlineEntityResolver:
+    """Tests for the streaming add()/subscribe() API."""
+
+    def test_add_returns_alias_delta(self):
+        resolver = EntityResolver(threshold=0.7)
+        assert resolver.add([{"type": "entity", "text": "MGMultiGateSolver"}]) == {}
+        delta = resolver.add([{"type": "entity", "text": "MGMultiGateSolvr"}])
+        assert delta == {"MGMultiGateSolvr": "MGMultiGateSolver"}
+        assert resolver.alias_map == {"MGMultiGateSolvr": "MGMultiGateSolver"}
+
+    def test_better_name_repoints_cluster(self):
+        resolver = EntityResolver(threshold=0.5)
+        resolver.add([{"type": "entity", "text": "my solver class"}])
+        delta = resolver.add([{"type": "entity", "text": "MySolverClass"}])
+        assert delta == {"my solver class": "MySolverClass"}
+
+    def test_subscribers_receive_deltas(self):
+        resolver = EntityResolver(threshold=0.7)
+        received = []
+        resolver.subscribe(received.append)
+        resolver.add([{"type": "entity", "text": "Actor"}])
+        resolver.add([
+            {"type": "entity", "text": "Actors"},
+            {"type": "rule", "text": "Actor"},
+            {"type": "entity", "text": "Actor"},
+        ])
+        assert received == [{"Actor": "Actors"}]
+
+    def test_online_with_minhash_index(self):
+        resolver = EntityResolver(threshold=0.7, blocking="minhash")
+        resolver.add([{"type": "entity", "text": "CreateActorCommand"}])
+        delta = resolver.add([{"type": "entity", "text": "CreateActorCommand"}, {"type": "entity", "text": "Map"}])
+        assert delta == {}
+        assert resolver.alias_map == {}
+
+    def test_online_uses_configured_similarity(self):
+        names = ["PlayerController", "ControllerPlayer", "CreateActorCommand", "CreateActorCmd"]
+        entities = [{"type": "entity", "text": name} for name in names]
+        assert EntityResolver(similarity="sequence").add(entities) == {"CreateActorCmd": "CreateActorCommand"}
+        assert EntityResolver(similarity="tfidf").add(entities) == {"ControllerPlayer": "PlayerController"}
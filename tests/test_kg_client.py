@@ -0,0 +1,194 @@
+"""Tests for kg_client module (against a local fake memory server)."""
+
+import json
+import sys
+
+import pytest
+from kg_client import MCPError, MCPMemoryClient
+
+
+FAKE_SERVER = r'''
+import json
+import os
+import sys
+import time
+
+fail_first = int(os.environ.get("FAKE_FAIL_FIRST", "0"))
+delay = float(os.environ.get("FAKE_DELAY", "0"))
+entities = {}
+relations = []
+calls = []
+
+for line in sys.stdin:
+    message = json.loads(line)
+    if "id" not in message:
+        continue
+
+    if message["method"] == "initialize":
+        result = {"protocolVersion": "2024-11-05", "capabilities": {"tools": {}},
+                  "serverInfo": {"name": "fake-memory"}}
+    else:
+        name = message["params"]["name"]
+        args = message["params"]["arguments"]
+        if name != "read_graph":
+            calls.append(name)
+            if fail_first > 0:
+                fail_first -= 1
+                reply = {"jsonrpc": "2.0", "id": message["id"],
+                         "error": {"code": -32000, "message": "transient failure"}}
+                print(json.dumps(reply), flush=True)
+                continue
+            time.sleep(delay)
+
+        if name == "create_entities":
+            for entity in args["entities"]:
+                entities.setdefault(entity["name"], {**entity, "observations": list(entity["observations"])})
+        elif name == "add_observations":
+            for item in args["observations"]:
+                observations = entities[item["entityName"]]["observations"]
+                observations.extend(c for c in item["contents"] if c not in observations)
+        elif name == "create_relations":
+            for relation in args["relations"]:
+                assert relation["from"] in entities and relation["to"] in entities
+                if relation not in relations:
+                    relations.append(relation)
+
+        payload = {"entities": list(entities.values()), "relations": relations, "calls": calls}
+        result = {"content": [{"type": "text", "text": json.dumps(payload)}]}
+
+    print(json.dumps({"jsonrpc": "2.0", "id": message["id"], "result": result}), flush=True)
+'''
+
+
+SILENT_SERVER = r'''
+import json
+import sys
+
+for line in sys.stdin:
+    message = json.loads(line)
+    if message.get("method") == "initialize":
+        result = {"protocolVersion": "2024-11-05", "capabilities": {"tools": {}},
+                  "serverInfo": {"name": "silent-memory"}}
+        print(json.dumps({"jsonrpc": "2.0", "id": message["id"], "result": result}), flush=True)
+'''
+
+
+@pytest.fixture
+def server_command(tmp_path):
+    path = tmp_path / "fake_memory_server.py"
+    path.write_text(FAKE_SERVER, encoding="utf-8")
+    return [sys.executable, str(path)]
+
+
+def _records(n_entities=25, n_relations=24):
+    records = [
+        {"type": "entity", "name": f"entity:E{i}", "entityType": "entity", "observations": [f"obs {i}"]}
+        for i in range(n_entities)
+    ]
+    records += [
+        {"type": "relation", "from": f"entity:E{i}", "to": f"entity:E{i + 1}", "relationType": "relates_to"}
+        for i in range(n_relations)
+    ]
+    return records
+
+
+def _graph(client):
+    return json.loads(client.call_tool("read_graph", {})["content"][0]["text"])
+
+
+class TestMCPMemoryClient:
+    """Tests for the MCPMemoryClient class."""
+
+    def test_handshake(self, server_command):
+        with MCPMemoryClient(server_command) as client:
+            assert client.server_info["serverInfo"]["name"] == "fake-memory"
+
+    def test_inject_in_batches(self, server_command):
+        with MCPMemoryClient(server_command, batch_size=10) as client:
+            counts = client.inject(_records())
+            graph = _graph(client)
+
+        assert counts == {"entities": 25, "relations": 24}
+        assert len(graph["entities"]) == 25
+        assert len(graph["relations"]) == 24
+        assert graph["calls"] == ["create_entities"] * 3 + ["create_relations"] * 3
+
+    def test_append_observations(self, server_command):
+        with MCPMemoryClient(server_command, batch_size=10) as client:
+            client.inject(_records(3, 0))
+            client.inject([
+                {"type": "entity", "name": "entity:E0", "entityType": "entity", "observations": ["new"]},
+            ], append_observations=True)
+            graph = _graph(client)
+
+        observations = {e["name"]: e["observations"] for e in graph["entities"]}
+        assert observations["entity:E0"] == ["obs 0", "new"]
+
+    def test_explicit_tool_methods(self, server_command):
+        with MCPMemoryClient(server_command, batch_size=2) as client:
+            client.create_entities([{"name": n, "entityType": "entity", "observations": []} for n in "abcde"])
+            client.add_observations([{"entityName": "a", "contents": ["x"]}])
+            client.create_relations([{"from": "a", "to": "b", "relationType": "uses"}])
+            graph = _graph(client)
+            assert client.stats["batches"] == 5
+
+        assert graph["calls"] == ["create_entities"] * 3 + ["add_observations", "create_relations"]
+
+    def test_retries_transient_errors(self, server_command, monkeypatch):
+        monkeypatch.setenv("FAKE_FAIL_FIRST", "2")
+        with MCPMemoryClient(server_command, batch_size=10, backoff=0) as client:
+            counts = client.inject(_records(5, 4))
+            graph = _graph(client)
+            assert client.stats["retries"] == 2
+
+        assert counts == {"entities": 5, "relations": 4}
+        assert len(graph["entities"]) == 5
+
+    def test_retries_exhausted(self, server_command, monkeypatch):
+        monkeypatch.setenv("FAKE_FAIL_FIRST", "10")
+        with MCPMemoryClient(server_command, retries=1, backoff=0) as client:
+            with pytest.raises(MCPError):
+                client.create_entities([{"name": "a", "entityType": "entity", "observations": []}])
+
+    def test_backpressure_limits_in_flight(self, server_command, monkeypatch):
+        monkeypatch.setenv("FAKE_DELAY", "0.01")
+        with MCPMemoryClient(server_command, batch_size=1, max_in_flight=3) as client:
+            client.inject(_records(12, 0))
+            assert client.stats["max_in_flight"] == 3
+            assert client.stats["batches"] == 12
+
+    def test_server_exit_raises(self, tmp_path):
+        path = tmp_path / "dead_server.py"
+        path.write_text("import sys\nsys.stdin.readline()\n", encoding="utf-8")
+        with pytest.raises(MCPError):
+            MCPMemoryClient([sys.executable, str(path)], retries=0)
+
+    def test_failed_handshake_cleans_up(self, tmp_path, monkeypatch):
+        import kg_client
+
+        spawned = []
+        popen = kg_client.subprocess.Popen
+
+        def tracking_popen(*args, **kwargs):
+            spawned.append(popen(*args, **kwargs))
+            return spawned[-1]
+
+        monkeypatch.setattr(kg_client.subprocess, "Popen", tracking_popen)
+        path = tmp_path / "dead_server.py"
+        path.write_text("import sys\nsys.stdin.readline()\n", encoding="utf-8")
+        with pytest.raises(MCPError):
+            MCPMemoryClient([sys.executable, str(path)], retries=0)
+
+        process, = spawned
+        assert process.returncode is not None
+        assert process.stdin.closed
+
+    def test_unresponsive_server_does_not_block(self, tmp_path):
+        path = tmp_path / "silent_server.py"
+        path.write_text(SILENT_SERVER, encoding="utf-8")
+        with MCPMemoryClient([sys.executable, str(path)], batch_size=1, max_in_flight=2,
+                             retries=0, timeout=0.5) as client:
+            with pytest.raises(MCPError):
+                client.create_entities([
+                    {"name": f"e{i}", "entityType": "entity", "observations": []} for i in range(5)
+                ])
@@ -1,7 +1,10 @@
 """Tests for kg_injector module."""
 
+import gzip
+import json
+
 import pytest
-from kg_injector import KGInjector
+from kg_injector import KGInjector, KGJsonlWriter, read_kg_jsonl
 
 
 class TestKGInjector:
@@ -137,3 +140,200 @@ class TestKGInjector:
         result = injector.convert(extractions)
         assert len(result["entities"]) == 0
         assert len(result["relations"]) == 1
+
+
+class TestStreamingOutput:
+    """Tests for iter_records and the JSONL writer."""
+
+    def _sample(self):
+        extractions = [
+            {"type": "entity", "text": "Solver", "summary_cn": "解算器", "confidence": 0.9},
+            {"type": "relation", "from": "A", "to": "B", "relation_type": "uses", "confidence": 0.8},
+            {"type": "rule", "text": "low", "confidence": 0.1},
+        ]
+        relations = [{"from": "X", "to": "Y", "relation_type": "governs", "confidence": 0.6}]
+        return extractions, relations
+
+    def test_iter_records_matches_convert(self):
+        injector = KGInjector()
+        extractions, relations = self._sample()
+        records = list(injector.iter_records(extractions, iter(relations)))
+        converted = injector.convert(extractions, relations)
+
+        assert [r["type"] for r in records] == ["entity", "relation", "relation"]
+        strip = [{k: v for k, v in r.items() if k != "type"} for r in records]
+        assert strip == converted["entities"] + converted["relations"]
+
+    @pytest.mark.parametrize("filename", ["kg.jsonl", "kg.jsonl.gz"])
+    def test_writer_round_trip(self, tmp_path, filename):
+        injector = KGInjector()
+        extractions, relations = self._sample()
+        path = tmp_path / filename
+
+        with KGJsonlWriter(path) as writer:
+            count = writer.write_all(injector.iter_records(extractions, relations))
+
+        assert count == 3
+        assert writer.stats == {"entities": 1, "relations": 2}
+        assert list(read_kg_jsonl(path)) == list(injector.iter_records(extractions, relations))
+
+    def test_gzip_output_is_compressed_jsonl(self, tmp_path):
+        path = tmp_path / "kg.jsonl.gz"
+        with KGJsonlWriter(path) as writer:
+            writer.write({"type": "entity", "name": "entity:解算器", "entityType": "entity", "observations": []})
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        assert [json.loads(line)["name"] for line in lines] == ["entity:解算器"]
+
+
+class TestEntityMerging:
+    """Tests for merging same-name entities."""
+
+    def test_same_name_entities_merged(self):
+        injector = KGInjector()
+        extractions = [
+            {"type": "rule", "text": "a", "summary_cn": "空检查", "confidence": 0.9,
+             "source_file": "a.cs", "source_location": {"line": 3}},
+            {"type": "rule", "text": "b", "summary_cn": "空检查", "confidence": 0.9,
+             "source_file": "a.cs", "source_location": {"line": 8}},
+        ]
+        result = injector.convert(extractions)
+        assert len(result["entities"]) == 1
+        assert result["entities"][0]["observations"] == [
+            "空检查", "Source: a.cs:3", "Confidence: 0.90", "Source: a.cs:8",
+        ]
+        assert injector.stats["merged_entities"] == 1
+        assert injector.stats["duplicate_observations"] == 2
+
+    def test_max_observations(self):
+        injector = KGInjector(max_observations=2)
+        extractions = [
+            {"type": "event", "text": "e", "summary_cn": "事件", "confidence": 0.8,
+             "trigger_context": "点击", "reason": "交互"},
+        ]
+        result = injector.convert(extractions)
+        assert result["entities"][0]["observations"] == ["事件", "Confidence: 0.80"]
+        assert injector.stats["truncated_observations"] == 2
+
+    def test_iter_records_resets_stats_eagerly(self):
+        injector = KGInjector()
+        extractions = [
+            {"type": "entity", "text": "Solver", "confidence": 0.9},
+            {"type": "entity", "text": "Solver", "confidence": 0.9},
+        ]
+        injector.convert(extractions)
+        assert injector.stats["merged_entities"] == 1
+
+        records = injector.iter_records(extractions[:1])
+        assert injector.stats["merged_entities"] == 0
+        assert len(list(records)) == 1
+
+    def test_iter_records_merges_too(self):
+        injector = KGInjector()
+        extractions = [
+            {"type": "entity", "text": "Solver", "confidence": 0.9},
+            {"type": "entity", "text": "Solver", "confidence": 0.9},
+        ]
+        records = list(injector.iter_records(extractions))
+        assert [r["name"] for r in records] == ["entity:Solver"]
+
+
+class TestEndpointResolution:
+    """Tests for rewriting relation endpoints to KG entity names."""
+
+    def _extractions(self):
+        return [
+            {"type": "entity", "text": "MGMultiGateSolver", "summary_cn": "倍增门解算器", "confidence": 0.9},
+            {"type": "rule", "text": "禁止   直接修改 NativeArray", "summary_cn": "只读保护", "confidence": 0.9,
+             "aliases": ["ReadOnlyRule"]},
+        ]
+
+    def test_endpoints_rewritten(self):
+        injector = KGInjector()
+        relations = [
+            {"from": "禁止 直接修改 NativeArray", "to": "MGMultiGateSolver", "relation_type": "governs",
+             "confidence": 0.6},
+            {"from": "ReadOnlyRule", "to": "倍增门解算器", "relation_type": "governs", "confidence": 0.6},
+        ]
+        result = injector.convert(self._extractions(), relations)
+        assert result["relations"] == [
+            {"from": "rule:只读保护", "to": "entity:倍增门解算器", "relationType": "governs"}
+        ]
+        assert injector.stats["resolved_endpoints"] == 4
+        assert injector.stats["duplicate_relations"] == 1
+
+    def test_dangling_reported_and_kept_by_default(self):
+        injector = KGInjector()
+        relations = [{"from": "MGMultiGateSolver", "to": "Unknown", "relation_type": "uses", "confidence": 0.6}]
+        result = injector.convert(self._extractions(), relations)
+        assert result["relations"] == [
+            {"from": "entity:倍增门解算器", "to": "Unknown", "relationType": "uses"}
+        ]
+        assert injector.stats["dangling_relations"] == 1
+
+    def test_drop_dangling(self):
+        injector = KGInjector(drop_dangling=True)
+        relations = [
+            {"from": "MGMultiGateSolver", "to": "Unknown", "relation_type": "uses", "confidence": 0.6},
+            {"from": "只读保护", "to": "MGMultiGateSolver", "relation_type": "governs", "confidence": 0.6},
+        ]
+        result = injector.convert(self._extractions(), relations)
+        assert [(r["from"], r["to"]) for r in result["relations"]] == [("rule:只读保护", "entity:倍增门解算器")]
+        assert injector.stats["dangling_relations"] == 1
+
+
+class TestDeterministicNames:
+    """Tests for content-hash entity names."""
+
+    def test_unnamed_fallback_is_stable(self):
+        ext = {"type": "rule", "text": "", "confidence": 0.9, "source_file": "a.cs",
+               "source_location": {"char_interval": (10, 20)}}
+        first = KGInjector().convert([ext])["entities"][0]["name"]
+        second = KGInjector().convert([dict(ext)])["entities"][0]["name"]
+        assert first == second
+        assert first.startswith("rule:unnamed_")
+
+        moved = {**ext, "source_location": {"char_interval": (30, 40)}}
+        assert KGInjector().convert([moved])["entities"][0]["name"] != first
+
+    def test_unnamed_without_interval_uses_line(self):
+        items = [
+            {"type": "rule", "text": "", "confidence": 0.9, "source_file": "a.cs", "source_location": {"line": line}}
+            for line in (3, 8)
+        ]
+        assert len(KGInjector().convert(items)["entities"]) == 2
+
+    def test_truncation_collision_disambiguated(self):
+        prefix = "x" * 40
+        injector = KGInjector()
+        extractions = [
+            {"type": "entity", "text": prefix + "Alpha", "confidence": 0.9},
+            {"type": "entity", "text": prefix + "Beta", "confidence": 0.9},
+        ]
+        names = [e["name"] for e in injector.convert(extractions)["entities"]]
+        assert all(name.startswith(f"entity:{prefix}#") for name in names)
+        assert len(set(names)) == 2
+
+        # A name depends only on its own item, not on input order or the rest of the batch
+        assert [e["name"] for e in injector.convert(extractions[::-1])["entities"]] == names[::-1]
+        assert injector.convert(extractions[1:])["entities"][0]["name"] == names[1]
+
+        relations = [{"from": prefix + "Beta", "to": prefix + "Alpha", "relation_type": "uses",
+                      "confidence": 0.6}]
+        result = injector.convert(extractions, relations)
+        assert result["relations"] == [{"from": names[1], "to": names[0], "relationType": "uses"}]
+
+    def test_same_full_display_still_merged(self):
+        text = "y" * 60
+        injector = KGInjector()
+        extractions = [
+            {"type": "entity", "text": text, "confidence": 0.9},
+            {"type": "entity", "text": text, "confidence": 0.9},
+        ]
+        result = injector.convert(extractions)
+        assert len(result["entities"]) == 1
+
+    def test_short_names_unchanged(self):
+        result = KGInjector().convert([{"type": "entity", "text": "z" * 40, "confidence": 0.9}])
+        assert result["entities"][0]["name"] == "entity:" + "z" * 40
@@ -0,0 +1,80 @@
+"""Tests for kg_store module."""
+
+import pytest
+from kg_store import SQLiteGraphStore
+
+
+def _records():
+    return [
+        {"type": "entity", "name": "entity:Solver", "entityType": "entity",
+         "observations": ["解算器", "Source: a.cs:1"]},
+        {"type": "entity", "name": "rule:ReadOnly", "entityType": "rule",
+         "observations": ["只读保护"]},
+        {"type": "relation", "from": "rule:ReadOnly", "to": "entity:Solver", "relationType": "governs"},
+    ]
+
+
+class TestSQLiteGraphStore:
+    """Tests for the SQLiteGraphStore class."""
+
+    def test_write_and_query(self, tmp_path):
+        with SQLiteGraphStore(tmp_path / "kg.db") as store:
+            stats = store.write(_records())
+            assert stats == {"entities": 2, "observations": 3, "relations": 1, "updated_entities": 0}
+            assert store.entity("entity:Solver") == {
+                "name": "entity:Solver",
+                "entityType": "entity",
+                "observations": ["解算器", "Source: a.cs:1"],
+            }
+            assert store.entity("missing") is None
+            assert store.relations("entity:Solver") == [
+                {"from": "rule:ReadOnly", "to": "entity:Solver", "relationType": "governs"}
+            ]
+
+    def test_rewrite_is_idempotent(self, tmp_path):
+        path = tmp_path / "kg.db"
+        with SQLiteGraphStore(path) as store:
+            store.write(_records())
+        with SQLiteGraphStore(path) as store:
+            assert store.write(_records()) == {"entities": 0, "observations": 0, "relations": 0, "updated_entities": 0}
+            assert store.counts() == {"entities": 2, "observations": 3, "relations": 1}
+
+    def test_new_observations_are_appended(self):
+        with SQLiteGraphStore(":memory:") as store:
+            store.write(_records())
+            stats = store.write([
+                {"type": "entity", "name": "entity:Solver", "entityType": "entity",
+                 "observations": ["解算器", "Confidence: 0.90"]},
+            ])
+            assert stats["observations"] == 1
+            assert store.entity("entity:Solver")["observations"][-1] == "Confidence: 0.90"
+
+    def test_entity_type_update_counted(self):
+        with SQLiteGraphStore(":memory:") as store:
+            store.write(_records())
+            stats = store.write([{"type": "entity", "name": "entity:Solver", "entityType": "component"}])
+            assert stats == {"entities": 0, "observations": 0, "relations": 0, "updated_entities": 1}
+            assert store.entity("entity:Solver")["entityType"] == "component"
+
+    def test_small_batches(self):
+        records = [
+            {"type": "entity", "name": f"entity:E{i}", "entityType": "entity", "observations": [f"obs {i}"]}
+            for i in range(50)
+        ] + [
+            {"type": "relation", "from": f"entity:E{i}", "to": f"entity:E{i + 1}", "relationType": "relates_to"}
+            for i in range(49)
+        ]
+        with SQLiteGraphStore(":memory:", batch_size=7) as store:
+            assert store.write(records) == {"entities": 50, "observations": 50, "relations": 49, "updated_entities": 0}
+
+    def test_wal_mode(self, tmp_path):
+        with SQLiteGraphStore(tmp_path / "kg.db") as store:
+            assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_write_graph(self):
+        with SQLiteGraphStore(":memory:") as store:
+            stats = store.write_graph({
+                "entities": [{"name": "entity:A", "entityType": "entity", "observations": []}],
+                "relations": [{"from": "entity:A", "to": "entity:B", "relationType": "uses"}],
+            })
+            assert stats == {"entities": 1, "observations": 0, "relations": 1, "updated_entities": 0}
@@ -1,5 +1,7 @@
 """Integration tests for the pipeline module."""
 
+import sqlite3
+
 import pytest
 from pipeline import ExtractionPipeline
 
@@ -82,6 +84,27 @@ class TestExtractionPipeline:
         entities = [e for e in result["extractions"] if e.get("type") == "entity"]
         assert len(entities) == 1
 
+    def test_entity_top_k_config(self, sample_source_text):
+        config = {"entity_resolution": True, "entity_similarity": "tfidf", "entity_top_k": 3}
+        pipeline = ExtractionPipeline(sample_source_text, config=config)
+        assert pipeline.resolver.top_k == 3
+        assert ExtractionPipeline(sample_source_text).resolver.top_k == 10
+
+    def test_alias_registry_closed(self, tmp_path, sample_source_text):
+        config = {
+            "entity_resolution": True,
+            "alias_registry": str(tmp_path / "aliases.db"),
+            "entity_clustering": "transitive",
+        }
+        with ExtractionPipeline(sample_source_text, config=config) as pipeline:
+            registry = pipeline.registry
+            assert registry.resolver.clustering == "transitive"
+            pipeline.process([{"type": "entity", "text": "MGMultiGateSolver"}])
+
+        assert pipeline.registry is None
+        with pytest.raises(sqlite3.ProgrammingError):
+            registry.conn.execute("SELECT 1")
+
     def test_with_relation_inference(self, sample_source_text):
         extractions = [
             {"type": "rule", "text": "if (cmd == null) { Debug.LogError(\"cmd is null\"); return; }"},
@@ -131,3 +154,71 @@ class TestExtractionPipeline:
         result = pipeline.process(sample_extractions)
         # Should run without error
         assert len(result["extractions"]) > 0
+
+    def test_code_scope_index_config(self, sample_source_text, sample_extractions):
+        pipeline = ExtractionPipeline(sample_source_text, {"relation_inference": True, "scope_index": "code"})
+        assert [name for _, _, name in pipeline.inferrer.scope_index.blocks] == [
+            "MGMultiGateSolver", "Initialize", "AddCommand", "Update",
+        ]
+        result = pipeline.process(sample_extractions)
+        assert "relation_inference" in result["stats"]
+
+    def test_export_kg_jsonl(self, tmp_path, sample_source_text, sample_extractions):
+        from kg_injector import read_kg_jsonl
+
+        pipeline = ExtractionPipeline(sample_source_text, {"relation_inference": True})
+        result = pipeline.process(sample_extractions)
+        path = tmp_path / "kg.jsonl"
+        stats = pipeline.export_kg(path, result["extractions"], result["inferred_relations"])
+
+        records = list(read_kg_jsonl(path))
+        assert stats["entities"] + stats["relations"] == len(records)
+        assert {r["type"] for r in records} <= {"entity", "relation"}
+
+    def test_export_kg_sqlite(self, tmp_path, sample_source_text, sample_extractions):
+        from kg_store import SQLiteGraphStore
+
+        pipeline = ExtractionPipeline(sample_source_text, {"relation_inference": True})
+        result = pipeline.process(sample_extractions)
+        path = tmp_path / "kg.db"
+        first = pipeline.export_kg(path, result["extractions"], result["inferred_relations"])
+        second = pipeline.export_kg(path, result["extractions"], result["inferred_relations"])
+
+        assert first["entities"] > 0
+        assert second == {"entities": 0, "observations": 0, "relations": 0, "updated_entities": 0}
+        with SQLiteGraphStore(path) as store:
+            assert store.counts() == {table: first[table] for table in ("entities", "observations", "relations")}
+
+    def test_stream_relations_skips_materialization(self, sample_source_text, sample_extractions):
+        pipeline = ExtractionPipeline(sample_source_text, {"relation_inference": True, "kg_injection": True})
+        result = pipeline.process(sample_extractions, stream_relations=True)
+        assert result["inferred_relations"] == []
+        assert result["kg_format"] is None
+
+        expected = ExtractionPipeline(sample_source_text, {"relation_inference": True}).process(sample_extractions)
+        streamed = list(pipeline.inferrer.iter_relations(result["extractions"]))
+        assert streamed == expected["inferred_relations"]
+
+    def test_cli_kg_output_streams_relations(self, tmp_path, monkeypatch, sample_source_text, sample_extractions):
+        import json
+        import sys
+        from kg_injector import read_kg_jsonl
+        from pipeline import main
+
+        input_path = tmp_path / "raw.json"
+        input_path.write_text(json.dumps(sample_extractions), encoding="utf-8")
+        source_path = tmp_path / "code.cs"
+        source_path.write_text(sample_source_text, encoding="utf-8")
+        output_path, kg_path = tmp_path / "result.json", tmp_path / "kg.jsonl"
+
+        monkeypatch.setattr(sys, "argv", [
+            "pipeline.py", "--input", str(input_path), "--source", str(source_path),
+            "--output", str(output_path), "--enable-relation-inference", "--kg-output", str(kg_path),
+        ])
+        main()
+
+        output = json.loads(output_path.read_text(encoding="utf-8"))
+        relations = [r for r in read_kg_jsonl(kg_path) if r["type"] == "relation"]
+        assert "inferred_relations" not in output
+        assert relations
+        assert output["stats"]["inferred_relations"] == output["stats"]["relation_inference"]["emitted"] > 0
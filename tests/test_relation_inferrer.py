@@ -140,3 +140,412 @@ class TestRelationInferrer:
             assert "relation_type" in rel
             assert "confidence" in rel
             assert rel["inferred"] is True
+
+    def test_type_buckets_match_pairwise_scan(self):
+        """Bucketed pair generation yields the same relations, in the same order, as a full i x j scan."""
+        import random
+        from relation_inferrer import INFERENCE_RULES
+
+        rng = random.Random(5)
+        types = ["rule", "constraint", "event", "state", "entity", "relation"]
+        items = [
+            _make_ext(rng.choice(types), f"text{rng.randint(0, 15)}", rng.randint(0, 40))
+            for _ in range(60)
+        ]
+
+        expected = []
+        seen = set()
+        for i, a in enumerate(items):
+            for j, b in enumerate(items):
+                rule = INFERENCE_RULES.get((a["type"], b["type"]))
+                if i == j or not rule or (rule[1] and i > j):
+                    continue
+                key = (a["text"], b["text"], rule[0])
+                if key not in seen:
+                    seen.add(key)
+                    expected.append(key)
+
+        _, relations = RelationInferrer(scope_window=50).process(items)
+        assert [(r["from"], r["to"], r["relation_type"]) for r in relations] == expected
+
+
+class TestWindowScope:
+    """Tests for scope_mode="window"."""
+
+    def test_window_crosses_bucket_boundary(self):
+        extractions = [
+            _make_ext("rule", "some rule", 49),
+            _make_ext("entity", "SomeEntity", 50),
+        ]
+        _, bucketed = RelationInferrer(scope_window=50).process(extractions)
+        _, windowed = RelationInferrer(scope_window=50, scope_mode="window").process(extractions)
+        assert bucketed == []
+        assert [(r["from"], r["to"], r["relation_type"]) for r in windowed] == [
+            ("some rule", "SomeEntity", "governs")
+        ]
+
+    def test_window_excludes_distant_items(self):
+        extractions = [
+            _make_ext("entity", "ClassA", 0),
+            _make_ext("entity", "ClassB", 49),
+            _make_ext("entity", "ClassC", 98),
+        ]
+        _, relations = RelationInferrer(scope_window=50, scope_mode="window").process(extractions)
+        pairs = {(r["from"], r["to"]) for r in relations}
+        assert pairs == {("ClassA", "ClassB"), ("ClassB", "ClassC")}
+
+    def test_direction_follows_rule_not_line_order(self):
+        extractions = [
+            _make_ext("entity", "Target", 5),
+            _make_ext("constraint", "must be positive", 10),
+        ]
+        _, relations = RelationInferrer(scope_mode="window").process(extractions)
+        assert [(r["from"], r["to"], r["relation_type"]) for r in relations] == [
+            ("must be positive", "Target", "validates")
+        ]
+
+    def test_distance_decay(self):
+        extractions = [
+            _make_ext("rule", "near rule", 10),
+            _make_ext("rule", "far rule", 35),
+            _make_ext("entity", "Target", 10),
+        ]
+        inferrer = RelationInferrer(scope_window=50, scope_mode="window", distance_decay=True)
+        _, relations = inferrer.process(extractions)
+        confidence = {r["from"]: r["confidence"] for r in relations}
+        assert confidence["near rule"] == pytest.approx(0.6)
+        assert confidence["far rule"] == pytest.approx(0.6 * (1 - 0.5 * 25 / 50))
+
+    def test_unknown_scope_mode(self):
+        with pytest.raises(ValueError, match="Unknown scope mode"):
+            RelationInferrer(scope_mode="sliding")
+
+
+class TestBoundedOutput:
+    """Tests for top-k limits and the global cap."""
+
+    def _dense_scope(self):
+        return [_make_ext("rule", "the rule", 0)] + [
+            _make_ext("entity", f"Entity{i}", i + 1) for i in range(20)
+        ]
+
+    def test_unbounded_stats(self):
+        inferrer = RelationInferrer()
+        _, relations = inferrer.process(self._dense_scope())
+        assert inferrer.stats == {
+            "candidates": len(relations),
+            "emitted": len(relations),
+            "truncated": 0,
+            "capped": False,
+        }
+
+    def test_max_per_item_keeps_nearest(self):
+        inferrer = RelationInferrer(max_per_item=2)
+        _, relations = inferrer.process(self._dense_scope())
+        governs = [r["to"] for r in relations if r["from"] == "the rule"]
+        assert governs == ["Entity0", "Entity1"]
+        assert all(
+            sum(1 for r in relations if r["from"] == source) <= 2
+            for source in {r["from"] for r in relations}
+        )
+
+    def test_max_per_scope(self):
+        inferrer = RelationInferrer(max_per_scope=5)
+        _, relations = inferrer.process(
+            self._dense_scope() + [_make_ext("entity", "Far", 60), _make_ext("entity", "Farther", 61)]
+        )
+        assert len(relations) == 6
+        assert relations[-1]["from"] == "Far"
+
+    def test_global_cap_reports_truncation(self):
+        inferrer = RelationInferrer(max_relations=7)
+        _, relations = inferrer.process(self._dense_scope())
+        assert len(relations) == 7
+        assert inferrer.stats["emitted"] == 7
+        assert inferrer.stats["capped"] is True
+
+    def test_top_k_reports_truncation(self):
+        inferrer = RelationInferrer(max_per_item=2)
+        _, relations = inferrer.process(self._dense_scope())
+        assert inferrer.stats["truncated"] == inferrer.stats["candidates"] - len(relations) > 0
+        assert inferrer.stats["capped"] is False
+
+    def test_cap_not_reached_is_not_capped(self):
+        inferrer = RelationInferrer(max_relations=1000)
+        inferrer.process(self._dense_scope())
+        assert inferrer.stats["capped"] is False
+
+    def test_global_cap_stops_scanning(self):
+        extractions = self._dense_scope() + [
+            _make_ext("rule", "later rule", 60), _make_ext("entity", "Later", 61),
+        ]
+        inferrer = RelationInferrer(max_relations=3)
+        _, relations = inferrer.process(extractions)
+        assert [r["to"] for r in relations] == ["Entity0", "Entity1", "Entity2"]
+        # Enumeration stops once the cap is filled; the later scope is never scanned
+        assert inferrer.stats["candidates"] == 3
+
+    def test_duplicate_keys_keep_nearest_under_limits(self):
+        extractions = [
+            _make_ext("rule", "the rule", 0),
+            _make_ext("entity", "Far", 40),
+            _make_ext("entity", "Near", 5),
+            _make_ext("entity", "Far", 3),
+        ]
+        inferrer = RelationInferrer(max_per_item=1)
+        _, relations = inferrer.process(extractions)
+        assert [r["to"] for r in relations if r["from"] == "the rule"] == ["Far"]
+
+    def test_window_mode_respects_limits(self):
+        inferrer = RelationInferrer(scope_mode="window", distance_decay=True, max_per_item=1)
+        _, relations = inferrer.process(self._dense_scope())
+        rule_edges = [r for r in relations if r["from"] == "the rule"]
+        assert [r["to"] for r in rule_edges] == ["Entity0"]
+        assert rule_edges[0]["confidence"] == pytest.approx(0.6 * (1 - 0.5 * 1 / 50))
+
+
+class TestStreaming:
+    """Tests for iter_relations."""
+
+    def test_matches_process(self):
+        extractions = [
+            _make_ext("rule", "rule a", 10),
+            _make_ext("entity", "ClassA", 12),
+            _make_ext("entity", "ClassB", 60),
+            _make_ext("constraint", "check b", 70),
+        ]
+        inferrer = RelationInferrer()
+        assert list(inferrer.iter_relations(extractions)) == inferrer.process(extractions)[1]
+
+    def test_is_lazy_per_scope(self):
+        extractions = [
+            _make_ext("rule", "rule a", 10),
+            _make_ext("entity", "ClassA", 12),
+            _make_ext("rule", "rule b", 60),
+            _make_ext("entity", "ClassB", 62),
+        ]
+        inferrer = RelationInferrer()
+        stream = inferrer.iter_relations(extractions)
+        first = next(stream)
+        assert first["from"] == "rule a"
+        assert inferrer.stats["candidates"] == 1
+        rest = list(stream)
+        assert [r["from"] for r in rest] == ["rule b"]
+        assert inferrer.stats == {"candidates": 2, "emitted": 2, "truncated": 0, "capped": False}
+
+
+class TestRelationEdges:
+    """Tests for the compact edge representation."""
+
+    def _extractions(self):
+        return [
+            _make_ext("rule", "rule a", 10),
+            _make_ext("entity", "ClassA", 12),
+            _make_ext("entity", "ClassB", 14),
+            _make_ext("constraint", "check b", 16),
+        ]
+
+    def test_to_dicts_matches_process(self):
+        inferrer = RelationInferrer()
+        edges = inferrer.infer_edges(self._extractions())
+        assert list(edges.to_dicts()) == inferrer.process(self._extractions())[1]
+        assert len(edges) == 5
+        assert len(edges.nodes) == 4
+
+    def test_columns_use_integer_ids(self):
+        edges = RelationInferrer().infer_edges(self._extractions())
+        assert edges.sources.typecode == "l"
+        assert edges.type_codes.typecode == "I"
+        first = edges.relation_types[edges.type_codes[0]]
+        assert (edges.nodes[edges.sources[0]], edges.nodes[edges.targets[0]], first) == (
+            "rule a", "ClassA", "governs"
+        )
+
+    def test_many_relation_types(self):
+        rules = [
+            {"from_type": "rule", "to_type": f"type{i}", "relation_type": f"rel{i}"} for i in range(300)
+        ]
+        extractions = [_make_ext("rule", "rule a", 1)] + [
+            _make_ext(f"type{i}", f"Item{i}", 2) for i in range(300)
+        ]
+        edges = RelationInferrer(rules=rules).infer_edges(extractions)
+        assert len(edges) == 300
+        assert edges.relation_types[edges.type_codes[-1]] == "rel299"
+
+    def test_csr_adjacency(self):
+        edges = RelationInferrer().infer_edges(self._extractions())
+
+        def neighbors(indptr, indices, name):
+            node = edges.node_ids[name]
+            return sorted(edges.nodes[col] for col in indices[indptr[node]:indptr[node + 1]])
+
+        indptr, indices, edge_ids = edges.csr()
+        assert neighbors(indptr, indices, "rule a") == ["ClassA", "ClassB"]
+        assert neighbors(indptr, indices, "ClassB") == []
+        assert sorted(edge_ids) == list(range(len(edges)))
+
+        indptr, indices, _ = edges.csr(reverse=True)
+        assert neighbors(indptr, indices, "ClassB") == ["ClassA", "check b", "rule a"]
+
+
+class TestMentionMode:
+    """Tests for scope_mode="mention"."""
+
+    def test_only_mentioned_entities(self):
+        extractions = [
+            _make_ext("rule", "ActorManager must not call Solver directly", 10),
+            _make_ext("entity", "ActorManager", 12),
+            _make_ext("entity", "Unrelated", 13),
+            _make_ext("entity", "Solver", 400),
+        ]
+        _, relations = RelationInferrer(scope_mode="mention").process(extractions)
+        assert [(r["from"], r["to"], r["relation_type"]) for r in relations] == [
+            ("ActorManager must not call Solver directly", "ActorManager", "governs"),
+            ("ActorManager must not call Solver directly", "Solver", "governs"),
+        ]
+        assert all(r["confidence"] == 0.8 for r in relations)
+
+    def test_identifier_boundaries(self):
+        extractions = [
+            _make_ext("constraint", "MGMultiGateSolver 禁止修改", 1),
+            _make_ext("entity", "Solver", 2),
+            _make_ext("entity", "MGMultiGateSolver", 3),
+        ]
+        _, relations = RelationInferrer(scope_mode="mention").process(extractions)
+        assert [r["to"] for r in relations] == ["MGMultiGateSolver"]
+
+    def test_matches_aliases_and_summary(self):
+        entity = _make_ext("entity", "CreateActorCommand", 50)
+        entity["aliases"] = ["创建命令"]
+        event = _make_ext("event", "OnSpawn", 1, source_file="other.cs")
+        event["summary_cn"] = "触发创建命令"
+        _, relations = RelationInferrer(scope_mode="mention").process([event, entity])
+        assert [(r["from"], r["to"], r["relation_type"]) for r in relations] == [
+            ("OnSpawn", "CreateActorCommand", "subscribes_to")
+        ]
+
+
+class TestScopeIndex:
+    """Tests for grouping by a structural scope index."""
+
+    def test_groups_by_code_block(self):
+        from scope_index import CodeScopeIndex
+
+        source = "class A {\n  void F() {\n    x();\n  }\n  void G() {\n    y();\n  }\n}\n"
+        extractions = [
+            _make_ext("rule", "rule in F", 3),
+            _make_ext("entity", "EntityF", 3),
+            _make_ext("entity", "EntityG", 6),
+        ]
+        _, bucketed = RelationInferrer().process(extractions)
+        _, scoped = RelationInferrer(scope_index=CodeScopeIndex(source)).process(extractions)
+        assert len(bucketed) == 3
+        assert [(r["from"], r["to"]) for r in scoped] == [("rule in F", "EntityF")]
+
+    def test_groups_by_doc_section(self):
+        from scope_index import DocScopeIndex
+
+        source = "## 第一条\n甲方 负责 审批\n\n## 第二条\n乙方 负责 交付\n"
+
+        def located(ext_type, text):
+            ext = _make_ext(ext_type, text, 1)
+            ext["source_location"]["char_start"] = source.index(text)
+            return ext
+
+        extractions = [located("rule", "负责 审批"), located("entity", "甲方"), located("entity", "乙方")]
+        _, relations = RelationInferrer(scope_index=DocScopeIndex(source)).process(extractions)
+        assert [(r["from"], r["to"]) for r in relations] == [("负责 审批", "甲方")]
+
+
+class TestCustomRules:
+    """Tests for config-driven inference rules."""
+
+    def test_rule_table_is_dense(self):
+        from relation_inferrer import RuleTable
+
+        table = RuleTable([{"from_type": "constraint", "to_type": "event", "relation_type": "guards"}])
+        code_c, code_e = table.codes["constraint"], table.codes["event"]
+        assert table.table[code_c][code_e]["relation_type"] == "guards"
+        assert table.table[code_e][code_c] is None
+        assert table.lookup("rule", "entity")["relation_type"] == "governs"
+        assert table.lookup("unknown", "entity") is None
+        assert len(table) == 6
+
+    def test_custom_rule_with_confidence(self):
+        extractions = [
+            _make_ext("constraint", "x > 0", 10),
+            _make_ext("event", "OnChange", 12),
+        ]
+        rules = [{"from_type": "constraint", "to_type": "event", "relation_type": "guards", "confidence": 0.45}]
+        _, relations = RelationInferrer(rules=rules).process(extractions)
+        assert [(r["from"], r["to"], r["relation_type"], r["confidence"]) for r in relations] == [
+            ("x > 0", "OnChange", "guards", 0.45)
+        ]
+
+    def test_override_direction_and_remove(self):
+        extractions = [
+            _make_ext("entity", "ClassA", 10),
+            _make_ext("entity", "ClassB", 12),
+            _make_ext("rule", "some rule", 14),
+        ]
+        rules = [
+            {"from_type": "entity", "to_type": "entity", "relation_type": "depends_on", "direction": "forward"},
+            {"from_type": "rule", "to_type": "entity", "relation_type": None},
+        ]
+        _, relations = RelationInferrer(rules=rules).process(extractions)
+        assert {(r["from"], r["to"], r["relation_type"]) for r in relations} == {
+            ("ClassA", "ClassB", "depends_on"),
+            ("ClassB", "ClassA", "depends_on"),
+        }
+
+    @pytest.mark.parametrize("scope_mode", ["bucket", "window"])
+    def test_cross_type_bidirectional(self, scope_mode):
+        # The event comes first, so the from_type item is the later one
+        extractions = [
+            _make_ext("event", "OnChange", 1),
+            _make_ext("constraint", "x > 0", 3),
+        ]
+        rules = [{"from_type": "constraint", "to_type": "event", "relation_type": "guards", "direction": "both"}]
+        _, relations = RelationInferrer(scope_mode=scope_mode, rules=rules).process(extractions)
+        assert sorted((r["from"], r["to"]) for r in relations if r["relation_type"] == "guards") == [
+            ("OnChange", "x > 0"), ("x > 0", "OnChange"),
+        ]
+
+    def test_cross_type_bidirectional_mention(self):
+        extractions = [
+            _make_ext("entity", "Timer", 200),
+            _make_ext("constraint", "Timer must be positive", 1),
+        ]
+        rules = [{"from_type": "constraint", "to_type": "entity", "relation_type": "checks", "direction": "both"}]
+        _, relations = RelationInferrer(scope_mode="mention", rules=rules).process(extractions)
+        assert sorted((r["from"], r["to"]) for r in relations) == [
+            ("Timer", "Timer must be positive"), ("Timer must be positive", "Timer"),
+        ]
+
+    @pytest.mark.parametrize("scope_mode", ["bucket", "window"])
+    def test_max_distance(self, scope_mode):
+        extractions = [
+            _make_ext("rule", "near rule", 10),
+            _make_ext("rule", "far rule", 30),
+            _make_ext("entity", "Target", 12),
+        ]
+        rules = [{"from_type": "rule", "to_type": "entity", "relation_type": "governs", "max_distance": 5}]
+        _, relations = RelationInferrer(scope_mode=scope_mode, rules=rules).process(extractions)
+        assert [r["from"] for r in relations if r["relation_type"] == "governs"] == ["near rule"]
+
+    def test_mention_mode_uses_rule_confidence(self):
+        extractions = [
+            _make_ext("constraint", "Timer must be positive", 1),
+            _make_ext("entity", "Timer", 200),
+        ]
+        rules = [{"from_type": "constraint", "to_type": "entity", "relation_type": "checks", "confidence": 0.7}]
+        _, relations = RelationInferrer(scope_mode="mention", rules=rules).process(extractions)
+        assert [(r["relation_type"], r["confidence"]) for r in relations] == [("checks", 0.9)]
+
+    def test_invalid_rules(self):
+        with pytest.raises(ValueError, match="missing to_type"):
+            RelationInferrer(rules=[{"from_type": "rule", "relation_type": "governs"}])
+        with pytest.raises(ValueError, match="Unknown rule direction"):
+            RelationInferrer(rules=[{
+                "from_type": "rule", "to_type": "entity", "relation_type": "governs", "direction": "backward",
+            }])
@@ -0,0 +1,217 @@
+"""Tests for scope_index module."""
+
+import pytest
+from scope_index import (
+    TOP_LEVEL,
+    CodeScopeIndex,
+    DocScopeIndex,
+    flatten_intervals,
+    heading_level,
+    is_scope_header,
+    parse_indent_blocks,
+)
+
+
+CSHARP_SOURCE = """namespace Game {
+    public class Level {
+        private string label = "{not a block}";
+
+        public void Update() {
+            // } stray brace in a comment
+            if (count > 0) {
+                count--;
+            }
+            var cfg = new Config { Size = 1 };
+        }
+
+        public void Reset(int value = 0) {
+            count = value;
+        }
+    }
+}
+"""
+
+PYTHON_SOURCE = """import os
+
+
+class Level:
+    def update(self):
+        if self.count:
+            self.count -= 1
+
+    @property
+    def size(self):
+        return 1
+
+
+def main():
+    pass
+"""
+
+
+class TestScopeHeader:
+    """Tests for is_scope_header."""
+
+    @pytest.mark.parametrize("header", [
+        "public class Level", "namespace Game", "public void Reset(int value = 0)",
+        "function handler(e)", "struct Point",
+    ])
+    def test_scope_headers(self, header):
+        assert is_scope_header(header)
+
+    @pytest.mark.parametrize("header", [
+        "if (x > 0)", "else", "foreach (var a in list)", "try", "catch (Exception e)",
+        "var cfg = new Config", "", "get",
+    ])
+    def test_non_scope_headers(self, header):
+        assert not is_scope_header(header)
+
+
+class TestCodeScopeIndex:
+    """Tests for the CodeScopeIndex class."""
+
+    def test_brace_blocks_skip_control_flow_strings_and_comments(self):
+        index = CodeScopeIndex(CSHARP_SOURCE, source_file="Level.cs")
+        assert [(name, start, end) for start, end, name in index.blocks] == [
+            ("Game", 1, 17), ("Level", 2, 16), ("Update", 5, 11), ("Reset", 13, 15),
+        ]
+
+    def test_block_at_returns_innermost(self):
+        index = CodeScopeIndex(CSHARP_SOURCE, source_file="Level.cs")
+        names = {line: index.blocks[index.block_at(line)][2] for line in (2, 3, 8, 10, 12, 14, 16, 17)}
+        assert names == {
+            2: "Level", 3: "Level", 8: "Update", 10: "Update",
+            12: "Level", 14: "Reset", 16: "Level", 17: "Game",
+        }
+        assert index.block_at(18) == TOP_LEVEL
+
+    def test_python_uses_ast(self):
+        index = CodeScopeIndex(PYTHON_SOURCE, source_file="level.py")
+        assert index.language == "python"
+        assert [(name, start, end) for start, end, name in index.blocks] == [
+            ("Level", 4, 11), ("update", 5, 7), ("size", 9, 11), ("main", 14, 15),
+        ]
+        assert index.blocks[index.block_at(7)][2] == "update"
+        assert index.block_at(1) == TOP_LEVEL
+
+    def test_python_indent_fallback(self):
+        broken = PYTHON_SOURCE.replace("def main():", "def main(:")
+        index = CodeScopeIndex(broken, language="python")
+        assert [name for _, _, name in index.blocks] == ["Level", "update", "size", "main"]
+        assert parse_indent_blocks(broken)[0] == (4, 11, "Level")
+
+    def test_scope_of_requires_line(self):
+        index = CodeScopeIndex(CSHARP_SOURCE)
+        assert index.scope_of({"source_location": {"line": None}}) is None
+        assert index.scope_of({"source_location": {"line": 14}}) == 3
+
+    def test_unknown_language(self):
+        with pytest.raises(ValueError):
+            CodeScopeIndex("", language="cobol")
+
+
+DOC_SOURCE = """前言文字
+
+# 采购合同
+
+## 第一章 总则
+
+第一条 甲方负责审批。
+
+```
+# 代码块中的注释不是标题
+```
+
+第二条 乙方负责交付。
+
+## 第二章 付款
+1、预付款不超过 30%
+1.1 须经财务审批
+2、尾款验收后支付
+"""
+
+
+class TestDocScopeIndex:
+    """Tests for the DocScopeIndex class."""
+
+    @pytest.mark.parametrize("line, level", [
+        ("# 标题", 1), ("### 小节 ###", 3), ("第三章 附则", 7), ("第十二条 保密", 9),
+        ("1. 预付款", 10), ("2.3 验收", 11), ("2024 年签署", None), ("普通段落", None),
+        ("3 个工作日内完成验收", None), ("1. 供应商应在签约后十日内交付样品。", None),
+        ("2、" + "很长的列表项" * 6, None), ("0.5 秒后重试。", None), ("3.14 is pi.", None),
+    ])
+    def test_heading_level(self, line, level):
+        heading = heading_level(line)
+        assert (heading[0] if heading else None) == level
+
+    def test_section_tree(self):
+        index = DocScopeIndex(DOC_SOURCE)
+        titles = [title for _, _, _, title in index.sections]
+        assert titles == [
+            "采购合同", "第一章 总则", "第一条 甲方负责审批。", "第二条 乙方负责交付。",
+            "第二章 付款", "1、预付款不超过 30%", "1.1 须经财务审批", "2、尾款验收后支付",
+        ]
+        start, end, _, _ = index.sections[0]
+        assert DOC_SOURCE[start:].startswith("# 采购合同")
+        assert end == len(DOC_SOURCE)
+
+    def test_section_at(self):
+        index = DocScopeIndex(DOC_SOURCE)
+
+        def title_at(needle):
+            section = index.section_at(DOC_SOURCE.index(needle))
+            return index.sections[section][3] if section != TOP_LEVEL else None
+
+        assert title_at("前言") is None
+        assert title_at("代码块中的注释") == "第一条 甲方负责审批。"
+        assert title_at("乙方负责交付") == "第二条 乙方负责交付。"
+        assert title_at("须经财务审批") == "1.1 须经财务审批"
+        assert title_at("尾款") == "2、尾款验收后支付"
+
+    def test_ordered_list_stays_in_section(self):
+        source = (
+            "## 第三章 交付\n"
+            "交付要求如下：\n"
+            "1. 供应商应在签约后十日内交付样品。\n"
+            "2. 样品须附检测报告；\n"
+            "3 个工作日内完成验收\n"
+            "## 第四章 验收\n"
+        )
+        index = DocScopeIndex(source)
+        assert [title for _, _, _, title in index.sections] == ["第三章 交付", "第四章 验收"]
+        assert index.section_at(source.index("样品须附")) == index.section_at(source.index("交付要求")) == 0
+
+    def test_markdown_list_items_are_not_clauses(self):
+        source = "# Spec\n## 1. Scope\n1. first item\n2. second item\n## 2. Terms\n"
+        index = DocScopeIndex(source)
+        assert [title for _, _, _, title in index.sections] == ["Spec", "1. Scope", "2. Terms"]
+        assert index.section_at(source.index("second item")) == 1
+
+    def test_numbered_clauses_without_markdown_headings(self):
+        source = "1. 总则\n本合同适用于采购。\n2. 付款\n2.1 预付款\n"
+        index = DocScopeIndex(source)
+        assert [title for _, _, _, title in index.sections] == ["1. 总则", "2. 付款", "2.1 预付款"]
+
+    def test_scope_of_uses_char_start(self):
+        index = DocScopeIndex(DOC_SOURCE)
+        assert index.scope_of({"source_location": {"line": 3}}) is None
+        assert index.scope_of({"source_location": {"char_start": DOC_SOURCE.index("甲方")}}) == 2
+
+
+def test_flatten_intervals():
+    starts, owners = flatten_intervals([(1, 10), (2, 4), (5, 6), (20, 30)])
+    assert starts == [1, 2, 5, 7, 11, 20, 31]
+    assert owners == [0, 1, 2, 0, TOP_LEVEL, 3, TOP_LEVEL]
+
+
+def test_flatten_intervals_sibling_on_closing_line():
+    # "} void G() {": G opens on the line where F closes
+    starts, owners = flatten_intervals([(1, 7), (2, 4), (4, 6)])
+    assert starts == sorted(starts) == [1, 2, 4, 7, 8]
+    assert owners == [0, 1, 2, 0, TOP_LEVEL]
+
+    source = "class A {\n  void F() {\n    x();\n  } void G() {\n    y();\n  }\n}\n"
+    index = CodeScopeIndex(source)
+    assert [index.blocks[index.block_at(line)][2] for line in range(1, 8)] == [
+        "A", "F", "F", "G", "G", "G", "A",
+    ]
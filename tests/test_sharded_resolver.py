@@ -0,0 +1,79 @@
+"""Tests for sharded_resolver module."""
+
+from entity_resolver import EntityResolver
+from sharded_resolver import ShardedEntityResolver
+
+
+def _shards():
+    return [
+        [
+            {"type": "entity", "text": "MGMultiGateSolver"},
+            {"type": "entity", "text": "Actor"},
+            {"type": "relation", "from": "Actor", "to": "MGMultiGateSolver"},
+        ],
+        [
+            {"type": "entity", "text": "MGMultiGateSolvr"},
+            {"type": "relation", "from": "MGMultiGateSolvr", "to": "CreateActorCommand"},
+        ],
+        [
+            {"type": "entity", "text": "CreateActorCommand"},
+            {"type": "entity", "text": "Actor"},
+        ],
+    ]
+
+
+class TestShardedEntityResolver:
+    """Tests for the ShardedEntityResolver class."""
+
+    def test_cross_shard_alias_map(self):
+        sharded = ShardedEntityResolver(threshold=0.7, workers=1)
+        alias_map = sharded.resolve(_shards())
+        assert alias_map == {"MGMultiGateSolvr": "MGMultiGateSolver"}
+        assert sharded.stats["shards"] == 3
+        assert sharded.stats["global_clusters"] == 3
+
+    def test_alias_map_applied_to_every_shard(self):
+        sharded = ShardedEntityResolver(threshold=0.7, workers=1)
+        result = sharded.process(_shards())
+        assert len(result) == 3
+        second = result[1]
+        assert second[0]["text"] == "MGMultiGateSolvr"
+        assert second[0]["canonical_name"] == "MGMultiGateSolver"
+        assert second[1]["from"] == "MGMultiGateSolver"
+
+    def test_references_to_other_shard_aliases_rewritten(self):
+        shards = _shards() + [[{"type": "relation", "from": "MGMultiGateSolvr", "to": "Actor"}]]
+        result = ShardedEntityResolver(threshold=0.7, workers=1).process(shards)
+        assert result[3][0]["from"] == "MGMultiGateSolver"
+
+    def test_parallel_matches_serial(self):
+        serial = ShardedEntityResolver(threshold=0.7, workers=1).resolve(_shards())
+        parallel = ShardedEntityResolver(threshold=0.7, workers=2).resolve(_shards())
+        assert serial == parallel
+
+    def test_matches_single_list_resolution(self):
+        """Without cross-shard chains the global map equals one in-memory pass."""
+        merged = [ext for shard in _shards() for ext in shard]
+        single = EntityResolver(threshold=0.7, clustering="transitive").process(merged)
+        sharded = ShardedEntityResolver(threshold=0.7, workers=1)
+        combined = EntityResolver().apply_alias_map(merged, sharded.resolve(_shards()))
+        assert combined == single
+
+    def test_merges_through_non_canonical_member(self):
+        """A cross-shard match against a non-canonical member still joins the clusters."""
+        shards = [
+            [{"type": "entity", "text": t} for t in ["MGMultiGateSolverData", "MGMultiGateSolver"]],
+            [{"type": "entity", "text": "MultiGateSolve"}],
+        ]
+        merged = [ext for shard in shards for ext in shard]
+        single = EntityResolver(threshold=0.7, clustering="transitive").process(merged)
+        sharded = ShardedEntityResolver(threshold=0.7, clustering="transitive", workers=1)
+        combined = EntityResolver().apply_alias_map(merged, sharded.resolve(shards))
+
+        assert combined == single
+        assert sharded.stats["global_clusters"] == 1
+
+    def test_empty_shards(self):
+        sharded = ShardedEntityResolver(workers=1)
+        assert sharded.resolve([[], []]) == {}
+        assert sharded.process([]) == []